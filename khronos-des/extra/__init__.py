@@ -1 +1 @@
-__all__ = ["components", "gui"]
+__all__ = ["components", "gui", "sweep"]
@@ -1,5 +1,6 @@
 from khronos.statistics import Plotter
 from khronos.utils import Namespace
+from khronos.des.extra.sweep import Sweep, SweepCache, full_factorial
 
 from sim3vm import SPECj2004Sim
 from params import mix0, servtime_3vm, servtime_3vm_disk, servtime_3vm_double
@@ -18,6 +19,19 @@ def run(max_duration=3600000.0, config=default_config,
             out.write("IR=%d, simulation ended at %f\n" % (sim.config.IR, sim.time))
             sim.print_results(simulation.results, out)
             
+def make_sim(config):
+    sim = SPECj2004Sim("sim", config=config)
+    sim.stack.trace = False
+    return sim
+    
+def sweep(max_duration=3600000.0, config=default_config, IRs=range(2, 15, 3), 
+          replications=1, cache_file="results.db"):
+    """Same as run(), but the (IR x replication) cells are simulated in parallel and cached in 
+    'cache_file', so only the cells missing from a previous sweep are simulated."""
+    design = full_factorial(IR=IRs, **{k: [v] for k, v in config.iteritems()})
+    return Sweep(make_sim, design, replications, max_duration, 
+                 cache=SweepCache(cache_file)).run()
+    
 def plot(dlr_throughput, mfg_throughput):
     IRs    = sorted(dlr_throughput.iterkeys())
     dlr_ys = [dlr_throughput[IR] for IR in IRs]
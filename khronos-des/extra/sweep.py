@@ -0,0 +1,207 @@
+"""
+Parameter sweeps over simulation models. A sweep runs every (configuration x replication) cell
+of an experimental design across a pool of worker processes, and stores the results of each cell
+in a local SQLite cache as soon as it completes. Cells are keyed by configuration hash, seed and
+model version, so re-running a sweep only simulates the cells that are missing from the cache.
+
+    def make_sim(config):
+        return SPECj2004Sim("sim", config=config)
+
+    design = full_factorial(IR=range(2, 15, 3), ncores=[2], mix=[mix0],
+                            service_time=[servtime_3vm])
+    sweep = Sweep(make_sim, design, replications=5, duration=3600000.0,
+                  cache=SweepCache("specj.db"))
+    for config, seed, results in sweep.run():
+        ...
+
+Note that, since cells are simulated in separate processes, the model factory must be picklable
+(i.e. a module-level function or class).
+"""
+from multiprocessing import Pool, cpu_count
+from itertools import product
+from hashlib import sha1
+import cPickle as pickle
+import sqlite3
+import random
+
+from khronos.utils import Namespace
+
+
+def full_factorial(**levels):
+    """Build a full factorial design, i.e. a list of configuration dictionaries containing every
+    combination of the levels given for each parameter."""
+    names = sorted(levels.iterkeys())
+    return [dict(zip(names, values)) for values in product(*[levels[name] for name in names])]
+
+
+def latin_hypercube(n, rng=random, **ranges):
+    """Build a Latin hypercube design with 'n' configurations. Each parameter's range is split
+    into 'n' strata, and each stratum is used by exactly one configuration. Ranges given as
+    (low, high) tuples are sampled uniformly within each stratum, while lists are treated as
+    discrete levels (distributed over the strata as evenly as possible)."""
+    configs = [{} for _ in xrange(n)]
+    for name in sorted(ranges.iterkeys()):
+        domain = ranges[name]
+        strata = range(n)
+        rng.shuffle(strata)
+        for config, stratum in zip(configs, strata):
+            u = (stratum + rng.random()) / n
+            if isinstance(domain, tuple):
+                low, high = domain
+                config[name] = low + u * (high - low)
+            else:
+                config[name] = domain[min(int(u * len(domain)), len(domain) - 1)]
+    return configs
+
+
+def _canonical(obj):
+    """Auxiliary function used by config_hash(). Converts mappings into sorted tuples of items,
+    so that equal configurations always produce the same representation."""
+    if isinstance(obj, dict):
+        return tuple(sorted((key, _canonical(value)) for key, value in obj.iteritems()))
+    if isinstance(obj, (list, tuple)):
+        return tuple(_canonical(value) for value in obj)
+    return obj
+
+
+def config_hash(config):
+    """Compute a stable hash string identifying a configuration dictionary."""
+    return sha1(repr(_canonical(config))).hexdigest()
+
+
+class SweepCache(object):
+    """SQLite store for the results of sweep cells. Each row holds the pickled configuration and
+    results of a single (config hash, seed, version) cell. Results are committed one cell at a
+    time, so a crash or interruption loses at most the cells that were still running."""
+    def __init__(self, filepath=":memory:"):
+        self.filepath = filepath
+        self.connection = sqlite3.connect(filepath)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS cells "
+                                "(config_hash TEXT, seed INTEGER, version TEXT,"
+                                " config BLOB, results BLOB, cpu REAL,"
+                                " PRIMARY KEY (config_hash, seed, version));")
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM cells;").fetchone()[0]
+
+    def __contains__(self, key):
+        return self.get(*key) is not None
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def get(self, config_hash, seed, version):
+        """Return the results stored for a cell, or None if the cell is not in the cache."""
+        row = self.connection.execute("SELECT results FROM cells"
+                                      " WHERE config_hash=? AND seed=? AND version=?;",
+                                      (config_hash, seed, version)).fetchone()
+        return None if row is None else pickle.loads(str(row[0]))
+
+    def put(self, config_hash, seed, version, config, results, cpu=None):
+        """Store (or replace) the results of a cell."""
+        self.connection.execute("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?);",
+                                (config_hash, seed, version,
+                                 sqlite3.Binary(pickle.dumps(config, pickle.HIGHEST_PROTOCOL)),
+                                 sqlite3.Binary(pickle.dumps(results, pickle.HIGHEST_PROTOCOL)),
+                                 cpu))
+        self.connection.commit()
+
+    def keys(self):
+        """Return the set of (config hash, seed, version) keys currently in the cache."""
+        return set(self.connection.execute("SELECT config_hash, seed, version FROM cells;"))
+
+    def clear(self, version=None):
+        """Delete all cells from the cache, or only the cells of a given model version."""
+        if version is None:
+            self.connection.execute("DELETE FROM cells;")
+        else:
+            self.connection.execute("DELETE FROM cells WHERE version=?;", (version,))
+        self.connection.commit()
+
+
+def _run_cell(task):
+    """Simulate a single sweep cell. This is executed in the worker processes, so it must be a
+    module-level function."""
+    index, model_factory, config, duration, seed = task
+    sim = model_factory(Namespace(config))
+    simulation = sim.single_run(duration, seed=seed)
+    return index, dict(simulation.results), simulation.meta.cpu
+
+
+class Sweep(object):
+    """Runs a model over a design (a list of configuration dictionaries, see full_factorial()
+    and latin_hypercube()) with a number of replications per configuration. The model factory
+    is called with a configuration namespace and should return a Simulator object. Replication
+    'r' always uses seed 'base_seed + r', so all configurations share the same random streams
+    (common random numbers). The model version defaults to the factory's 'version' attribute,
+    and should be changed whenever the model changes in a way that invalidates cached results."""
+    def __init__(self, model_factory, design, replications=1, duration=None,
+                 base_seed=0, version=None, cache=None, processes=None):
+        if version is None:
+            version = getattr(model_factory, "version", "")
+        if cache is None:
+            cache = SweepCache()
+        self.model_factory = model_factory
+        self.design = list(design)
+        self.replications = replications
+        self.duration = duration
+        self.base_seed = base_seed
+        self.version = str(version)
+        self.cache = cache
+        self.processes = processes
+
+    def cells(self):
+        """Iterate over the (config, config hash, seed) cells of the sweep."""
+        for config in self.design:
+            chash = config_hash(config)
+            for r in xrange(self.replications):
+                yield config, chash, self.base_seed + r
+
+    def missing(self):
+        """Return the list of cells which are not yet in the cache."""
+        version = self.version
+        done = self.cache.keys()
+        return [cell for cell in self.cells() if (cell[1], cell[2], version) not in done]
+
+    def run(self):
+        """Simulate all missing cells and return the results of the whole sweep. Results are
+        stored in the cache as soon as each cell completes."""
+        pending = self.missing()
+        tasks = [(index, self.model_factory, config, self.duration, seed)
+                 for index, (config, _, seed) in enumerate(pending)]
+        processes = self.processes
+        if processes is None:
+            processes = cpu_count()
+        processes = min(processes, len(tasks))
+        if processes <= 1:
+            for task in tasks:
+                index, results, cpu = _run_cell(task)
+                self._store(pending[index], results, cpu)
+        else:
+            pool = Pool(processes)
+            try:
+                for index, results, cpu in pool.imap_unordered(_run_cell, tasks):
+                    self._store(pending[index], results, cpu)
+                pool.close()
+            except BaseException:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+        return self.results()
+
+    def _store(self, cell, results, cpu):
+        config, chash, seed = cell
+        self.cache.put(chash, seed, self.version, config, results, cpu)
+
+    def results(self):
+        """Return a list of (config, seed, results) tuples with all the cached results of the
+        sweep's cells (missing cells are skipped)."""
+        results = []
+        for config, chash, seed in self.cells():
+            cell_results = self.cache.get(chash, seed, self.version)
+            if cell_results is not None:
+                results.append((config, seed, Namespace(cell_results)))
+        return results
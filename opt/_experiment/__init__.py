@@ -1,2 +1,3 @@
-from opt.experiment.experiment import Experiment
-from opt.experiment.results import ResultsDB
+from opt._experiment.experiment import Experiment
+from opt._experiment.parallel import ParallelExperiment
+from opt._experiment.results import ResultsDB, ResultLog
@@ -1,59 +1,169 @@
-from multiprocessing import Manager, Pool, cpu_count, current_process
-
-#    def split(self, parts=2):
-#        parts = []
-#        n = len(self.instances)
-#        for x in xrange(parts):
-#            parts.append(Experiment(self.instances[x / parts: (x+1) / parts])
-            
+"""
+Parallel and resumable execution of experiments.  ParallelExperiment enumerates the cells of an
+experiment, i.e. the (instance, method, replication) triples given by iter_instances(),
+iter_methods() and iter_replications(), and runs them on a pool of worker processes.  Each result
+is appended to a ResultLog as soon as it arrives, so when an interrupted experiment is executed
+again with the same log, only the missing cells (and those which failed) are run.
+
+Cells are identified by the str() of their instance, the name of their method and their
+replication number, so these must be the same from one execution to the next.  Instances and
+methods are sent to the worker processes, so they must be picklable (e.g. functions defined at
+module level), and methods receive the experiment's parameters except 'experiment' and 'log'.
+"""
+import signal
+from multiprocessing import Pool, cpu_count
+from time import clock, time
+from traceback import format_exc
+
+from utils.misc import INF
+from utils.namespace import Namespace
+
+from .experiment import Experiment
+from .results import ResultLog
+
+
+OK = "ok"            # the method returned normally
+TIMEOUT = "timeout"  # the method was interrupted by the hard cpu limit
+ERROR = "error"      # the method raised an exception (the cell is run again on resume)
+
+
+class CpuLimitExceeded(BaseException):
+    """Raised in a cell's method when the hard cpu limit is reached.  It does not derive from
+    Exception so that methods catching Exception cannot swallow it."""
+    pass
+
+
+# true while the method of the current cell is running (SIGPROF is ignored otherwise)
+_method_running = False
+
+
+def _cpu_limit_exceeded(signum, frame):
+    if _method_running:
+        raise CpuLimitExceeded()
+
+
+def _run_cell(args):
+    """Process target running a single cell.  If 'hard_limit' is finite, the method is
+    interrupted after that many seconds of cpu time (measured by the worker's profiling timer)."""
+    global _method_running
+    index, method, params, hard_limit = args
+    start = clock()
+    try:
+        if hard_limit < INF:
+            signal.signal(signal.SIGPROF, _cpu_limit_exceeded)
+            signal.setitimer(signal.ITIMER_PROF, hard_limit)
+        _method_running = True
+        result = method(**params)
+        _method_running = False
+        status, error = OK, None
+    except CpuLimitExceeded:
+        result, status, error = None, TIMEOUT, None
+    except Exception as exc:
+        result, status, error = None, ERROR, "{!r}\n{}".format(exc, format_exc())
+    finally:
+        _method_running = False
+        if hard_limit < INF:
+            signal.setitimer(signal.ITIMER_PROF, 0.0)
+    return index, status, result, clock() - start, error
+
+
+def format_duration(seconds):
+    if seconds == INF:
+        return "?"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
+
+
 class ParallelExperiment(Experiment):
-    def setup(self, processes_per_cpu=1):
-        self.pool = Pool(int(processes=processes_per_cpu * cpu_count()))
-        self.manager = Manager()
-        self.results = self.manager.dict() 
-        print "Starting experiment (%d worker processes)..." % (len(self.pool._pool),)
-        
-    def run(self, *args, **kwargs):
-        print "Parameters:"
-        print "\t", args
-        print "\t", kwargs
-        for instance in self.instances:
-            for method in self.methods:
-                all_args = (method, instance, self.results) + args
-                self.pool.apply_async(_parallel_subrun, all_args, kwargs)
-        self.pool.close()
-        self.pool.join()
-        
-def _parallel_subrun(method, instance, results, *args, **kwargs):
-    pid = current_process().pid 
-    print "[%10s] Starting %s on instance %s" % (pid, method.__class__.__name__, instance)
-    method.execute(instance, results, *args, **kwargs)
-    print "[%10s] Completed %s on instance %s" % (pid, method.__class__.__name__, instance)
-    
-Experiment.parallel = ParallelExperiment
-
-
-# EXAMPLE CODE FOR PARALLEL EXPERIMENT BELOW
-#class Foo(Method):
-#    def __init__(self, name):
-#        self.name = name
-#        
-#    def setup(self, instance):
-#        print self.name, "setup(", self, instance, ")"
-#        self.instance = instance
-#        
-#    def run(self, *args, **kwargs):
-#        print self.name, args
-#        print self.name, kwargs
-#        self.result = self.instance, args, kwargs
-#        
-#    def finalize(self, results):
-#        print self.name, "finalize(", results, ")"
-#        l = results.get(self.name, [])
-#        l.append(self.result)
-#        results[self.name] = l
-#        
-#methods = [Foo(x) for x in ("jakim", "tone", "ze", "manel")]
-#instances = "ABCD"
-#sequential = Experiment(methods, instances)
-#parallel = ParallelExperiment(methods, instances)
+    """
+    Experiment running its cells on 'processes' worker processes (one per cpu if None) and
+    storing their results in the ResultLog at 'filepath' (see the module documentation).
+
+    'cpu_limit' is made available to the methods as the 'cpu_limit' parameter, and is enforced
+    as a hard limit of 'cpu_limit' + 'cpu_margin' seconds of cpu time per cell, so methods should
+    stop by themselves (e.g. by passing it to their solvers) and the hard limit only catches
+    runaway cells.  save_results() is called in the master process with the record of each cell
+    completed during this execution, a Namespace with the cell's 'instance', 'method' and
+    'replication' identifiers, its 'status' (OK, TIMEOUT or ERROR), the method's 'result', the
+    'cpu' time of the cell and the 'error' traceback (if any).  The records of all completed cells,
+    including those loaded from the log, are kept in 'results' ({cell key: record}).
+    """
+    cpu_margin = 1.0  # cpu time allowed beyond 'cpu_limit' before a cell is interrupted
+
+    def __init__(self, filepath, processes=None, cpu_limit=INF):
+        Experiment.__init__(self)
+        self.store = ResultLog(filepath)
+        self.processes = processes
+        self.cpu_limit = cpu_limit
+        self.results = {}  # {cell key: record} of the completed cells
+
+    @staticmethod
+    def cell_key(instance, method, replication):
+        return str(instance), getattr(method, "__name__", str(method)), replication
+
+    def run(self, replications=1):
+        self.log.info("Running experiment...")
+        self.clock.start()
+        self.replications = replications
+        self.params.cpu_limit = self.cpu_limit
+        self.results = dict((record.cell, record) for record in self.store.load()
+                            if record.status != ERROR)
+        cells = []
+        total = 0
+        for instance in self.iter_instances():
+            for method in self.iter_methods():
+                for replication in self.iter_replications():
+                    total += 1
+                    key = self.cell_key(instance, method, replication)
+                    if key not in self.results:
+                        cells.append((key, instance, method, replication))
+        self.log.info("{} of {} cells already completed, {} cells to run",
+                      total - len(cells), total, len(cells))
+        try:
+            if len(cells) > 0:
+                self._run_cells(cells, total)
+        finally:
+            self.store.close()
+            self.clock.stop()
+        self.log.info("Experiment completed in {:.3f} seconds.", self.clock.total)
+
+    def _run_cells(self, cells, total):
+        base_params = dict(self.params)
+        del base_params["experiment"]
+        del base_params["log"]
+        hard_limit = self.cpu_limit + self.cpu_margin
+        tasks = []
+        for index, (key, instance, method, replication) in enumerate(cells):
+            params = dict(base_params, instance=instance, method=method, replication=replication)
+            tasks.append((index, method, params, hard_limit))
+        processes = self.processes
+        if processes is None or processes <= 0:
+            processes = cpu_count()
+        pool = Pool(processes)
+        self.log.info("Starting {} worker processes...", processes)
+        start = time()
+        done = 0
+        try:
+            for index, status, result, cpu, error in pool.imap_unordered(_run_cell, tasks):
+                key = cells[index][0]
+                record = Namespace(cell=key, instance=key[0], method=key[1], replication=key[2],
+                                   status=status, result=result, cpu=cpu, error=error)
+                self.store.append(record)
+                done += 1
+                if status != ERROR:
+                    self.results[key] = record
+                else:
+                    self.log.warning("cell {} failed with {}", key, error)
+                self.save_results(record)
+                elapsed = time() - start
+                eta = elapsed / done * (len(cells) - done)
+                self.log.info("[{}/{}] {} {} #{}: {} in {:.3f}s cpu (elapsed {}, eta {})",
+                              total - len(cells) + done, total, key[0], key[1], key[2], status,
+                              cpu, format_duration(elapsed), format_duration(eta))
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
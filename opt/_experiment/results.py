@@ -1,3 +1,5 @@
+import cPickle
+import os
 import sqlite3
 
 
@@ -79,5 +81,46 @@ class ResultsDB(object):
         
     def iter_replications(self):
         return self.iter_table("replications")
-        
-        
\ No newline at end of file
+
+
+class ResultLog(object):
+    """Append-only file of pickled experiment results, where each record is flushed to disk as
+    soon as it is appended so that it survives a crash of the experiment.  A trailing record left
+    incomplete by a crash is discarded (and overwritten) when the log is loaded."""
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.stream = None
+
+    def load(self):
+        """Return the list of complete records in the log, truncating any incomplete record at
+        its end."""
+        records = []
+        if not os.path.exists(self.filepath):
+            return records
+        end = 0
+        with open(self.filepath, "rb") as istream:
+            load = cPickle.load
+            while True:
+                try:
+                    records.append(load(istream))
+                except EOFError:
+                    break
+                except Exception:
+                    break  # incomplete record
+                end = istream.tell()
+        if end < os.path.getsize(self.filepath):
+            with open(self.filepath, "r+b") as ostream:
+                ostream.truncate(end)
+        return records
+
+    def append(self, record):
+        if self.stream is None:
+            self.stream = open(self.filepath, "ab")
+        cPickle.dump(record, self.stream, cPickle.HIGHEST_PROTOCOL)
+        self.stream.flush()
+        os.fsync(self.stream.fileno())
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
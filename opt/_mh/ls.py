@@ -1,128 +1,264 @@
+"""
+Generic local search, with two ways of describing the neighborhood of a solution:
+
+    - solution-based: neighborhood(solution) yields the neighbor solutions, which are evaluated
+      with the solver's objective function;
+    - move-based (used when the subclass defines delta()): neighborhood(solution) yields moves,
+      delta(solution, move) returns the change in objective value caused by a move, and
+      apply_move(solution, move) builds the neighbor.  Only the selected move is applied, so
+      neighbors are never built just to be evaluated.
+
+Moves are evaluated in chunks of 'chunk_size' moves by delta_batch(), which subclasses may
+override with a vectorized kernel (e.g. computing the deltas of a whole chunk with numpy).  With
+'scan_processes' > 0, chunks are evaluated by worker processes.  The workers are forked when the
+solver is bootstrapped and keep a snapshot of the solver at that time, so delta() must depend only
+on the instance and the solution (and solutions and moves must be picklable).
+"""
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool, RawValue
+
+from utils.interval import Interval
+from utils.misc import INF
+
 from opt.solver import Solver
-from utils import INF
-
-class Uninitialized(Solver.Uninitialized):
-    @staticmethod
-    def enter(solver):
-        pass
-        
-        
-class Initialized(Solver.Initialized):
-    @staticmethod
-    def enter(solver, instance=None, initial_solution=None):
-        Solver.Initialized.enter(solver, instance)
-        solver.initial_solution = initial_solution
-        
-
-class Bootstrapped(Solver.Bootstrapped):
-    @staticmethod
-    def enter(solver):
-        self.asd
+from opt.solver.params import parse_flag
+
+
+def iter_chunks(iterable, size):
+    """Split 'iterable' into lists of 'size' items (the last list may be shorter)."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if len(chunk) == 0:
+            break
+        yield chunk
+
+
+# worker processes scanning chunks of moves (see LocalSearch._create_pool())
+_worker_solver = None
+_worker_scan = None  # shared number of the neighborhood scan in progress
+
+
+def _init_worker(solver, scan):
+    global _worker_solver, _worker_scan
+    _worker_solver = solver
+    _worker_scan = scan
+
+
+def _scan_chunk_task(args):
+    scan, solution, moves, context = args
+    if _worker_scan.value != scan:
+        return None, 0  # the scan was stopped early (see LocalSearch._scan_chunks_in_pool())
+    return _worker_solver.scan_chunk(solution, moves, context)
+
+
+class LocalSearch_ParamSet(Solver.ParamSet):
+    initial_solution = Solver.Param(description="starting point of the search",
+                                    options="a solution, or None to use initial_solution()",
+                                    default=None)
+    initial_solution.reset_with_solver = True
+
+    # ------------------------------------------------------------------------------
+    steepest_descent = Solver.Param(description=("flag indicating whether to move to the best "
+                                                 "improving neighbor (otherwise the first "
+                                                 "improving neighbor is taken)"),
+                                    options="0/1 or [T]rue/[F]alse",
+                                    domain=(False, True),
+                                    default=True)
+
+    @steepest_descent.adapter
+    def steepest_descent(self, flag):
+        return parse_flag("steepest descent", flag)
+
+    # ------------------------------------------------------------------------------
+    chunk_size = Solver.Param(description="number of moves evaluated per call to delta_batch()",
+                              domain=Interval(1, INF),
+                              default=1000)
+
+    @chunk_size.adapter
+    def chunk_size(self, size):
+        return int(size)
+
+    # ------------------------------------------------------------------------------
+    scan_processes = Solver.Param(description=("number of worker processes evaluating chunks of "
+                                               "moves (move-based neighborhoods only)"),
+                                  options="0 to evaluate moves in the solver's process",
+                                  domain=Interval(0, INF),
+                                  default=0)
+
+    @scan_processes.adapter
+    def scan_processes(self, n):
+        return int(n)
+
 
 class LocalSearch(Solver):
-    """A generic implementation of local search. Problem specific local search algorithms can be 
-    implemented by sub-classing this class and defining the following methods:        
-        initial_solution()      # create the starting point of the local search
-        neighborhood(solution)  # return the neighbors (iterable) of the given solution
     """
-    check_neighborhood_print_interval = 100
-    default_steepest_descent = True
-    
-    def __init__(self, log=None, steepest_descent=None):
-        Solver.__init__(self, log)
-        self.current_solution = None
-        self.current_neighbors = None
-        self.neighbors_checked = None
-        self.best_neighbor = None
-        self.steepest_descent = (steepest_descent if steepest_descent is not None 
-                                 else self.default_steepest_descent)
-        self.cpu_limit = None
-        self.init_params = None
-        
-    def init(self, instance=None, cpu=INF, steepest_descent=None, 
-             initial_solution=None, **init_params):
-        PathBasedSolver.init(self, instance)
-        if steepest_descent is not None:
-            self.steepest_descent = steepest_descent
-        self.cpu_limit = cpu
-        self.init_params = init_params
-        self.current_solution = initial_solution
-        
-    def setup(self):
-        with self.cpu.tracking():
-            if self.current_solution is None:
-                self.current_solution = self.initial_solution()
-            self.add_solution(self.current_solution)
-            self.path_tseries.collect(self.upper_bound, self.cpu.total)
-            self.best_neighbor = self.current_solution
-            self._move_to_best_neighbor()
-            
-    def path(self, cpu=None):
-        if cpu is not None:
-            self.cpu_limit = self.cpu.total + cpu
-        self.bootstrap()
-        while self.cpu.total < self.cpu_limit:
-            with self.cpu.tracking():
-                if not self._check_neighborhood() or not self._move_to_best_neighbor():
-                    return
-            yield self.current_solution
-            
-    def _check_neighborhood(self):
-        """Check the current neighborhood and record best neighbor. Returns a boolean indicating 
-        whether the neighborhood check was completed or not.""" 
-        completed = True
-        self.log("Checking neighborhood... ", newline=False)
-        for neighbor in self.current_neighbors:
+    A generic implementation of local search (see the module documentation).  Each iteration
+    checks the neighborhood of the current solution and moves to the best improving neighbor, or
+    to the first improving neighbor if 'steepest_descent' is disabled.  The search finishes when
+    no neighbor improves the current solution.  Subclasses must set the solver's sense and
+    objective function (see opt.solver.example) and define the following methods:
+        initial_solution()              # create the starting point of the local search
+        neighborhood(solution)          # neighbors (or moves) of the given solution
+    and, for move-based neighborhoods:
+        delta(solution, move)           # change in objective value caused by 'move'
+        apply_move(solution, move)      # the neighbor obtained by applying 'move' (the given
+                                        # solution must not be modified)
+    """
+    ParamSet = LocalSearch_ParamSet  # paramset class used by this solver
+
+    def __init__(self, **params):
+        self.current_solution = None  # solution at the current point of the search
+        self.current_value = None     # objective value of the current solution
+        self.neighbors_checked = 0    # neighbors (or moves) checked in the last iteration
+        self.pool = None              # worker processes scanning moves
+        self.pool_processes = 0       # number of worker processes in the pool
+        self.pool_scan = None         # shared number of the scan in progress (see _scan_moves())
+        Solver.__init__(self, **params)
+        self.channel.listen(self.SIGNALS.SOLVER_FINISHED, self.close_pool)
+
+    @property
+    def is_move_based(self):
+        return type(self).delta.im_func is not LocalSearch.delta.im_func
+
+    def _bootstrap(self):
+        solution = self.params.initial_solution
+        if solution is None:
+            solution = self.initial_solution()
+        self.current_solution = solution
+        self.current_value = self.objective(solution)
+        self.solutions.check(solution, self.current_value)
+        self.close_pool()
+        if self.is_move_based and self.params.scan_processes > 0:
+            self._create_pool()
+
+    def _iterate(self):
+        if self.is_move_based:
+            step = self._scan_moves(self.current_solution)
+            if step is not None:
+                move, delta = step
+                self.current_solution = self.apply_move(self.current_solution, move)
+                self.current_value += delta
+        else:
+            step = self._scan_neighbors(self.current_solution)
+            if step is not None:
+                self.current_solution, self.current_value = step
+        if step is None:
+            self.interrupts.add("local optimum reached", Solver.ACTION.FINISH)
+        else:
+            self.solutions.check(self.current_solution, self.current_value)
+
+    def _scan_neighbors(self, solution):
+        """Evaluate neighbor solutions and return the selected (neighbor, value) pair, or None if
+        no neighbor improves the current solution."""
+        objective = self.objective
+        is_better = self.sense.is_better
+        first_improvement = not self.params.steepest_descent
+        best = None
+        best_value = self.current_value
+        self.neighbors_checked = 0
+        for neighbor in self.neighborhood(solution):
             self.neighbors_checked += 1
-            if self.neighbors_checked % self.check_neighborhood_print_interval == 0:
-                self.log("%d " % self.neighbors_checked, newline=False)
-            if self.check_solution(neighbor) is not None:
-                self.best_neighbor = neighbor
-                if not self.steepest_descent:
+            value = objective(neighbor)
+            if is_better(value, best_value):
+                best = neighbor
+                best_value = value
+                if first_improvement:
                     break
-            if self.cpu.total >= self.cpu_limit:
-                completed = False
-                break
-        self.log("<Total %d>" % self.neighbors_checked)
-        return completed
-        
-    def _move_to_best_neighbor(self):
-        """Take a step to the next solution on the search path. If the best_neighbor attribute is
-        None, it means the local search was unable to find an improving neighbor, and this method 
-        will return False. If a best_neighbor exists, the method returns True."""
-        if self.best_neighbor is None:
-            self.log.warn("no improving neighbor found")
-            self.log.info(" --- %s finished --- " % (self.__class__.__name__,))
-            return False
-        self.current_solution = self.best_neighbor
-        self.current_neighbors = iter(self.neighbors(self.current_solution))
+        return None if best is None else (best, best_value)
+
+    def _scan_moves(self, solution):
+        """Evaluate the moves of the neighborhood of 'solution' in chunks and return the selected
+        (move, delta) pair, or None if no move improves the current solution."""
+        is_better = self.sense.is_better
+        first_improvement = not self.params.steepest_descent
+        context = self._scan_context()
+        chunks = iter_chunks(self.neighborhood(solution), self.params.chunk_size)
+        if self.pool is None:
+            results = (self.scan_chunk(solution, moves, context) for moves in chunks)
+        else:
+            results = self._scan_chunks_in_pool(solution, chunks, context)
+        best = None
         self.neighbors_checked = 0
-        self.best_neighbor = None
-        return True
-        
+        for step, count in results:
+            self.neighbors_checked += count
+            if step is not None and (best is None or is_better(step[1], best[1])):
+                best = step
+                if first_improvement and is_better(best[1], 0.0):
+                    break
+        results.close()
+        return best
+
+    def _scan_context(self):
+        """Data passed to scan_chunk() with each chunk of moves, computed once at the start of
+        each neighborhood scan.  Here, whether to stop at the first improving move."""
+        return not self.params.steepest_descent
+
+    def scan_chunk(self, solution, moves, first_improvement):
+        """Evaluate 'moves' with delta_batch() and return a (move, delta) pair with the best
+        improving move (or the first, if 'first_improvement' is true), or None if no move improves
+        the solution, along with the number of moves evaluated.  This may run in a worker
+        process (see the module documentation)."""
+        is_better = self.sense.is_better
+        best = None
+        best_delta = 0.0
+        for move, delta in zip(moves, self.delta_batch(solution, moves)):
+            if is_better(delta, best_delta):
+                best = move
+                best_delta = delta
+                if first_improvement:
+                    break
+        return (None if best is None else (best, best_delta)), len(moves)
+
+    def _scan_chunks_in_pool(self, solution, chunks, context):
+        """Send chunks to the worker processes, keeping at most two chunks per worker in flight,
+        and yield their results in neighborhood order (so first improvement is preserved).  When
+        the generator is closed (e.g. at the first improving move), the scan number shared with
+        the workers is advanced, so that the chunks still in flight are skipped instead of
+        delaying the next scan."""
+        pending = deque()
+        max_pending = 2 * self.pool_processes
+        scan = self.pool_scan.value
+        try:
+            for moves in chunks:
+                args = (scan, solution, moves, context)
+                pending.append(self.pool.apply_async(_scan_chunk_task, (args,)))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().get(INF)
+            while len(pending) > 0:
+                yield pending.popleft().get(INF)
+        finally:
+            self.pool_scan.value = scan + 1
+
+    def _create_pool(self):
+        processes = self.pool_processes = self.params.scan_processes
+        self.pool_scan = RawValue("l", 0)
+        self.pool = Pool(processes, initializer=_init_worker, initargs=(self, self.pool_scan))
+
+    def close_pool(self):
+        """Terminate the worker processes (if any)."""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def delta_batch(self, solution, moves):
+        """Changes in objective value caused by each of 'moves'.  Subclasses can override this
+        with a vectorized kernel."""
+        delta = self.delta
+        return [delta(solution, move) for move in moves]
+
+    # --------------------------------------------------------------------------
+    # Methods that must be defined in subclasses
     def initial_solution(self):
         raise NotImplementedError()
-        
+
     def neighborhood(self, solution):
         raise NotImplementedError()
-        
-        
-        
-for state_cls in [Uninitialized, Initialized, Bootstrapped, Running]:
-    DFS.add_default_state(state_cls())
-    
-    
-    
-def ls(initsol):
-    sol = initsol
-    while True:
-        for neighbor in neighborhood(sol):
-            if neighbor < sol:
-                best_neighbor = neighbor
-                if not steepest_descent:
-                    break
-        if best_neighbor is None:
-            sol = best_neighbor
-    return sol
 
-        
\ No newline at end of file
+    def delta(self, solution, move):
+        raise NotImplementedError()
+
+    def apply_move(self, solution, move):
+        raise NotImplementedError()
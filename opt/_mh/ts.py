@@ -1,38 +1,315 @@
-from khronos.opt.localsearch import LocalSearch
+"""
+Tabu search on top of LocalSearch, with attribute-based tabu memory and Zobrist hashing.
+
+Each move (or neighbor, for solution-based neighborhoods) has a set of hashable attributes given
+by attributes(solution, move), e.g. the pair of positions of a swap.  When a move is made, its
+attributes become tabu for 'tabu_tenure' iterations, and a move is tabu while any of its
+attributes is.  Tabu moves are skipped as the neighborhood is scanned, unless they lead to a
+solution better than the best found so far ('aspiration').
+
+If the subclass defines solution_features(solution), returning the hashable features of a
+solution (e.g. (position, value) pairs), solutions are hashed with ZobristHash, and revisiting a
+solution is counted as a cycle ('cycles').  With 'reactive_tenure' enabled, each cycle adds 20%
+(plus one iteration) to the extra tenure given to new tabu attributes, and the extra tenure
+decays by 10% whenever no cycle occurs for twice the current tenure.  Hashes are updated
+incrementally if move_features(solution, move) is also defined.
+"""
+from utils.prettyrepr import prettify_class
+
+from opt.solver import Solver
+from opt.solver.params import parse_flag
+
+from .ls import LocalSearch, LocalSearch_ParamSet
+
+
+@prettify_class
+class TabuMemory(object):
+    """
+    Tabu status of move attributes, kept in a dict mapping each attribute to the iteration at
+    which it stops being tabu, so that checks take O(1) time.  Expired entries are purged when
+    the dict doubles in size, and the memory is small enough to be sent to worker processes.
+    """
+    __slots__ = ("expiry",      # {attribute: first iteration at which it is no longer tabu}
+                 "iteration",   # current iteration of the search
+                 "purge_size")  # number of entries triggering the next purge
+
+    def __init__(self):
+        self.expiry = {}
+        self.iteration = 0
+        self.purge_size = 64
+
+    def __info__(self):
+        return "iteration={}, entries={}".format(self.iteration, len(self.expiry))
+
+    def __len__(self):
+        return len(self.expiry)
+
+    def clear(self):
+        self.expiry.clear()
+        self.iteration = 0
+        self.purge_size = 64
+
+    def is_tabu(self, attributes):
+        expiry = self.expiry
+        iteration = self.iteration
+        for attribute in attributes:
+            if expiry.get(attribute, 0) > iteration:
+                return True
+        return False
+
+    def add(self, attributes, tenure):
+        """Make 'attributes' tabu for the next 'tenure' iterations."""
+        expiry = self.expiry
+        until = self.iteration + tenure + 1
+        for attribute in attributes:
+            expiry[attribute] = until
+        if len(expiry) > self.purge_size:
+            self.purge()
+
+    def purge(self):
+        iteration = self.iteration
+        self.expiry = dict((attribute, until) for attribute, until in self.expiry.iteritems()
+                           if until > iteration)
+        self.purge_size = max(64, 2 * len(self.expiry))
+
+
+@prettify_class
+class ZobristHash(object):
+    """
+    Zobrist hashing of solutions described by sets of hashable features.  Each feature gets a
+    random 64-bit key on first use, and the hash of a solution is the XOR of the keys of its
+    features, so it can be updated in O(1) when a move removes and adds a few features.
+    """
+    def __init__(self, rng):
+        self.rng = rng
+        self.keys = {}  # {feature: random key}
+
+    def __info__(self):
+        return "features={}".format(len(self.keys))
+
+    def key(self, feature):
+        key = self.keys.get(feature)
+        if key is None:
+            key = self.keys[feature] = self.rng.getrandbits(64)
+        return key
+
+    def hash(self, features):
+        key = self.key
+        h = 0
+        for feature in features:
+            h ^= key(feature)
+        return h
+
+    def update(self, h, removed, added):
+        key = self.key
+        for feature in removed:
+            h ^= key(feature)
+        for feature in added:
+            h ^= key(feature)
+        return h
+
+
+class TabuSearch_ParamSet(LocalSearch_ParamSet):
+    tabu_tenure = Solver.Param(description="number of iterations during which a move's attributes "
+                                           "stay tabu",
+                               options=("a non-negative integer, or a (min, max) pair to draw the "
+                                        "tenure of each move uniformly"),
+                               default=7)
+
+    @tabu_tenure.adapter
+    def tabu_tenure(self, tenure):
+        if isinstance(tenure, (tuple, list)):
+            low, high = map(int, tenure)
+        else:
+            low = high = int(tenure)
+        if not 0 <= low <= high:
+            raise ValueError("invalid tabu tenure: {!r}".format(tenure))
+        return low, high
+
+    # ------------------------------------------------------------------------------
+    aspiration = Solver.Param(description=("flag indicating whether tabu moves leading to a "
+                                           "solution better than the incumbent are allowed"),
+                              options="0/1 or [T]rue/[F]alse",
+                              domain=(False, True),
+                              default=True)
+
+    @aspiration.adapter
+    def aspiration(self, flag):
+        return parse_flag("aspiration", flag)
+
+    # ------------------------------------------------------------------------------
+    reactive_tenure = Solver.Param(description=("flag indicating whether the tenure grows when "
+                                                "solutions are revisited (requires "
+                                                "solution_features())"),
+                                   options="0/1 or [T]rue/[F]alse",
+                                   domain=(False, True),
+                                   default=False)
+
+    @reactive_tenure.adapter
+    def reactive_tenure(self, flag):
+        return parse_flag("reactive tenure", flag)
+
 
 class TabuSearch(LocalSearch):
-    """A general algorithm intended to be used for implementing Tabu-Search-like algorithms. In 
-    addition to the methods required for the LocalSearch class, TabuSearch requires the definition 
-    of a select() method, which, given a list of (neighbor, objective) pairs, selects the best 
-    neighbor, that is, the solution the search will move to."""
-    def _check_neighborhood(self):
-        completed = True
-        self.log("Checking neighborhood... ", newline=False)
-        for neighbor in self.current_neighbors:
+    """
+    Tabu search (see the module documentation).  Each iteration moves to the best admissible
+    neighbor, i.e. the best neighbor which is not tabu or satisfies the aspiration criterion,
+    even if it is worse than the current solution (with 'steepest_descent' disabled, the first
+    improving admissible neighbor is taken if there is one).  If all neighbors are tabu, the
+    search stays at the current solution for one iteration so that the tabu status of some moves
+    expires.  The search only finishes when the neighborhood is empty, so it should be run with
+    cpu or iteration limits.  In addition to the methods required by LocalSearch, subclasses
+    must define:
+        attributes(solution, move)      # hashable attributes of a move (or neighbor)
+    and may define, to enable cycle detection:
+        solution_features(solution)     # hashable features of a solution
+        move_features(solution, move)   # (removed, added) features of a move
+    """
+    ParamSet = TabuSearch_ParamSet  # paramset class used by this solver
+
+    def __init__(self, **params):
+        self.memory = TabuMemory()      # tabu status of move attributes
+        self.hashing = None             # ZobristHash (if solution_features() is defined)
+        self.current_hash = None        # Zobrist hash of the current solution
+        self.visited = {}               # {solution hash: last iteration at which it was visited}
+        self.cycles = 0                 # number of times a visited solution was visited again
+        self.last_cycle = 0             # iteration of the last cycle (or tenure decay)
+        self.tenure_extra = 0           # iterations added to the tenure (with reactive tenure)
+        LocalSearch.__init__(self, **params)
+
+    @property
+    def has_features(self):
+        return (type(self).solution_features.im_func is not
+                TabuSearch.solution_features.im_func)
+
+    def _bootstrap(self):
+        self.memory.clear()
+        self.visited = {}
+        self.cycles = 0
+        self.last_cycle = 0
+        self.tenure_extra = 0
+        LocalSearch._bootstrap(self)
+        if self.has_features:
+            self.hashing = ZobristHash(self.rng)
+            self.current_hash = self.hashing.hash(self.solution_features(self.current_solution))
+            self.visited[self.current_hash] = 0
+        else:
+            self.hashing = None
+            self.current_hash = None
+
+    def _iterate(self):
+        solution = self.current_solution
+        self.memory.iteration = self.iters.total
+        if self.is_move_based:
+            step = self._scan_moves(solution)
+            if step is not None:
+                move, delta = step
+                attributes = self.attributes(solution, move)
+                self.current_solution = self.apply_move(solution, move)
+                self.current_value += delta
+        else:
+            step = self._scan_neighbors(solution)
+            if step is not None:
+                move, self.current_value = step
+                attributes = self.attributes(solution, move)
+                self.current_solution = move
+        if step is None:
+            if self.neighbors_checked == 0:
+                self.interrupts.add("neighborhood is empty", Solver.ACTION.FINISH)
+            return
+        self.memory.add(attributes, self._tenure())
+        if self.hashing is not None:
+            self._update_hash(solution, move)
+        self.solutions.check(self.current_solution, self.current_value)
+
+    def _tenure(self):
+        low, high = self.params.tabu_tenure
+        tenure = low if low == high else self.rng.randint(low, high)
+        return tenure + self.tenure_extra
+
+    def _update_hash(self, solution, move):
+        """Update the hash of the current solution after 'move' was applied to 'solution', and
+        record cycles (adjusting the tenure if 'reactive_tenure' is enabled)."""
+        features = self.move_features(solution, move) if self.is_move_based else None
+        if features is None:
+            self.current_hash = self.hashing.hash(self.solution_features(self.current_solution))
+        else:
+            removed, added = features
+            self.current_hash = self.hashing.update(self.current_hash, removed, added)
+        iteration = self.iters.total + 1
+        if self.current_hash in self.visited:
+            self.cycles += 1
+            self.last_cycle = iteration
+            if self.params.reactive_tenure:
+                self.tenure_extra += int(0.2 * self.tenure_extra) + 1
+        elif self.params.reactive_tenure and self.tenure_extra > 0:
+            if iteration - self.last_cycle > 2 * (self.params.tabu_tenure[1] + self.tenure_extra):
+                self.tenure_extra = int(0.9 * self.tenure_extra)
+                self.last_cycle = iteration
+        self.visited[self.current_hash] = iteration
+
+    # --------------------------------------------------------------------------
+    # Neighborhood scanning with tabu filtering
+    def _aspiration_threshold(self):
+        """Delta below which (in the solver's sense) tabu moves are admissible."""
+        if not self.params.aspiration or self.solutions.feas_count == 0:
+            return self.sense.best_value
+        return self.incumbent - self.current_value
+
+    def _scan_context(self):
+        return (self.memory, self._aspiration_threshold(), not self.params.steepest_descent)
+
+    def scan_chunk(self, solution, moves, context):
+        """Return the best admissible (move, delta) pair among 'moves' (the first improving
+        one, if the context says so), or None if all moves are tabu.  Attributes are only
+        computed for moves which would be selected."""
+        memory, threshold, first_improvement = context
+        is_better = self.sense.is_better
+        attributes = self.attributes
+        best = None
+        for move, delta in zip(moves, self.delta_batch(solution, moves)):
+            if best is not None and not is_better(delta, best[1]):
+                continue
+            if memory.is_tabu(attributes(solution, move)) and not is_better(delta, threshold):
+                continue
+            best = (move, delta)
+            if first_improvement and is_better(delta, 0.0):
+                break
+        return best, len(moves)
+
+    def _scan_neighbors(self, solution):
+        """Same as scan_chunk(), for solution-based neighborhoods (returns a (neighbor, value)
+        pair)."""
+        objective = self.objective
+        is_better = self.sense.is_better
+        attributes = self.attributes
+        memory = self.memory
+        aspiration = self.params.aspiration and self.solutions.feas_count > 0
+        incumbent = self.incumbent
+        current_value = self.current_value
+        first_improvement = not self.params.steepest_descent
+        best = None
+        self.neighbors_checked = 0
+        for neighbor in self.neighborhood(solution):
             self.neighbors_checked += 1
-            if self.neighbors_checked % self.check_neighborhood_print_interval == 0:
-                self.log("%d " % self.neighbors_checked, newline=False)
-            objective = self.objective(neighbor)
-            self.current_neighborhood.append((neighbor, objective))
-            if self.check_solution(neighbor, objective) is not None:
-                self.best_neighbor = neighbor
-                if not self.steepest_descent:
-                    break
-            if self.cpu.total >= self.cpu_limit:
-                completed = False
+            value = objective(neighbor)
+            if best is not None and not is_better(value, best[1]):
+                continue
+            if (memory.is_tabu(attributes(solution, neighbor)) and
+                    not (aspiration and is_better(value, incumbent))):
+                continue
+            best = (neighbor, value)
+            if first_improvement and is_better(value, current_value):
                 break
-        self.log("<Total %d>" % self.neighbors_checked)
-        if completed and (self.steepest_descent or self.best_neighbor is None):
-            self.best_neighbor = self.select(self.current_neighborhood)
-        return completed
-        
-    def _move_to_best_neighbor(self):
-        """Take a step to the next solution on the search's path."""
-        self.current_neighborhood = []
-        return LocalSearch._move_to_best_neighbor(self)
-        
-    def select(self, neighborhood):
-        """Given a list of neighbors and respective objective function values, select the next 
-        solution to move to."""
+        return best
+
+    # --------------------------------------------------------------------------
+    # Methods that must (or may) be defined in subclasses
+    def attributes(self, solution, move):
         raise NotImplementedError()
-        
\ No newline at end of file
+
+    def solution_features(self, solution):
+        raise NotImplementedError()
+
+    def move_features(self, solution, move):
+        return None
@@ -7,6 +7,17 @@ from utils.misc import INF, UNDEF
 from .plugins.limits import Limit
 
 
+def parse_flag(name, flag):
+    """Auxiliary function used by the adapters of boolean parameters."""
+    if isinstance(flag, basestring):
+        flag = flag.strip().lower()
+    if flag in (True, 1, "1", "t", "true"):
+        return True
+    if flag in (False, 0, "0", "f", "false"):
+        return False
+    raise ValueError("unexpected {} flag value: {!r}".format(name, flag))
+
+
 class Param(BaseParam):
     """
     This param subclass simply logs all parameter changes to the solver's info stream. (inspired
@@ -76,6 +87,49 @@ class ParamSet(BaseParam.Set):
     def iter_limit(self, limit):
         return float(limit)
 
+    # --------------------------------------------------------------------------
+    keep_solutions = Param(description=("number of best solutions kept in memory by the "
+                                        "solution list (see SolutionList.compact())"),
+                           options="one or more (inf to keep all solutions)",
+                           domain=Interval(1, INF),
+                           default=INF)
+
+    @keep_solutions.setter
+    def keep_solutions(self, n):
+        solutions = self.owner.solutions
+        solutions.keep_best = n
+        if len(solutions) > 0:
+            solutions.compact()
+
+    @keep_solutions.adapter
+    def keep_solutions(self, n):
+        return float(n)
+
+    # --------------------------------------------------------------------------
+    solution_sample_interval = Param(description=("cpu time between the samples of the search "
+                                                  "trajectory kept in addition to the best "
+                                                  "solutions (with a finite 'keep_solutions')"),
+                                     options="a positive value, or None to keep no samples",
+                                     default=None)
+
+    @solution_sample_interval.setter
+    def solution_sample_interval(self, interval):
+        self.owner.solutions.sample_interval = interval
+
+    @solution_sample_interval.adapter
+    def solution_sample_interval(self, interval):
+        return None if interval is None else float(interval)
+
+    # --------------------------------------------------------------------------
+    solution_spill_path = Param(description=("file where the solutions evicted from the solution "
+                                             "list are appended"),
+                                options="a file path, or None to discard evicted solutions",
+                                default=None)
+
+    @solution_spill_path.setter
+    def solution_spill_path(self, filepath):
+        self.owner.solutions.set_spill(filepath)
+
     # --------------------------------------------------------------------------
     verbosity = Param(description="defines how much output is displayed by the solver",
                       options="[q]uiet (0), [n]ormal (1), or [v]erbose (2)",
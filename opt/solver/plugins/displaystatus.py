@@ -8,13 +8,13 @@ class DisplayStatus(Plugin):
     """
     This plugin displays a status line whenever progress is made by the solver, i.e. whenever the
     incumbent or the bound change.  It also displays a line every 'interval' seconds even if no
-    progress was made by the solver.
+    progress was made by the solver.  The periodic display is checked by the solver's check
+    scheduler (see CheckScheduler) rather than at the end of every iteration.
     """
     listener_priority = INF
     signal_map = {SIGNALS.SOLVER_UNINITIALIZED: "reset",
                   SIGNALS.BOUND_CHANGED: "display",
                   SIGNALS.INCUMBENT_CHANGED: "display",
-                  SIGNALS.ITERATION_FINISHED: "periodic",
                   SIGNALS.SOLVER_PAUSING: "display",
                   SIGNALS.SOLVER_FINISHING: "display"}
 
@@ -23,6 +23,17 @@ class DisplayStatus(Plugin):
         self.interval = interval
         self.last_display = 0.0
 
+    def install(self, solver):
+        if Plugin.install(self, solver):
+            solver.limits.schedule(self)
+            return True
+        return False
+
+    def uninstall(self):
+        if self.installed:
+            self.solver.limits.unschedule(self)
+        return Plugin.uninstall(self)
+
     def reset(self):
         self.last_display = 0.0
 
@@ -30,6 +41,13 @@ class DisplayStatus(Plugin):
         if self.solver.cpu.total - self.last_display >= self.interval:
             self.display()
 
+    check = periodic
+
+    def predict(self, cpu, iter_cpu):
+        if iter_cpu <= 0.0:
+            return INF
+        return (self.interval - (cpu - self.last_display)) / iter_cpu
+
     def display(self):
         self.solver.status.write()
         self.last_display = self.solver.cpu.total
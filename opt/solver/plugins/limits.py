@@ -1,7 +1,9 @@
 from utils.misc import INF
 from utils.prettyrepr import prettify_class
+from utils.channel import CALLBACK_NO_ARGS
 
 from .plugin import Plugin
+from .scheduler import CheckScheduler
 from ..signals import SIGNALS
 from ..statemachine import ACTION
 
@@ -12,8 +14,12 @@ class Limit(Plugin):
     e.g. cpu time, iterations, solutions, etc.  In addition to interrupting the solver, a limit
     may emit a signal on the solver's channel.  Limits may be passed to the solver's run() method,
     and are uninstalled and discarded when the solver is run() again with new limits.
+    Limits which would otherwise be checked at the end of every iteration should instead set
+    'scheduled' to True and define predict() (see CheckScheduler), so that they are checked by
+    the limit manager's scheduler only when they may have been reached.
     """
     direction = +1
+    scheduled = False
 
     def __init__(self, abs=None, rel=None):
         Plugin.__init__(self)
@@ -50,6 +56,13 @@ class Limit(Plugin):
         Plugin.install(self, solver)
         tighter_of = min if self.direction > 0 else max
         self.limit = tighter_of(self.abs, self.rel + self.get_value())
+        if self.scheduled:
+            solver.limits.schedule(self)
+
+    def uninstall(self):
+        if self.scheduled and self.installed:
+            self.solver.limits.unschedule(self)
+        return Plugin.uninstall(self)
 
     def check(self):
         direction = self.direction
@@ -61,9 +74,13 @@ class Limit(Plugin):
     def get_value(self):
         raise NotImplementedError()
 
+    def predict(self, cpu, iter_cpu):
+        """Number of iterations until the limit may be reached (for scheduled limits)."""
+        raise NotImplementedError()
+
 
 class CpuLimit(Limit):
-    signal_map = {SIGNALS.ITERATION_FINISHED: "check"}
+    scheduled = True
     activation_signal = SIGNALS.CPU_LIMIT_REACHED
 
     def install(self, solver):
@@ -73,9 +90,16 @@ class CpuLimit(Limit):
     def get_value(self):
         return self.solver.cpu.total
 
+    def predict(self, cpu, iter_cpu):
+        """Half of the estimated number of iterations left, to absorb changes in iteration
+        time."""
+        if iter_cpu <= 0.0:
+            return INF
+        return 0.5 * (self.limit - cpu) / iter_cpu
+
 
 class ItersLimit(Limit):
-    signal_map = {SIGNALS.ITERATION_FINISHED: "check"}
+    scheduled = True
     activation_signal = SIGNALS.ITERATION_LIMIT_REACHED
 
     def install(self, solver):
@@ -85,6 +109,9 @@ class ItersLimit(Limit):
     def get_value(self):
         return self.solver.iters.total
 
+    def predict(self, cpu, iter_cpu):
+        return self.limit - self.solver.iters.total
+
 
 class FeasSolsLimit(Limit):
     signal_map = {SIGNALS.SOLUTION_ADDED: "check"}
@@ -128,10 +155,18 @@ class LimitManager(object):
     the cpu time reaching a certain threshold. Instead of being managed by the solver's plugin
     manager like other "regular" plugins, these are managed separately because they are replaced
     frequently by new limits.
+    The limit manager also owns the solver's CheckScheduler, which runs the checks of scheduled
+    limits and plugins (see schedule()) every few iterations rather than after every iteration.
+    The scheduler's iteration time estimate is reset whenever the solver is reset or starts a new
+    search, since it does not carry over to another run.
     """
     def __init__(self, solver):
         self.solver = solver
         self.limits = set()
+        self.scheduler = CheckScheduler(solver)
+        self.timing = False  # timing flag given to new limits (see Plugin.set_timing())
+        for signal in (SIGNALS.SOLVER_UNINITIALIZED, SIGNALS.SOLVER_BOOTSTRAPPING):
+            solver.channel.listen(signal, self.scheduler.reset, callback_mode=CALLBACK_NO_ARGS)
 
     def __info__(self):
         return self.limits
@@ -155,6 +190,7 @@ class LimitManager(object):
         limit = to_limit(limit)
         if limit not in self.limits:
             self.limits.add(limit)
+            limit.set_timing(self.timing)
             limit.install(self.solver)
             return True
         return False
@@ -198,6 +234,20 @@ class LimitManager(object):
         for limit in self.limits:
             limit.check()
 
+    def schedule(self, item):
+        """Have 'item' checked periodically by the scheduler (see CheckScheduler)."""
+        self.scheduler.add(item)
+
+    def unschedule(self, item):
+        self.scheduler.remove(item)
+
+    def set_timing(self, flag):
+        """Enable or disable time accounting in the limits and the scheduler."""
+        self.timing = flag
+        self.scheduler.timing = flag
+        for limit in self.limits:
+            limit.set_timing(flag)
+
 
 Limit.Cpu = CpuLimit
 Limit.Iters = ItersLimit
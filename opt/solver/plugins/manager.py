@@ -14,6 +14,7 @@ class PluginManager(object):
     def __init__(self, solver):
         self.solver = solver
         self.namespace = Namespace()
+        self.timing = False  # timing flag given to new plugins (see Plugin.set_timing())
 
     def __info__(self):
         return self.namespace
@@ -49,6 +50,7 @@ class PluginManager(object):
         if plugin.name in self.namespace:
             raise NameError("duplicate plugin name {!r}".format(plugin.name))
         self.namespace[plugin.name] = plugin
+        plugin.set_timing(self.timing)
         plugin.install(self.solver)
 
     def extend(self, plugins):
@@ -75,3 +77,21 @@ class PluginManager(object):
         self.namespace.clear()
 
     reset = clear
+
+    def set_timing(self, flag):
+        """Enable or disable time accounting in all plugins and limits of the solver."""
+        self.timing = flag
+        for plugin in self.namespace.itervalues():
+            plugin.set_timing(flag)
+        self.solver.limits.set_timing(flag)
+
+    def overhead(self):
+        """Return a list of (name, cpu time, calls) tuples with the time spent in each plugin and
+        limit, plus the limit manager's check scheduler, from most to least expensive (timing
+        must be enabled with set_timing())."""
+        limits = self.solver.limits
+        entries = [(plugin.name, plugin.cpu, plugin.calls) for plugin in self.namespace.itervalues()]
+        entries.extend((limit.name, limit.cpu, limit.calls) for limit in limits)
+        entries.append(("CheckScheduler", limits.scheduler.cpu, limits.scheduler.calls))
+        entries.sort(key=lambda entry: entry[1], reverse=True)
+        return entries
@@ -1,3 +1,5 @@
+from time import clock
+
 from utils.prettyrepr import prettify_class
 
 
@@ -16,8 +18,11 @@ class Plugin(object):
     an iterable of signal types that will be registered/unregistered automatically when the plugin
     is installed/uninstalled, respectively.
 
-    This base class defines only two methods, install() and uninstall(), in which the listeners
-    are added to/removed from the solver's channel, respectively.
+    This base class defines two main methods, install() and uninstall(), in which the listeners
+    are added to/removed from the solver's channel, respectively.  With timing enabled (see
+    set_timing()), the plugin also accumulates the cpu time spent in its callbacks (including
+    the time of any callbacks they trigger) and the number of calls, so that the overhead of
+    each plugin can be inspected.
     """
     signal_map = {}
     listener_priority = 0.0
@@ -30,6 +35,9 @@ class Plugin(object):
         self.solver = None
         self.listeners = []
         self.installed = False
+        self.timing = False  # True if measuring the time spent in the plugin's callbacks
+        self.cpu = 0.0       # total cpu time spent in the plugin's callbacks (with timing)
+        self.calls = 0       # number of calls to the plugin's callbacks (with timing)
 
     def install(self, solver):
         if not self.installed:
@@ -43,6 +51,8 @@ class Plugin(object):
                 else:
                     callback = getattr(self, target)
                     callback_mode = None
+                if self.timing:
+                    callback = self.timed(callback)
                 listener = solver.channel.listen(signal, callback=callback,
                                                  callback_mode=callback_mode,
                                                  priority=self.listener_priority)
@@ -64,3 +74,26 @@ class Plugin(object):
             self.installed = False
             return True
         return False
+
+    def set_timing(self, flag):
+        """Enable or disable the measurement of the time spent in the plugin's callbacks."""
+        if flag == self.timing:
+            return
+        self.timing = flag
+        for listener in self.listeners:
+            if flag:
+                listener.callback = self.timed(listener.callback)
+            else:
+                listener.callback = listener.callback.untimed
+
+    def timed(self, callback):
+        def timed_callback(*args):
+            start = clock()
+            try:
+                return callback(*args)
+            finally:
+                self.cpu += clock() - start
+                self.calls += 1
+
+        timed_callback.untimed = callback
+        return timed_callback
@@ -0,0 +1,109 @@
+from time import clock
+
+from utils.prettyrepr import prettify_class
+from utils.channel import CALLBACK_NO_ARGS
+
+from ..signals import SIGNALS
+
+
+@prettify_class
+class CheckScheduler(object):
+    """
+    Runs the periodic checks of a solver (e.g. cpu and iteration limits, periodic status display)
+    every N iterations instead of at the end of every iteration, where N is adapted to the
+    measured cpu time per iteration.  Each scheduled item must define two methods:
+        check()                # do the actual check (e.g. interrupt the solver)
+        predict(cpu, iter_cpu) # number of iterations until the item needs to be checked again,
+                               # given the solver's cpu time and the mean cpu time per iteration
+    The next check happens after the smallest of the items' predictions, but never more than
+    'check_interval' seconds (estimated from the iteration time) after the previous one, and the
+    number of iterations between checks at most doubles from one check to the next, so that
+    sudden changes in iteration time are caught quickly.
+    The scheduler is owned by the solver's limit manager (see LimitManager.schedule()).
+    """
+    check_interval = 0.05  # maximum (estimated) cpu time between two checks
+    max_stride = 100000    # maximum number of iterations between two checks
+
+    def __init__(self, solver):
+        self.solver = solver
+        self.items = []         # scheduled items
+        self.listener = None    # ITERATION_FINISHED listener (while there are scheduled items)
+        self.countdown = 1      # iterations until the next check
+        self.stride = 1         # iterations between the last two checks
+        self.iter_cpu = None    # moving average of the cpu time per iteration
+        self.last_cpu = None    # solver cpu time at the last check
+        self.last_iters = None  # solver iterations at the last check
+        self.timing = False     # if True, measure the time spent in the scheduler and its items
+        self.cpu = 0.0          # cpu time spent in checks, items included (with timing enabled)
+        self.calls = 0          # number of checks run (with timing enabled)
+
+    def __info__(self):
+        return "items={}, stride={}, iter_cpu={}".format(len(self.items), self.stride,
+                                                         self.iter_cpu)
+
+    def __len__(self):
+        return len(self.items)
+
+    def reset(self):
+        """Forget the iteration time measured in the previous run (see LimitManager)."""
+        self.countdown = 1
+        self.stride = 1
+        self.iter_cpu = None
+        self.last_cpu = None
+        self.last_iters = None
+
+    def add(self, item):
+        if item not in self.items:
+            self.items.append(item)
+            self.countdown = 1
+            if self.listener is None:
+                self.listener = self.solver.channel.listen(SIGNALS.ITERATION_FINISHED, self.tick,
+                                                           callback_mode=CALLBACK_NO_ARGS)
+
+    def remove(self, item):
+        if item in self.items:
+            self.items.remove(item)
+            if len(self.items) == 0 and self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+
+    def tick(self):
+        self.countdown -= 1
+        if self.countdown <= 0:
+            if self.timing:
+                start = clock()
+                self.run_checks()
+                self.cpu += clock() - start
+                self.calls += 1
+            else:
+                self.run_checks()
+
+    def run_checks(self):
+        """Check all scheduled items, then update the iteration time estimate and decide when
+        the items are checked next."""
+        solver = self.solver
+        cpu = solver.cpu.total
+        iters = solver.iters.total
+        if self.last_iters is not None and iters > self.last_iters:
+            iter_cpu = (cpu - self.last_cpu) / (iters - self.last_iters)
+            self.iter_cpu = iter_cpu if self.iter_cpu is None else 0.5 * (self.iter_cpu + iter_cpu)
+        self.last_cpu = cpu
+        self.last_iters = iters
+        for item in list(self.items):
+            if item.timing:
+                start = clock()
+                item.check()
+                item.cpu += clock() - start
+                item.calls += 1
+            else:
+                item.check()
+        iter_cpu = self.iter_cpu
+        if iter_cpu is None:
+            stride = 1
+        else:
+            stride = min(2 * self.stride, self.max_stride)
+            if iter_cpu > 0.0:
+                stride = min(stride, self.check_interval / iter_cpu)
+            for item in self.items:
+                stride = min(stride, item.predict(cpu, iter_cpu))
+        self.stride = self.countdown = max(1, int(stride))
@@ -0,0 +1,181 @@
+"""
+Parallel solver portfolio.  Several solver configurations (solver classes with their parameters)
+run on the same instance in separate processes, sharing their incumbent and bound through shared
+memory: each member publishes its improvements, and periodically adopts the best incumbent and
+tightest bound found by any member (see PortfolioMember), so that e.g. pruning in MCTS benefits
+from the solutions found by the other members.
+The portfolio stops as soon as any member reaches the gap limit or finishes with an optimality
+(or infeasibility) proof, and otherwise when all members reach their cpu limit.  Since solver
+classes, instances and solutions are sent between processes, they must be picklable.
+"""
+from multiprocessing import Process, Queue, Lock, RawArray, RawValue
+from Queue import Empty
+from traceback import format_exc
+
+from utils.misc import INF
+
+from opt.infeasible import Infeasible
+
+from .plugins import Plugin, Limit
+from .signals import SIGNALS
+from .statemachine import ACTION
+from .termination import TERMINATION
+
+
+INCUMBENT = 0        # index of the shared incumbent
+BOUND = 1            # index of the shared bound
+POLL_INTERVAL = 0.1  # seconds between checks for members which died without sending results
+
+
+class PortfolioMember(Plugin):
+    """
+    Plugin connecting a solver to the shared state of a portfolio.  Feasible incumbent values and
+    bounds are published whenever they change, and the shared values are read every
+    'sync_interval' seconds of cpu time (by the solver's check scheduler, see CheckScheduler).
+    """
+    signal_map = {SIGNALS.INCUMBENT_CHANGED: "publish",
+                  SIGNALS.BOUND_CHANGED: "publish"}
+    sync_interval = 0.01
+
+    def __init__(self, shared, lock, stop, gap_limit=0.0):
+        Plugin.__init__(self)
+        self.shared = shared        # RawArray with the shared incumbent and bound
+        self.lock = lock            # Lock protecting updates of 'shared'
+        self.stop = stop            # RawValue set to 1 when the portfolio must stop
+        self.gap_limit = gap_limit  # gap at which the whole portfolio stops
+
+    def install(self, solver):
+        if Plugin.install(self, solver):
+            solver.limits.schedule(self)
+            return True
+        return False
+
+    def uninstall(self):
+        if self.installed:
+            self.solver.limits.unschedule(self)
+        return Plugin.uninstall(self)
+
+    def publish(self):
+        solver = self.solver
+        is_better = solver.sense.is_better
+        shared = self.shared
+        incumbent = solver.incumbent
+        bound = solver.bound
+        with self.lock:
+            if not isinstance(incumbent, Infeasible) and is_better(incumbent, shared[INCUMBENT]):
+                shared[INCUMBENT] = incumbent
+            if bound is not None and is_better(shared[BOUND], bound):
+                shared[BOUND] = bound
+
+    def check(self):
+        """Adopt the shared incumbent and bound if they are better than the solver's, and stop
+        the solver if the portfolio was stopped or the gap limit is reached."""
+        solver = self.solver
+        if self.stop.value:
+            solver.interrupts.add("portfolio stopped", ACTION.FINISH)
+            return
+        is_better = solver.sense.is_better
+        incumbent = self.shared[INCUMBENT]
+        bound = self.shared[BOUND]
+        if is_better(incumbent, solver.incumbent):
+            solver.incumbent = incumbent
+        if solver.bound is None or is_better(solver.bound, bound):
+            solver.bound = bound
+        if solver.gap <= self.gap_limit:
+            self.stop.value = 1
+            solver.interrupts.add("portfolio gap limit reached", ACTION.FINISH)
+
+    def predict(self, cpu, iter_cpu):
+        if iter_cpu <= 0.0:
+            return INF
+        return self.sync_interval / iter_cpu
+
+
+def _run_member(index, solver_cls, instance, params, limits, member, results):
+    """Process target running one member of the portfolio and sending its solutions back (or
+    the traceback of the error it raised)."""
+    try:
+        solver = solver_cls()
+        solver.plugins.add(member)
+        solver.init(instance=instance, **params)
+        solver.run(*limits)
+        if (solver.termination in (TERMINATION.OPTIMAL, TERMINATION.INFEASIBLE) or
+                solver.gap <= member.gap_limit):
+            member.stop.value = 1
+        solutions = list(solver.solutions)
+        for sol in solutions:
+            sol.meta.member = index
+        results.put((index, solutions, None))
+    except Exception:
+        member.stop.value = 1
+        results.put((index, [], format_exc()))
+
+
+def _collect_outputs(processes, results, stop):
+    """Wait for the (index, solutions, error) output of each member process.  A member which
+    exits without sending its output (e.g. killed by a signal, or unable to pickle it) gets an
+    output with an error message, and the portfolio is stopped."""
+    outputs = {}
+    while len(outputs) < len(processes):
+        # members which had already exited before the wait have flushed their outputs, so if
+        # nothing arrives, they died without sending one
+        exited = [index for index, process in enumerate(processes)
+                  if index not in outputs and process.exitcode is not None]
+        try:
+            output = results.get(True, POLL_INTERVAL)
+            outputs[output[0]] = output
+        except Empty:
+            for index in exited:
+                error = "process exited with code {} without sending its results".format(
+                    processes[index].exitcode)
+                outputs[index] = (index, [], error)
+                stop.value = 1
+    return outputs.values()
+
+
+def run_portfolio(configs, instance, cpu_limit=INF, gap_limit=0.0):
+    """Run a portfolio of solver configurations on 'instance', each in its own process.  'configs'
+    is a list of (solver class, parameter dict) pairs, and each member is stopped by 'cpu_limit'
+    (seconds of cpu time of the member) or when the portfolio stops (see the module docs).
+    Returns a SolutionList (associated with a solver of the first configuration, initialized but
+    not run) with the solutions of all members sorted by cpu time, each with its member's index
+    in the 'member' metadata attribute.  The solver's incumbent and bound are those shared by the
+    portfolio at the end of the run."""
+    solver_cls, params = configs[0]
+    solver = solver_cls()
+    solver.init(instance=instance, **params)
+    sense = solver.sense
+    shared = RawArray("d", [sense.worst_value, sense.best_value])
+    lock = Lock()
+    stop = RawValue("b", 0)
+    results = Queue()
+    limits = [Limit.Cpu(rel=cpu_limit)]
+    processes = []
+    for index, (member_cls, member_params) in enumerate(configs):
+        member = PortfolioMember(shared, lock, stop, gap_limit)
+        process = Process(target=_run_member,
+                          args=(index, member_cls, instance, member_params, limits, member,
+                                results))
+        process.daemon = True
+        process.start()
+        processes.append(process)
+    try:
+        outputs = _collect_outputs(processes, results, stop)
+    finally:
+        stop.value = 1
+        for process in processes:
+            process.join()
+    merged = []
+    for index, member_solutions, error in sorted(outputs):
+        if error is not None:
+            raise Exception("portfolio member {} failed:\n{}".format(index, error))
+        merged.extend(member_solutions)
+    merged.sort(key=lambda sol: sol.meta.cpu)
+    solutions = solver.solutions
+    solutions.merge(merged)
+    is_better = sense.is_better
+    if is_better(shared[INCUMBENT], solver.incumbent):
+        solver.incumbent = shared[INCUMBENT]
+    if is_better(solver.bound, shared[BOUND]):
+        solver.bound = shared[BOUND]
+    return solutions
@@ -1,3 +1,6 @@
+from array import array
+import cPickle
+
 from utils import attr
 from utils.misc import INF, max_elems
 from utils.namespace import Namespace
@@ -31,6 +34,113 @@ class Solution(object):
         return isinstance(self.value, Infeasible)
 
 
+@prettify_class
+class SolutionRecord(object):
+    """A (cpu, iteration, value) row of a SolutionLog.  The 'meta' attribute is the record itself,
+    so that records can be used in place of solutions wherever only 'value', 'meta.cpu' and
+    'meta.iteration' are needed (e.g. SolutionList.make_tseries())."""
+    __slots__ = ("cpu", "iteration", "value")
+
+    def __init__(self, cpu, iteration, value):
+        self.cpu = cpu
+        self.iteration = iteration
+        self.value = value
+
+    def __info__(self):
+        return "value={!r}, cpu={}, iteration={}".format(self.value, self.cpu, self.iteration)
+
+    @property
+    def meta(self):
+        return self
+
+    @property
+    def is_feasible(self):
+        return not isinstance(self.value, Infeasible)
+
+    @property
+    def is_infeasible(self):
+        return isinstance(self.value, Infeasible)
+
+
+@prettify_class
+class SolutionLog(object):
+    """
+    Compact log of all the solutions added to a solution list, stored in columns of cpu time,
+    iteration and objective value (as floats, with a separate column flagging infeasible values).
+    The log is kept even for solutions evicted from the list (see SolutionList.compact()).
+    """
+    def __init__(self):
+        self.cpu = array("d")
+        self.iteration = array("l")
+        self.value = array("d")
+        self.feasible = array("b")
+
+    def __info__(self):
+        return "{} solutions".format(len(self))
+
+    def __len__(self):
+        return len(self.value)
+
+    def __getitem__(self, i):
+        value = self.value[i]
+        if not self.feasible[i]:
+            value = Infeasible(value)
+        return SolutionRecord(self.cpu[i], self.iteration[i], value)
+
+    def __iter__(self):
+        for i in xrange(len(self.value)):
+            yield self[i]
+
+    def append(self, cpu, iteration, value):
+        self.cpu.append(cpu)
+        self.iteration.append(iteration)
+        self.value.append(value)
+        self.feasible.append(not isinstance(value, Infeasible))
+
+    def clear(self):
+        for column in (self.cpu, self.iteration, self.value, self.feasible):
+            del column[:]
+
+
+@prettify_class
+class SolutionSpill(object):
+    """Append-only file of pickled solutions, where solutions evicted from a solution list are
+    stored (see SolutionList.compact()).  Iterating over the spill loads all its solutions."""
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.stream = None
+        self.count = 0  # number of solutions written by this object
+
+    def __info__(self):
+        return "{!r}, {} solutions written".format(self.filepath, self.count)
+
+    def write(self, solutions):
+        if self.stream is None:
+            self.stream = open(self.filepath, "ab")
+        dump = cPickle.dump
+        for sol in solutions:
+            dump(sol, self.stream, cPickle.HIGHEST_PROTOCOL)
+            self.count += 1
+        self.stream.flush()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def __iter__(self):
+        with open(self.filepath, "rb") as istream:
+            load = cPickle.load
+            while True:
+                try:
+                    yield load(istream)
+                except EOFError:
+                    break
+
+    def __getstate__(self):
+        return dict(filepath=self.filepath, stream=None, count=self.count)
+
+
 class SolutionList(list):
     """
     The SolutionList class provides an easy standard way to record solutions found by solvers
@@ -40,10 +150,23 @@ class SolutionList(list):
     A solution list is associated with a solver: it uses some of the solver's attributes and
     methods to compute missing information (objective value and cpu time). This also updates the
     solver's incumbent value when a new best feasible solution is found.
+
+    The cpu time, iteration and value of every solution are also recorded in a compact column
+    log ('log'), from which the *_seq() methods and plots are built.  A retention policy may be
+    set with set_retention() to bound the number of Solution objects kept in memory: the list
+    then keeps only the 'keep_best' best solutions plus, if 'sample_interval' is given, the best
+    solution found in each interval of that many seconds of cpu time (a sample of the search's
+    trajectory).  Other solutions are evicted, and written to an append-only spill file if one
+    is given.
     """
     def __init__(self, solver):
         list.__init__(self)
         self.solver = solver
+        self.log = SolutionLog()        # (cpu, iteration, value) of all solutions added
+        self.keep_best = INF            # number of best solutions kept by the retention policy
+        self.sample_interval = None     # cpu time between trajectory samples kept by the policy
+        self.spill = None               # SolutionSpill receiving the evicted solutions
+        self.next_compaction = None     # length of the list triggering the next compaction
         self.checked_sol = None         # temporarily stores the solution being checked
         self.checked_obj = None         # same as checked_sol, but for objective value
         self.feas_count = None          # number of feasible solutions in the list
@@ -59,6 +182,8 @@ class SolutionList(list):
     def clear(self):
         """Remove all solutions from the list."""
         del self[:]
+        self.log.clear()
+        self.next_compaction = None
         self.checked_sol = None
         self.checked_obj = None
         self.feas_count = 0
@@ -77,6 +202,58 @@ class SolutionList(list):
         self.best_feas_value = self.solver.sense.worst_value
         self.worst_feas_value = self.solver.sense.best_value
 
+    def set_retention(self, keep_best=INF, sample_interval=None, spill_path=None):
+        """Set the retention policy of the list (see the class documentation).  With 'keep_best'
+        equal to inf, all solutions are kept."""
+        self.keep_best = keep_best
+        self.sample_interval = sample_interval
+        self.set_spill(spill_path)
+        self.compact()
+
+    def set_spill(self, filepath):
+        """Set the file where evicted solutions are appended (None to discard them)."""
+        spill = self.spill
+        if spill is not None and spill.filepath != filepath:
+            spill.close()
+            spill = None
+        if spill is None and filepath is not None:
+            spill = SolutionSpill(filepath)
+        self.spill = spill
+
+    def compact(self):
+        """Apply the retention policy, evicting the solutions which are neither among the
+        'keep_best' best nor a trajectory sample.  This is called automatically whenever the list
+        doubles in size since the last compaction."""
+        keep_best = self.keep_best
+        if keep_best == INF:
+            self.next_compaction = None
+            return
+        is_better = self.solver.sense.is_better
+
+        def compare(a, b):
+            if is_better(a.value, b.value):
+                return -1
+            if is_better(b.value, a.value):
+                return 1
+            return 0
+
+        kept = set(id(sol) for sol in sorted(self, cmp=compare)[:int(keep_best)])
+        interval = self.sample_interval
+        if interval is not None and interval > 0.0:
+            samples = {}
+            for sol in self:
+                bucket = int(sol.meta.cpu // interval)
+                sample = samples.get(bucket)
+                if sample is None or is_better(sol.value, sample.value):
+                    samples[bucket] = sol
+            kept.update(id(sol) for sol in samples.itervalues())
+        evicted = [sol for sol in self if id(sol) not in kept]
+        if len(evicted) > 0:
+            if self.spill is not None:
+                self.spill.write(evicted)
+            self[:] = [sol for sol in self if id(sol) in kept]
+        self.next_compaction = 2 * len(self) + 16
+
     def best(self):
         """Returns the best solution in the list, or None if the list is empty."""
         if len(self) == 0:
@@ -93,17 +270,21 @@ class SolutionList(list):
         self.checked_sol = sol_container
         self.checked_obj = value
         solver.channel.emit(solver.SIGNALS.CHECKING_SOLUTION)
-        if isinstance(value, Infeasible):
-            if value < self.least_infeas_value or value > self.most_infeas_value:
-                return self.append(sol_container, value, **meta)
-        else:
-            is_better = solver.sense.is_better
-            if is_better(value, self.best_feas_value) or is_better(self.worst_feas_value, value):
-                return self.append(sol_container, value, **meta)
+        if self.accepts(value):
+            return self.append(sol_container, value, **meta)
         if value == self.best_value:
             solver.channel.emit(solver.SIGNALS.BEST_SOL_ALTERNATIVE)
         return None
 
+    def accepts(self, value):
+        """Returns True if a solution with objective value 'value' would be added to the list by
+        check(), i.e. if it is better/worse than the current best/worst feasible or infeasible
+        values."""
+        if isinstance(value, Infeasible):
+            return value < self.least_infeas_value or value > self.most_infeas_value
+        is_better = self.solver.sense.is_better
+        return is_better(value, self.best_feas_value) or is_better(self.worst_feas_value, value)
+
     def append(self, sol_container, value=None, **meta):
         """Creates a new solution and appends it to the solution list.  The solver's incumbent
         value is updated if necessary. The new Solution object is returned."""
@@ -118,12 +299,28 @@ class SolutionList(list):
         sol.meta.update(meta)
         sol.meta.setdefault("cpu", solver.cpu.total)
         sol.meta.setdefault("iteration", solver.iters.total+1)
+        self.log.append(sol.meta.cpu, sol.meta.iteration, value)
         solver.channel.emit(solver.SIGNALS.SOLUTION_ADDED)
         list.append(self, sol)
+        if self.keep_best < INF and (self.next_compaction is None or
+                                     len(self) >= self.next_compaction):
+            self.compact()
         return sol
 
     add = append
 
+    def merge(self, solutions):
+        """Append existing Solution objects (e.g. found by other solvers) to the list, in the
+        given order, updating the list's statistics and the solver's incumbent.  Their metadata
+        is kept as is."""
+        for sol in solutions:
+            self._update_stats(sol.value)
+            self.log.append(sol.meta.cpu, sol.meta.iteration, sol.value)
+            list.append(self, sol)
+            if self.keep_best < INF and (self.next_compaction is None or
+                                         len(self) >= self.next_compaction):
+                self.compact()
+
     def _update_stats(self, value):
         """Updates the solution list's statistics with the value of a solution that is being
         added to the list.  Updated stats include (in)feasible solution counts, best/worst
@@ -155,9 +352,9 @@ class SolutionList(list):
     # ------------------------------------------------------------------------------
     @staticmethod
     def make_tseries(solutions, extend_to=None):
-        """Given an iterable of solutions, creates a time series of objective function values
-        over cpu time.  If 'extend_to' is not None, the time series' last value is repeated at
-        t = 'extend_to'."""
+        """Given an iterable of solutions (or SolutionRecord objects), creates a time series of
+        objective function values over cpu time.  If 'extend_to' is not None, the time series'
+        last value is repeated at t = 'extend_to'."""
         tseries = TimeSeries.from_iterable((sol.meta.cpu, sol.value) for sol in solutions)
         if extend_to is not None and extend_to > tseries.time:
             tseries.append(extend_to, tseries.value)
@@ -179,39 +376,39 @@ class SolutionList(list):
         return axes
 
     def best_feas_seq(self):
-        """Produces a sequence of solutions that caused the best feasible solution value to be
-        updated."""
+        """Produces a sequence of records (from the solution log) of the solutions that caused the
+        best feasible solution value to be updated."""
         is_better = self.solver.sense.is_better
         best = self.solver.sense.worst_value
-        for sol in self:
+        for sol in self.log:
             if sol.is_feasible and is_better(sol.value, best):
                 best = sol.value
                 yield sol
 
     def worst_feas_seq(self):
-        """Produces a sequence of solutions that caused the worst feasible solution value to be
-        updated."""
+        """Produces a sequence of records (from the solution log) of the solutions that caused the
+        worst feasible solution value to be updated."""
         is_better = self.solver.sense.is_better
         worst = self.solver.sense.best_value
-        for sol in self:
+        for sol in self.log:
             if sol.is_feasible and is_better(worst, sol.value):
                 worst = sol.value
                 yield sol
 
     def least_infeas_seq(self):
-        """Produces a sequence of solutions that caused the least infeasible solution value to be
-        updated."""
+        """Produces a sequence of records (from the solution log) of the solutions that caused the
+        least infeasible solution value to be updated."""
         best = INF
-        for sol in self:
+        for sol in self.log:
             if sol.is_infeasible and sol.value < best:
                 best = sol.value
                 yield sol
 
     def most_infeas_seq(self):
-        """Produces a sequence of solutions that caused the most infeasible solution value to be
-        updated."""
+        """Produces a sequence of records (from the solution log) of the solutions that caused the
+        most infeasible solution value to be updated."""
         worst = 0.0
-        for sol in self:
+        for sol in self.log:
             if sol.is_infeasible and sol.value > worst:
                 worst = sol.value
                 yield sol
@@ -0,0 +1,410 @@
+"""
+Automatic parameter tuning by iterated racing (iterated F-race, as in the irace package).
+
+The tuned parameters are given as ranges over the parameters of the solver's ParamSet (see
+TunedParam), and the tuner repeats the following steps until its budget of solver runs is spent:
+
+    - sample a set of candidate configurations, uniformly in the first iteration and afterwards
+      around the elite configurations of the previous race, with a spread that shrinks from one
+      iteration to the next;
+    - race the candidates (elites included) on a stream of instances: in each step, all surviving
+      candidates are run on a batch of new instances (in parallel), and once 'first_test'
+      instances have been seen, the Friedman test is used to drop the candidates that are
+      statistically worse than the best (see friedman_survivors());
+    - keep the best survivors of the race as the elites of the next iteration.
+
+Runs are identified by their position in the instance stream, which fixes the instance and the
+seed of the run, so the results of the elites are reused by the following races instead of being
+recomputed.  Since solver classes, instances and cost functions are sent to worker processes,
+they must be picklable.
+"""
+from copy import deepcopy
+from math import sqrt, log
+from multiprocessing import Pool, cpu_count
+from random import Random
+from sys import stdout
+
+from utils.interval import Interval
+from utils.container import InContainer
+from utils.misc import INF
+from utils.prettyrepr import prettify_class
+
+from opt.infeasible import Infeasible
+
+from .sense import MAX
+
+
+def normal_quantile(p):
+    """Inverse of the standard normal cdf (P. J. Acklam's rational approximation, with a relative
+    error below 1.2e-9)."""
+    if not 0.0 < p < 1.0:
+        raise ValueError("probability outside (0, 1): {!r}".format(p))
+    if p < 0.02425:
+        q = sqrt(-2.0 * log(p))
+        return ((((((-7.784894002430293e-03 * q - 3.223964580411365e-01) * q -
+                    2.400758277161838e+00) * q - 2.549732539343734e+00) * q +
+                  4.374664141464968e+00) * q + 2.938163982698783e+00) /
+                ((((7.784695709041462e-03 * q + 3.224671290700398e-01) * q +
+                   2.445134137142996e+00) * q + 3.754408661907416e+00) * q + 1.0))
+    if p > 1.0 - 0.02425:
+        return -normal_quantile(1.0 - p)
+    q = p - 0.5
+    r = q * q
+    return ((((((-3.969683028665376e+01 * r + 2.209460984245205e+02) * r -
+                2.759285104469687e+02) * r + 1.383577518672690e+02) * r -
+              3.066479806614716e+01) * r + 2.506628277459239e+00) * q /
+            (((((-5.447609879822406e+01 * r + 1.615858368580409e+02) * r -
+                1.556989798598866e+02) * r + 6.680131188771972e+01) * r -
+              1.328068155288572e+01) * r + 1.0))
+
+
+def chi2_quantile(p, df):
+    """Quantile of the chi-squared distribution with 'df' degrees of freedom (Wilson-Hilferty
+    approximation)."""
+    z = normal_quantile(p)
+    h = 2.0 / (9.0 * df)
+    return df * max(0.0, 1.0 - h + z * sqrt(h)) ** 3
+
+
+def t_quantile(p, df):
+    """Quantile of Student's t distribution with 'df' degrees of freedom (Cornish-Fisher
+    expansion, see Abramowitz and Stegun 26.7.5)."""
+    z = normal_quantile(p)
+    z2 = z * z
+    g1 = (z2 + 1.0) * z / 4.0
+    g2 = ((5.0 * z2 + 16.0) * z2 + 3.0) * z / 96.0
+    g3 = (((3.0 * z2 + 19.0) * z2 + 17.0) * z2 - 15.0) * z / 384.0
+    g4 = ((((79.0 * z2 + 776.0) * z2 + 1482.0) * z2 - 1920.0) * z2 - 945.0) * z / 92160.0
+    v = float(df)
+    return z + g1 / v + g2 / v ** 2 + g3 / v ** 3 + g4 / v ** 4
+
+
+def block_ranks(costs):
+    """Ranks (starting at 1) of 'costs' within a block, with tied costs sharing their mean rank."""
+    order = sorted(xrange(len(costs)), key=costs.__getitem__)
+    ranks = [None] * len(costs)
+    i = 0
+    while i < len(order):
+        j = i + 1
+        while j < len(order) and costs[order[j]] == costs[order[i]]:
+            j += 1
+        rank = (i + j + 1) / 2.0
+        for index in order[i:j]:
+            ranks[index] = rank
+        i = j
+    return ranks
+
+
+def friedman_survivors(costs, confidence=0.95):
+    """Friedman test with Conover's post-hoc comparisons, as used by F-race.  'costs' is a list of
+    blocks (one per instance), each with the costs of the k candidates (lower is better).  Returns
+    the indices of the candidates which are not significantly worse than the best candidate at
+    the given confidence level, or all the indices if the test finds no significant difference."""
+    n = len(costs)
+    k = len(costs[0]) if n > 0 else 0
+    if n < 2 or k < 2:
+        return range(k)
+    ranks = [block_ranks(block) for block in costs]
+    rank_sums = [sum(block[j] for block in ranks) for j in xrange(k)]
+    a = sum(rank * rank for block in ranks for rank in block)
+    c = n * k * (k + 1) ** 2 / 4.0
+    if a - c <= 1e-12:
+        return range(k)  # all candidates tied on every instance
+    t = (k - 1) * sum((r - n * (k + 1) / 2.0) ** 2 for r in rank_sums) / (a - c)
+    if t <= chi2_quantile(confidence, k - 1):
+        return range(k)
+    dof = (n - 1) * (k - 1)
+    variance = max(0.0, 2.0 * (n * a - sum(r * r for r in rank_sums)) / dof)
+    critical = t_quantile(1.0 - (1.0 - confidence) / 2.0, dof) * sqrt(variance)
+    best = min(rank_sums)
+    return [j for j in xrange(k) if rank_sums[j] - best <= critical]
+
+
+# ------------------------------------------------------------------------------
+@prettify_class
+class TunedParam(object):
+    """
+    A solver parameter and the range of values sampled by the tuner.  Ranges are Interval objects
+    for numeric parameters (sampled as integers if both ends of the interval are integers) and
+    sequences of values for categorical parameters.
+    """
+    __slots__ = ("name",         # name of the parameter in the solver's ParamSet
+                 "range",        # Interval or tuple of values
+                 "is_numeric",   # True if 'range' is an Interval
+                 "is_integer")   # True if numeric values are rounded to integers
+
+    def __init__(self, name, range):
+        self.name = name
+        if isinstance(range, Interval):
+            if range.start == -INF or range.end == INF:
+                raise ValueError("{!r}: unbounded tuning range {!r}".format(name, range))
+            self.range = range
+            self.is_numeric = True
+            self.is_integer = all(isinstance(x, (int, long)) for x in (range.start, range.end))
+        else:
+            self.range = tuple(range)
+            self.is_numeric = False
+            self.is_integer = False
+            if len(self.range) == 0:
+                raise ValueError("{!r}: empty tuning range".format(name))
+
+    def __info__(self):
+        return "{}, {!r}".format(self.name, self.range)
+
+    @classmethod
+    def from_paramset(cls, paramset_cls, name, range=None):
+        """Create a tuned parameter for parameter 'name' of 'paramset_cls'.  If no range is given,
+        the parameter's domain is used, which must be a finite sequence of values or a bounded
+        interval.  Explicit ranges are checked against the domain."""
+        param = getattr(paramset_cls, name, None)
+        if param is None or not hasattr(param, "domain"):
+            raise ValueError("{} has no parameter {!r}".format(paramset_cls.__name__, name))
+        domain = param.domain
+        if range is None:
+            if not isinstance(domain, InContainer):
+                raise ValueError("{!r}: no tuning range given and the parameter's domain cannot "
+                                 "be sampled".format(name))
+            range = domain.container
+        elif domain is not None:
+            values = (range.start, range.end) if isinstance(range, Interval) else range
+            for value in values:
+                if value not in domain:
+                    raise ValueError("{!r}: tuning range outside domain ({!r} not in {!r})"
+                                     .format(name, value, domain))
+        return cls(name, range)
+
+    def uniform(self, rng):
+        """Sample a value uniformly from the range."""
+        if not self.is_numeric:
+            return rng.choice(self.range)
+        start, end = self.range.start, self.range.end
+        if self.is_integer:
+            return rng.randint(start, end)
+        return rng.uniform(start, end)
+
+    def perturb(self, rng, value, spread):
+        """Sample a value around 'value'.  For numeric parameters, this draws from a normal
+        distribution with a standard deviation of 'spread' times the width of the range
+        (truncated to the range), and for categorical parameters a uniformly sampled value
+        replaces 'value' with probability 'spread'."""
+        if not self.is_numeric:
+            return self.uniform(rng) if rng.random() < spread else value
+        start, end = self.range.start, self.range.end
+        sigma = spread * (end - start)
+        for _ in xrange(100):
+            x = rng.gauss(value, sigma)
+            if start <= x <= end:
+                break
+        else:
+            x = min(max(x, start), end)
+        if self.is_integer:
+            return int(round(x))
+        return x
+
+
+def solution_cost(solver):
+    """Default cost of a solver run: the final incumbent value, negated when maximizing so that
+    lower costs are always better.  Runs which found no feasible solution cost infinity."""
+    incumbent = solver.incumbent
+    if incumbent is None or isinstance(incumbent, Infeasible):
+        return INF
+    return -incumbent if solver.sense is MAX else incumbent
+
+
+def _evaluate(args):
+    """Process target running one configuration on one instance and returning its cost.  The
+    limits are copied, since plugins cannot be installed on several solvers."""
+    key, position, solver_cls, instance, params, limits, cost = args
+    solver = solver_cls()
+    solver.init(instance=instance, **params)
+    solver.run(*deepcopy(limits))
+    return key, position, cost(solver)
+
+
+# ------------------------------------------------------------------------------
+@prettify_class
+class RacingTuner(object):
+    """
+    Iterated racing tuner for the parameters of 'solver_cls' (see the module documentation).
+
+    'instances' is the list of tuning instances, 'ranges' maps the names of the tuned parameters
+    to their ranges (None to use the parameter's domain, see TunedParam.from_paramset()),
+    'params' holds fixed values for other parameters, and each run is stopped by 'limits' (e.g.
+    [Limit.Cpu(rel=10.0)]).  'cost' is a function of the solver after its run (lower is better,
+    see solution_cost()), and 'budget' is the total number of solver runs.  Runs are distributed
+    over 'processes' worker processes (one per cpu if None, and no pool at all if 1).
+    Unless 'seed' is one of the tuned or fixed parameters, each position of the instance stream
+    has its own solver seed, so stochastic solvers see different seeds on repeated instances.
+    """
+    first_test = 5      # number of instances seen before the first elimination test
+    confidence = 0.95   # confidence level of the statistical tests
+    max_elites = 5      # maximum number of elite configurations kept from a race
+
+    def __init__(self, solver_cls, instances, ranges, params=None, limits=(),
+                 cost=solution_cost, budget=1000, processes=None, seed=0):
+        if len(instances) == 0:
+            raise ValueError("no tuning instances given")
+        if len(ranges) == 0:
+            raise ValueError("no tuned parameters given")
+        if processes is None or processes <= 0:
+            processes = cpu_count()
+        self.solver_cls = solver_cls
+        self.instances = list(instances)
+        self.tuned = [TunedParam.from_paramset(solver_cls.ParamSet, name, range)
+                      for name, range in sorted(ranges.iteritems())]
+        self.params = {} if params is None else dict(params)
+        self.limits = list(limits)
+        self.cost = cost
+        self.budget = budget
+        self.processes = processes
+        self.rng = Random(seed)
+        self.stream = []      # [(instance index, seed)] identifying the runs at each position
+        self.results = {}     # {configuration key: {stream position: cost}}
+        self.configs = {}     # {configuration key: configuration dict}
+        self.elites = []      # keys of the current elite configurations, best first
+        self.races = []       # [(candidates, survivors, instances, runs)] of each race
+        self.runs = 0         # number of solver runs performed so far
+        self.pool = None
+
+    def __info__(self):
+        return "runs={}/{}, races={}, best={}".format(self.runs, self.budget, len(self.races),
+                                                      self.best)
+
+    @property
+    def best(self):
+        """The best configuration found so far (None if the tuner was not run yet)."""
+        return None if len(self.elites) == 0 else dict(self.configs[self.elites[0]])
+
+    # --------------------------------------------------------------------------
+    def run(self, ostream=None):
+        """Run iterated races until the budget is spent and return the best configuration.
+        Progress is written to 'ostream' (if given)."""
+        iterations = 2 + int(log(max(1, len(self.tuned)), 2))
+        if self.processes > 1:
+            self.pool = Pool(self.processes)
+        try:
+            iteration = 0
+            while True:
+                race_budget = (self.budget - self.runs) / max(1, iterations - iteration)
+                count = race_budget / (self.first_test + min(5, iteration + 1))
+                if count <= max(1, len(self.elites)):
+                    break
+                candidates = self.elites + self.sample(count - len(self.elites), iteration)
+                if not self.race(candidates, self.runs + race_budget):
+                    break
+                iteration += 1
+                if ostream is not None:
+                    candidates, survivors, instances, runs = self.races[-1]
+                    ostream.write("race {}: {} candidates, {} survivors, {} instances, "
+                                  "{} runs ({}/{} in total)\n"
+                                  .format(iteration, candidates, survivors, instances, runs,
+                                          self.runs, self.budget))
+        finally:
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool.join()
+                self.pool = None
+        if ostream is not None:
+            self.report(ostream)
+        return self.best
+
+    def sample(self, count, iteration):
+        """Sample 'count' new configurations, uniformly if there are no elites, and otherwise
+        around elites chosen with probability decreasing with their rank."""
+        configs = []
+        elites = self.elites
+        weights = [len(elites) - i for i in xrange(len(elites))]
+        spread = (1.0 / (count + len(elites))) ** (float(iteration) / len(self.tuned))
+        for _ in xrange(10 * count):
+            if len(configs) == count:
+                break
+            if len(elites) == 0:
+                config = dict((p.name, p.uniform(self.rng)) for p in self.tuned)
+            else:
+                parent = self.configs[elites[self._weighted_index(weights)]]
+                config = dict((p.name, p.perturb(self.rng, parent[p.name], spread))
+                              for p in self.tuned)
+            key = self._key(config)
+            if key not in self.configs:
+                self.configs[key] = config
+                self.results[key] = {}
+                configs.append(key)
+        return configs
+
+    def race(self, candidates, max_runs):
+        """Race 'candidates' (configuration keys) until a single one survives, the instance
+        stream has been seen twice, or the next step would exceed 'max_runs' total runs.  The best
+        survivors (by mean rank) become the new elites.  Returns False if the budget did not allow
+        a single race step."""
+        alive = list(candidates)
+        runs = self.runs
+        seen = 0
+        while len(alive) > 1 and seen < 2 * len(self.instances):
+            size = max(1, min(self.processes, max_runs - self.runs) / len(alive))
+            positions = range(seen, seen + size)
+            missing = [(key, pos) for pos in positions for key in alive
+                       if pos not in self.results[key]]
+            if self.runs + len(missing) > max_runs:
+                break
+            self.evaluate(missing)
+            seen += size
+            if seen >= self.first_test:
+                costs = [[self.results[key][pos] for key in alive] for pos in xrange(seen)]
+                alive = [alive[j] for j in friedman_survivors(costs, self.confidence)]
+        if seen == 0:
+            return False
+        costs = [[self.results[key][pos] for key in alive] for pos in xrange(seen)]
+        rank_sums = [sum(ranks) for ranks in zip(*[block_ranks(block) for block in costs])]
+        order = sorted(xrange(len(alive)), key=rank_sums.__getitem__)
+        self.elites = [alive[j] for j in order[:self.max_elites]]
+        self.races.append((len(candidates), len(alive), seen, self.runs - runs))
+        return True
+
+    def evaluate(self, runs):
+        """Perform the (configuration key, stream position) 'runs' and record their costs."""
+        tasks = []
+        for key, position in runs:
+            instance_index, seed = self._stream_entry(position)
+            params = dict(self.params)
+            params.setdefault("seed", seed)
+            params.update(self.configs[key])
+            tasks.append((key, position, self.solver_cls, self.instances[instance_index],
+                          params, self.limits, self.cost))
+        if self.pool is None:
+            outputs = map(_evaluate, tasks)
+        else:
+            outputs = self.pool.map(_evaluate, tasks)
+        for key, position, cost in outputs:
+            self.results[key][position] = cost
+        self.runs += len(tasks)
+
+    def report(self, ostream=stdout):
+        """Write the elite configurations and their mean costs to 'ostream'."""
+        for rank, key in enumerate(self.elites):
+            costs = self.results[key].values()
+            mean = float(sum(costs)) / len(costs) if len(costs) > 0 else INF
+            ostream.write("#{} (mean cost {} over {} runs): {}\n"
+                          .format(rank + 1, mean, len(costs), self.configs[key]))
+
+    # --------------------------------------------------------------------------
+    def _stream_entry(self, position):
+        """Instance index and seed of the run at 'position' of the instance stream, which is
+        extended with shuffled passes over the instances as needed."""
+        stream = self.stream
+        while position >= len(stream):
+            order = range(len(self.instances))
+            self.rng.shuffle(order)
+            stream.extend((index, self.rng.getrandbits(32)) for index in order)
+        return stream[position]
+
+    def _weighted_index(self, weights):
+        x = self.rng.random() * sum(weights)
+        for i, weight in enumerate(weights):
+            x -= weight
+            if x < 0.0:
+                return i
+        return len(weights) - 1
+
+    @staticmethod
+    def _key(config):
+        return tuple(sorted(config.iteritems()))
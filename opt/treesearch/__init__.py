@@ -1,5 +1,7 @@
 from .node import TreeNode
 from .mcts import MCTS
+from .beam import BeamSearch
+from .lds import LDS
 
 
-__all__ = ["TreeNode", "MCTS"]
+__all__ = ["TreeNode", "MCTS", "BeamSearch", "LDS"]
@@ -0,0 +1,277 @@
+"""
+Parallel (distributed) branch-and-bound on top of the utils.parallel Dispatcher and Worker.
+
+Each worker process owns a local node queue and explores it in slices of 'slice_size' queue
+elements per request.  Since workers can only communicate with the master (through the
+dispatcher), work stealing and incumbent sharing happen at slice boundaries:
+
+    - every explore request carries the global incumbent, which the worker uses to prune its
+      queue and to filter the leaves it reports back;
+    - the request also tells the worker how many of its peers are idle, and the worker splits
+      off a share of its queue for each of them (see NodeQueue.split()), which the master then
+      sends to the idle workers;
+    - leaves improving the incumbent known by the worker are sent back and checked by the
+      master's SolutionList, which updates the global incumbent.
+
+The master knows the size of the queue of each worker (reported at the end of each slice) and
+which workers have requests in progress, and stolen elements are dispatched in the same step in
+which they are received, so the search is finished exactly when no worker is busy and all the
+reported queue sizes are zero.  With 'path_storage', each worker keeps its open nodes as paths
+in its own NodePathStore, and the parents of stolen elements are materialized before being sent
+(paths are local to the worker that created them).  Nodes, queue classes and node classes are sent to other
+processes, so they must be picklable.
+"""
+from Queue import Empty
+
+from utils.misc import INF
+from utils.interval import Interval
+from utils.parallel import Dispatcher, Worker, Request
+
+from opt.solver import Solver
+from opt.solver.sense import OptimizationSense
+
+from opt.treesearch.node import TreeNode
+
+from .solver import TreeSearch
+from .params import TreeSearchParamSet
+from .paths import NodePath, NodePathStore
+
+
+class TreeSearchWorker(Worker):
+    """Worker process running a local branch-and-bound on its own node queue."""
+    INIT = "init"
+    EXPLORE = "explore"
+
+    def on_initialize(self):
+        self.queue = None
+        self.sense = None
+        self.pruning = None
+        self.slice_size = None
+        self.incumbent = None
+        self.paths = None  # NodePathStore (only when using path storage)
+
+    def on_request(self, req):
+        if req.type == self.INIT:
+            queue_class, sense, pruning, slice_size, path_cache_size = req.data
+            self.queue = queue_class()
+            self.sense = OptimizationSense.get(sense)
+            self.pruning = pruning
+            self.slice_size = slice_size
+            self.incumbent = self.sense.worst_value
+            if path_cache_size is not None:
+                self.paths = NodePathStore(sense, path_cache_size)
+            return None
+        elif req.type == self.EXPLORE:
+            elems, incumbent, parts = req.data
+            return self.explore(elems, incumbent, parts)
+        else:
+            raise Exception("unknown request type -- {}".format(req.type))
+
+    def explore(self, elems, incumbent, parts):
+        """Add 'elems', a list of (queue element, depth) pairs (see NodeQueue.split()), to the
+        local queue and process up to 'slice_size' queue elements.  Returns a list of (leaf,
+        objective value) pairs with the leaves that improved the incumbent, a list of 'parts'
+        lists of (element, depth) pairs split off for other workers, and the number of elements
+        left in the local queue."""
+        queue = self.queue
+        is_better = self.sense.is_better
+        if is_better(incumbent, self.incumbent):
+            self.incumbent = incumbent
+            if self.pruning:
+                queue.prune(incumbent, is_better)
+        for elem, depth in elems:
+            if depth is None:
+                queue.put(elem)
+            else:
+                queue.put(elem, depth)
+        leaves = []
+        count = 0
+        while len(queue) > 0 and count < self.slice_size:
+            elem = queue.get()
+            if isinstance(elem, TreeNode):
+                self._expand_node(elem, leaves)
+            else:
+                parent, branch = elem
+                path = None
+                if isinstance(parent, NodePath):
+                    path = parent
+                    parent = path.materialize()
+                child = parent.copy()
+                child.apply(branch)
+                if child.is_leaf():
+                    self._check_leaf(child, leaves)
+                elif not self.pruning:
+                    self._expand_node(child, leaves, path, branch)
+                else:
+                    bound = child.bound()
+                    if is_better(bound, self.incumbent):
+                        self._expand_node(child, leaves, path, branch, bound)
+            count += 1
+        groups = queue.split(parts) if parts > 0 and len(queue) > 1 else []
+        if self.paths is not None:
+            groups = [self._materialize_parents(group) for group in groups]
+        return leaves, groups, len(queue)
+
+    def _expand_node(self, node, leaves, parent_path=None, branch=None, bound=None):
+        """Same as TreeSearch._expand_node(), but with the worker's incumbent."""
+        parent = node
+        if self.paths is not None:
+            if parent_path is None:
+                parent = self.paths.root(node)
+            else:
+                parent = self.paths.child(parent_path, branch, node, bound)
+        branches = 0
+        is_better = self.sense.is_better
+        for branch in node.branches():
+            if isinstance(branch, TreeNode):
+                if branch.is_leaf():
+                    self._check_leaf(branch, leaves)
+                elif not self.pruning or is_better(branch.bound(), self.incumbent):
+                    self.queue.put(branch)
+            else:
+                self.queue.put((parent, branch))
+            branches += 1
+        if branches == 0:
+            self._check_leaf(node, leaves)
+
+    @staticmethod
+    def _materialize_parents(group):
+        """Replace the parent paths in a group of (element, depth) pairs split off the queue by
+        the parent nodes, since paths cannot be used by other workers.  Siblings share the same
+        parent node."""
+        nodes = {}
+        materialized = []
+        for elem, depth in group:
+            if not isinstance(elem, TreeNode) and isinstance(elem[0], NodePath):
+                path, branch = elem
+                node = nodes.get(path)
+                if node is None:
+                    node = nodes[path] = path.materialize()
+                elem = (node, branch)
+            materialized.append((elem, depth))
+        return materialized
+
+    def _check_leaf(self, leaf, leaves):
+        """Leaves are only reported to the master if they improve the worker's incumbent."""
+        value = leaf.objective()
+        if self.sense.is_better(value, self.incumbent):
+            self.incumbent = value
+            leaves.append((leaf, value))
+
+
+class ParallelTreeSearchParamSet(TreeSearchParamSet):
+    workers = Solver.Param(description="number of worker processes",
+                           options="0 to use one worker per cpu",
+                           domain=Interval(0, INF),
+                           default=0)
+
+    @workers.adapter
+    def workers(self, n):
+        return int(n)
+
+    # --------------------------------------------------------------------------
+    slice_size = Solver.Param(description=("number of queue elements processed by a worker "
+                                           "between two exchanges with the master"),
+                              domain=Interval(1, INF),
+                              default=1000)
+
+    @slice_size.adapter
+    def slice_size(self, size):
+        return int(size)
+
+
+class ParallelTreeSearch(TreeSearch):
+    """
+    Distributed version of TreeSearch, where the queue is split among worker processes which
+    steal work from each other and share the incumbent (see the module documentation).  Each
+    iteration of the master handles the result of one explore request.
+    """
+    ParamSet = ParallelTreeSearchParamSet
+    Worker = TreeSearchWorker
+    default_plugins = list(Solver.default_plugins)
+
+    def __init__(self, *args, **kwargs):
+        self.dispatcher = None
+        self.dispatcher_thread = None
+        self.queued = {}  # {worker name: number of elements in the worker's queue}
+        self.busy = set()  # names of the workers with an explore request in progress
+        TreeSearch.__init__(self, *args, **kwargs)
+        self.channel.listen(self.SIGNALS.SOLVER_FINISHED, self.close_workers)
+
+    def _bootstrap(self):
+        """Start the workers and send them the root node (put in the queue by TreeSearch)."""
+        TreeSearch._bootstrap(self)
+        dispatcher = self.dispatcher = Dispatcher("treesearch")
+        dispatcher.add_workers(self.Worker, count=self.params.workers)
+        self.dispatcher_thread = dispatcher.run(separate_thread=True)
+        elems = [(elem, None) for elem in self.queue]
+        self.queue.clear()
+        sense = OptimizationSense.get(type(elems[0][0]).sense).name
+        path_cache_size = self.params.path_cache_size if self.params.path_storage else None
+        dispatcher.dispatch(Request.broadcast(TreeSearchWorker.INIT,
+                                              (self.Queue, sense, self.params.pruning,
+                                               self.params.slice_size, path_cache_size)))
+        for _ in xrange(len(dispatcher.workers)):
+            self._get_result()
+        self.queued = dict.fromkeys(dispatcher.workers, 0)
+        self.busy = set()
+        self._explore(sorted(dispatcher.workers)[0], elems)
+
+    def _iterate(self):
+        res = self._get_result()
+        leaves, groups, remaining = res.data
+        source = res.source
+        self.busy.discard(source)
+        self.queued[source] = remaining
+        for leaf, value in leaves:
+            self.solutions.check(leaf, value)
+        # hand the stolen elements to the idle workers (or back to the source if there are none)
+        idle = self._idle_workers()
+        returned = []
+        for elems in groups:
+            if len(idle) > 0 and len(elems) > 0:
+                self._explore(idle.pop(), elems)
+            else:
+                returned.extend(elems)
+        if len(returned) > 0:
+            self._explore(source, returned)
+        # keep the workers with non-empty queues busy
+        for name, queued in self.queued.iteritems():
+            if queued > 0 and name not in self.busy:
+                self._explore(name, [])
+        if len(self.busy) == 0:
+            self.interrupts.add("all worker queues are empty", Solver.ACTION.FINISH)
+
+    def _idle_workers(self):
+        return [name for name, queued in sorted(self.queued.iteritems())
+                if queued == 0 and name not in self.busy]
+
+    def _explore(self, name, elems):
+        """Send an explore request to worker 'name', asking it to split its queue with the workers
+        that are idle at this time."""
+        parts = len([other for other in self._idle_workers() if other != name])
+        self.busy.add(name)
+        self.queued[name] += len(elems)
+        self.dispatcher.dispatch(Request(TreeSearchWorker.EXPLORE,
+                                         (elems, self.incumbent, parts),
+                                         target=name))
+
+    def _get_result(self):
+        res = self.dispatcher.results.get(True, INF)
+        if isinstance(res.data, Exception):
+            raise Exception("worker {} failed with {!r}\n{}"
+                            .format(res.source, res.data, getattr(res.data, "traceback", "")))
+        return res
+
+    def close_workers(self):
+        """Stop the worker processes (pending explore requests are finished and discarded)."""
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+            self.dispatcher_thread.join()
+            while True:
+                try:
+                    self.dispatcher.results.get_nowait()
+                except Empty:
+                    break
+            self.dispatcher = None
+            self.dispatcher_thread = None
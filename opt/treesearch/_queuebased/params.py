@@ -1,4 +1,8 @@
+from utils.misc import INF
+from utils.interval import Interval
+
 from opt.solver import Solver
+from opt.solver.params import parse_flag
 
 
 class TreeSearchParamSet(Solver.ParamSet):
@@ -9,13 +13,30 @@ class TreeSearchParamSet(Solver.ParamSet):
 
     @pruning.adapter
     def pruning(self, flag):
-        if isinstance(flag, basestring):
-            flag = flag.strip().lower()
-        if flag in (True, 1, "1", "t", "true"):
-            return True
-        if flag in (False, 0, "0", "f", "false"):
-            return False
-        raise ValueError("unexpected pruning flag value: {!r}".format(flag))
+        return parse_flag("pruning", flag)
+
+    # --------------------------------------------------------------------------
+    path_storage = Solver.Param(description=("flag indicating whether open nodes are kept as "
+                                             "paths of branches from a cached ancestor, instead "
+                                             "of (parent node, branch) pairs"),
+                                options="0/1 or True/False",
+                                domain=(False, True),
+                                default=False)
+
+    @path_storage.adapter
+    def path_storage(self, flag):
+        return parse_flag("path storage", flag)
+
+    # --------------------------------------------------------------------------
+    path_cache_size = Solver.Param(description=("number of materialized nodes kept in an LRU "
+                                                "cache when using path storage"),
+                                   options="0 to disable the cache",
+                                   domain=Interval(0, INF),
+                                   default=1000)
+
+    @path_cache_size.adapter
+    def path_cache_size(self, size):
+        return int(size)
 
     # --------------------------------------------------------------------------
     root_fnc = Solver.Param(description="function used to create the root node",
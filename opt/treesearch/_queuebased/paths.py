@@ -0,0 +1,135 @@
+"""
+Path-encoded node storage for queue-based tree search (see the 'path_storage' parameter).
+
+Instead of keeping a full copy of the parent node in each (parent, branch) queue element, the
+parent is represented by a NodePath, i.e. an entry of a parent-pointer trie of branches.  The
+paths of sibling nodes share their common prefix, so each open node costs a single small object
+rather than a node copy.  Nodes are rebuilt on demand by copying the nearest materialized
+ancestor (a root path, or a path in the store's LRU cache) and applying the missing branches.
+"""
+from collections import OrderedDict
+
+from utils.prettyrepr import prettify_class
+
+
+@prettify_class
+class NodePath(object):
+    """A node represented by its parent path and the branch applied to the parent.  The bound of
+    the node is kept once computed, so that queues and pruning can use it without rebuilding the
+    node."""
+    __slots__ = ("parent",  # NodePath of the parent node
+                 "branch",  # branch applied to the parent node to obtain this node
+                 "store",   # NodePathStore used to materialize the node
+                 "value")   # bound of the node (None if not computed yet)
+
+    def __init__(self, parent, branch, store, value=None):
+        self.parent = parent
+        self.branch = branch
+        self.store = store
+        self.value = value
+
+    def __info__(self):
+        return "depth={}, bound={}".format(self.depth, self.value)
+
+    @property
+    def sense(self):
+        return self.store.sense
+
+    @property
+    def depth(self):
+        depth = 0
+        path = self
+        while not isinstance(path, RootPath):
+            path = path.parent
+            depth += 1
+        return depth
+
+    def bound(self):
+        if self.value is None:
+            self.value = self.store.materialize(self).bound()
+        return self.value
+
+    def materialize(self):
+        """Return the node represented by this path.  The node may be shared with the store's
+        cache, so it should be copied before being modified."""
+        return self.store.materialize(self)
+
+
+class RootPath(NodePath):
+    """The start of a path, which keeps the full node (e.g. the root node, or the nodes put in
+    the queue directly when branches() creates TreeNode objects)."""
+    __slots__ = ("node",)
+
+    def __init__(self, node, store):
+        NodePath.__init__(self, None, None, store)
+        self.node = node
+
+
+@prettify_class
+class NodePathStore(object):
+    """
+    Creates node paths and materializes the nodes they represent.  The most recently materialized
+    nodes are kept in an LRU cache of 'capacity' nodes (a capacity of zero disables the cache), so
+    that consecutive siblings, and the children of recently expanded nodes, are rebuilt with few
+    or no apply() calls.  Larger caches trade memory for less recomputation.
+    """
+    def __init__(self, sense, capacity=1000):
+        self.sense = sense
+        self.capacity = capacity
+        self.cache = OrderedDict()  # {NodePath: TreeNode}, from least to most recently used
+        self.hits = 0               # materializations served directly by the cache or a root
+        self.misses = 0             # materializations requiring copy() and apply() calls
+        self.applies = 0            # number of apply() calls made to rebuild nodes
+
+    def __info__(self):
+        return "capacity={}, cached={}, hits={}, misses={}".format(self.capacity, len(self.cache),
+                                                                   self.hits, self.misses)
+
+    def root(self, node):
+        """Create a root path holding 'node'."""
+        return RootPath(node, self)
+
+    def child(self, parent, branch, node, value=None):
+        """Create the path of 'node', obtained by applying 'branch' to the node of path 'parent',
+        and add the node to the cache."""
+        path = NodePath(parent, branch, self, value)
+        self._cache_node(path, node)
+        return path
+
+    def materialize(self, path):
+        cache = self.cache
+        branches = []
+        ancestor = path
+        while True:
+            if isinstance(ancestor, RootPath):
+                node = ancestor.node
+                break
+            node = cache.pop(ancestor, None)
+            if node is not None:
+                cache[ancestor] = node  # move to the most recently used end
+                break
+            branches.append(ancestor.branch)
+            ancestor = ancestor.parent
+        if len(branches) == 0:
+            self.hits += 1
+            return node
+        self.misses += 1
+        self.applies += len(branches)
+        node = node.copy()
+        for branch in reversed(branches):
+            node.apply(branch)
+        self._cache_node(path, node)
+        return node
+
+    def _cache_node(self, path, node):
+        cache = self.cache
+        if self.capacity > 0:
+            cache[path] = node
+            while len(cache) > self.capacity:
+                cache.popitem(last=False)
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+        self.applies = 0
@@ -1,8 +1,10 @@
 from sys import stdout
 from collections import deque
+from heapq import heappush, heappop, heapify
 from utils.misc import INF
 
 from opt.solver import Solver, Plugin
+from opt.solver.sense import OptimizationSense
 
 from .node import TreeNode
 
@@ -32,6 +34,19 @@ class NodeQueue(deque):
             else:
                 self.popleft()
 
+    def split(self, parts):
+        """Remove elements from the queue to share them with 'parts' other queues (e.g. in
+        parallel tree search).  Elements are dealt in queue order to 'parts' + 1 groups, and the
+        queue keeps the first group.  Returns a list with the other groups, some of which may be
+        empty if the queue has less than 'parts' + 1 elements.  Each group is a list of
+        (element, depth) pairs, where the depth is None for queues which do not keep track of it,
+        and can be given to the receiving queue's put()."""
+        elems = list(self)
+        groups = [elems[i::parts+1] for i in xrange(parts+1)]
+        self.clear()
+        self.extend(groups[0])
+        return [[(elem, None) for elem in group] for group in groups[1:]]
+
     def pprint(self, start=0, n=INF, ostream=stdout):
         """Starting from index 'start', print 'n' elements in the queue."""
         for x in xrange(start, min(start + n, len(self))):
@@ -69,8 +84,132 @@ class BFS_NodeQueue(NodeQueue):
     get = NodeQueue.popleft
 
 
+class BestFirst_NodeQueue(NodeQueue):
+    """
+    Best-first queue, where get() returns the element with the best bound.  The bound of each
+    element is computed once, when it is put in the queue (for (parent, branch) pairs, the
+    parent's bound is used), and kept in the queue's entries.  Elements are stored in two heaps
+    sharing the same entries: one ordered by priority (see priority()), from which get() takes
+    elements, and one ordered from worst to best bound, from which prune() removes the elements
+    whose bound is no longer better than the cutoff in O(k log n) for k pruned elements.  Entries
+    removed through one heap are only marked as such, and skipped when they reach the top of the
+    other heap (the heaps are rebuilt when dead entries outnumber the live ones).
+    The queue also keeps the depth of each element, assuming that the elements put in the queue
+    after a get() are the children of the element that was taken (the first element put in the
+    queue is the root, at depth 0), unless put() is given an explicit depth (e.g. for elements
+    split off from another queue).
+    """
+    def __init__(self, iterable=()):
+        NodeQueue.__init__(self)
+        self.sign = None        # 1 for minimization, -1 for maximization (from the nodes' sense)
+        self.best = []          # heap of (priority, entry) pairs
+        self.worst = []         # heap of (-sign * bound, seq, entry) tuples
+        self.live = 0           # number of live entries
+        self.seq = 0            # insertion counter, used to break ties in FIFO order
+        self.depth = -1         # depth of the last element taken from the queue
+        for elem in iterable:
+            self.put(elem)
+
+    def __len__(self):
+        return self.live
+
+    def __iter__(self):
+        """Iterate over the elements in the queue, from best to worst priority."""
+        return (entry[0] for _, entry in sorted(self.best) if entry[3])
+
+    def __getitem__(self, i):
+        return list(self)[i]
+
+    def clear(self):
+        self.best = []
+        self.worst = []
+        self.live = 0
+        self.seq = 0
+        self.depth = -1
+
+    def split(self, parts):
+        """See NodeQueue.split().  Elements are dealt in priority order, so each group receives a
+        share of the most promising elements."""
+        entries = [entry for _, entry in sorted(self.best) if entry[3]]
+        groups = [[] for _ in xrange(parts)]
+        for i, entry in enumerate(entries):
+            if i % (parts + 1) > 0:
+                groups[i % (parts + 1) - 1].append((entry[0], entry[2]))
+                entry[3] = False
+                self.live -= 1
+        self._compact()
+        return groups
+
+    def priority(self, bound, depth, seq):
+        """Heap key of an element (lower keys are taken first).  Best-first takes the element with
+        the best bound, and the oldest one among elements with equal bounds."""
+        return (self.sign * bound, seq)
+
+    def put(self, elem, depth=None):
+        node = elem if isinstance(elem, TreeNode) else elem[0]
+        if self.sign is None:
+            self.sign = -1 if OptimizationSense.get(node.sense).is_better(1.0, 0.0) else 1
+        bound = node.bound()
+        if depth is None:
+            depth = self.depth + 1
+        seq = self.seq
+        entry = [elem, bound, depth, True]
+        heappush(self.best, (self.priority(bound, depth, seq), entry))
+        heappush(self.worst, (-self.sign * bound, seq, entry))
+        self.live += 1
+        self.seq += 1
+
+    def get(self):
+        best = self.best
+        while True:
+            _, entry = heappop(best)  # raises IndexError if the queue is empty
+            if entry[3]:
+                break
+        entry[3] = False
+        self.live -= 1
+        self.depth = entry[2]
+        self._compact()
+        return entry[0]
+
+    def prune(self, cutoff, is_better):
+        """Remove all elements whose bound is not better than 'cutoff'."""
+        worst = self.worst
+        while len(worst) > 0:
+            entry = worst[0][2]
+            if entry[3]:
+                if is_better(entry[1], cutoff):
+                    break
+                entry[3] = False
+                self.live -= 1
+            heappop(worst)
+        self._compact()
+
+    def _compact(self):
+        """Rebuild the heaps without dead entries when they make up most of the heaps."""
+        if len(self.best) + len(self.worst) > 4 * self.live + 32:
+            self.best = [item for item in self.best if item[1][3]]
+            self.worst = [item for item in self.worst if item[2][3]]
+            heapify(self.best)
+            heapify(self.worst)
+
+
+class BestDepth_NodeQueue(BestFirst_NodeQueue):
+    """
+    Best-first queue biased towards deeper elements, which tends to reach leaves (and thus find
+    incumbent solutions) sooner than pure best-first.  The priority of an element is its bound
+    improved by 'depth_weight' per level of depth, and ties are taken deepest first.  With the
+    default weight of zero, this is best-first with depth-first tie-breaking.
+    """
+    depth_weight = 0.0
+
+    def priority(self, bound, depth, seq):
+        return (self.sign * bound - self.depth_weight * depth, -depth, seq)
+
+
 NodeQueue.DFS = DFS_NodeQueue
 NodeQueue.BFS = BFS_NodeQueue
+NodeQueue.BestFirst = BestFirst_NodeQueue
+NodeQueue.BestDepth = BestDepth_NodeQueue
 
 
 class CheckQueue(Plugin):
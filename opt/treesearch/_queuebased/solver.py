@@ -3,6 +3,7 @@ from opt.solver.solver import Solver
 from .node import TreeNode
 from .opt.treesearch.queuebased.queue import NodeQueue, CheckQueue
 from .opt.treesearch.queuebased.params import TreeSearchParamSet
+from .paths import NodePath, NodePathStore
 
 
 class TreeSearch(Solver):
@@ -21,11 +22,14 @@ class TreeSearch(Solver):
     def uninitialized(self):
         Solver.uninitialized.enter(self)
         self.queue = self.Queue()  # data structure used for keeping open nodes
+        self.paths = None          # NodePathStore (only when using path storage)
 
     def _bootstrap(self):
         """Bootstrapping in tree search consists of generating the root node and putting in the
         queue.  The bound may also be updated if we're using pruning."""
         root = self.params.root_fnc(self)
+        if self.params.path_storage:
+            self.paths = NodePathStore(root.sense, self.params.path_cache_size)
         self.queue.put(root)
         if self.params.pruning:
             root_bound = root.bound()
@@ -41,22 +45,39 @@ class TreeSearch(Solver):
         bound was not better than the incumbent).
         If the element taken from the queue is a (parent, branch) pair, we make a copy of the
         parent node and apply the branch to it. Then, we check if the modified node is a leaf, and
-        finally apply pruning (if applicable) and expand its branches into the queue."""
+        finally apply pruning (if applicable) and expand its branches into the queue.
+        With path storage, the parent in (parent, branch) pairs is a NodePath, which is first
+        materialized into the parent node (see paths.py)."""
         elem = self.queue.get()
         if isinstance(elem, TreeNode):
             self._expand_node(elem)
         else:
             parent, branch = elem
+            path = None
+            if isinstance(parent, NodePath):
+                path = parent
+                parent = path.materialize()
             child = parent.copy()
             child.apply(branch)
             if child.is_leaf():
                 self.solutions.check(child)
-            elif (not self.params.pruning or
-                  self.objective.sense.is_better(child.bound(), self.incumbent)):
-                self._expand_node(child)
+            elif not self.params.pruning:
+                self._expand_node(child, path, branch)
+            else:
+                bound = child.bound()
+                if self.objective.sense.is_better(bound, self.incumbent):
+                    self._expand_node(child, path, branch, bound)
 
-    def _expand_node(self, node):
-        """Expand the node's branch list into the queue."""
+    def _expand_node(self, node, parent_path=None, branch=None, bound=None):
+        """Expand the node's branch list into the queue.  With path storage, the node's branches
+        are paired with the node's path (created from 'parent_path' and 'branch' or, if there is no
+        parent path, as a new root path) instead of the node itself."""
+        parent = node
+        if self.paths is not None:
+            if parent_path is None:
+                parent = self.paths.root(node)
+            else:
+                parent = self.paths.child(parent_path, branch, node, bound)
         branches = 0
         is_better = self.objective.sense.is_better
         for branch in node.branches():
@@ -66,7 +87,7 @@ class TreeSearch(Solver):
                 elif not self.params.pruning or is_better(branch.bound(), self.incumbent):
                     self.queue.put(branch)
             else:
-                self.queue.put((node, branch))
+                self.queue.put((parent, branch))
             branches += 1
         if branches == 0:
             self.solutions.check(node)
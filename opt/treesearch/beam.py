@@ -0,0 +1,82 @@
+from utils.interval import Interval
+from utils.misc import INF
+
+from opt.solver import Solver
+from opt.solver.status import Field
+
+from .ranked import RankedSearch, RankedSearch_ParamSet
+
+
+def extract_beamdims(solver):
+    beam = solver.beam
+    return "- / -" if beam is None else "{} / {}".format(solver.depth, len(beam))
+
+
+Field.BeamDims = Field(header="Depth / Beam",
+                       width=14,
+                       align=str.center,
+                       extract=extract_beamdims)
+
+
+class BeamSearch_ParamSet(RankedSearch_ParamSet):
+    beam_width = Solver.Param(description="maximum number of nodes kept at each depth",
+                              options="one or more (inf for breadth-first search)",
+                              domain=Interval(1, INF),
+                              default=100)
+
+    @beam_width.adapter
+    def beam_width(self, width):
+        return float(width)
+
+
+class BeamSearch(RankedSearch):
+    """
+    Beam search, i.e. a breadth-first search which keeps only the 'beam_width' best ranked nodes
+    at each depth.  Each iteration expands the whole beam into the next depth level, and the new
+    children are scored in a single call to the batch ranking policy.  Memory is bounded by the
+    beam width times the number of branches per node, and runtime by the beam width times the
+    depth of the tree.  If the beam is never truncated (or only by pruning), the search is
+    exhaustive and the best solution found is optimal.
+    """
+    ParamSet = BeamSearch_ParamSet  # paramset class used by this solver
+
+    def __init__(self, **params):
+        self.beam = None        # list of nodes at the current depth
+        self.depth = None       # depth of the nodes in the beam
+        self.truncated = False  # True if nodes were discarded because of the beam width
+        RankedSearch.__init__(self, **params)
+        self.status.fields.append(Field.BeamDims)
+
+    def _reset(self):
+        self.beam = None
+        self.depth = None
+        self.truncated = False
+
+    def _bootstrap(self):
+        root = self.params.node_class.root(self)
+        self.depth = 0
+        self.truncated = False
+        if root.is_leaf():
+            self.solutions.check(root)
+            self.beam = []
+        else:
+            self.beam = [root]
+            if self.params.pruning:
+                root_bound = root.bound()
+                if self.sense.is_better(self.bound, root_bound):
+                    self.bound = root_bound
+
+    def _iterate(self):
+        """Expand the nodes in the beam and replace them by the best ranked children."""
+        children = self.expand(self.beam)
+        width = self.params.beam_width
+        if len(children) > width:
+            del children[int(width):]
+            self.truncated = True
+        self.beam = children
+        self.depth += 1
+        if len(children) == 0:
+            if self.truncated:
+                self.interrupts.add("beam is empty")
+            else:
+                self.finish_exhausted("beam is empty (search was exhaustive)")
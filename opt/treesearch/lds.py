@@ -0,0 +1,99 @@
+from utils.interval import Interval
+from utils.misc import INF
+
+from opt.solver import Solver
+from opt.solver.status import Field
+
+from .ranked import RankedSearch, RankedSearch_ParamSet
+
+
+def extract_discrepancies(solver):
+    stack = solver.stack
+    return "- / -" if stack is None else "{} / {}".format(solver.limit, len(stack))
+
+
+Field.Discrepancies = Field(header="Discrep / Stack",
+                            width=16,
+                            align=str.center,
+                            extract=extract_discrepancies)
+
+
+class LDS_ParamSet(RankedSearch_ParamSet):
+    max_discrepancies = Solver.Param(description=("maximum number of discrepancies allowed in "
+                                                  "the last wave of the search"),
+                                     options="zero or more (inf to continue until exhaustion)",
+                                     domain=Interval(0, INF),
+                                     default=INF)
+
+    @max_discrepancies.adapter
+    def max_discrepancies(self, limit):
+        return float(limit)
+
+
+class LDS(RankedSearch):
+    """
+    Limited discrepancy search.  The children of each node are ranked by the ranking policy, and
+    choosing any child other than the best ranked one counts as a discrepancy.  The search runs
+    in waves of depth-first search, where wave k explores the paths with at most k discrepancies
+    (wave 0 simply follows the ranking down to a leaf), so that the solutions preferred by the
+    ranking are found first and each wave is bounded by the number of such paths.  Leaf children
+    are checked as soon as their parent is expanded, and only the non-leaf children are ranked.
+    Each iteration expands a single node.  If a wave explores no path exceeding the limit, the
+    whole tree has been explored and the best solution found is optimal.
+    """
+    ParamSet = LDS_ParamSet  # paramset class used by this solver
+
+    def __init__(self, **params):
+        self.root = None      # root node, from which each wave starts
+        self.stack = None     # list of (node, discrepancies) pairs, the top of the stack last
+        self.limit = None     # maximum number of discrepancies in the current wave
+        self.limited = False  # True if the current wave skipped nodes because of the limit
+        RankedSearch.__init__(self, **params)
+        self.status.fields.append(Field.Discrepancies)
+
+    def _reset(self):
+        self.root = None
+        self.stack = None
+        self.limit = None
+        self.limited = False
+
+    def _bootstrap(self):
+        root = self.params.node_class.root(self)
+        self.limit = 0
+        self.limited = False
+        if root.is_leaf():
+            self.solutions.check(root)
+            self.stack = []
+            self.finish_exhausted("root node is a leaf")
+        else:
+            self.root = root
+            self.stack = [(root, 0)]
+            if self.params.pruning:
+                root_bound = root.bound()
+                if self.sense.is_better(self.bound, root_bound):
+                    self.bound = root_bound
+
+    def _iterate(self):
+        """Expand the node at the top of the stack, and push its children whose number of
+        discrepancies is within the limit of the current wave (best ranked child on top).  When
+        the stack is empty, the next wave starts from the root with a limit one unit higher."""
+        stack = self.stack
+        node, discrepancies = stack.pop()
+        if not self.params.pruning or self.sense.is_better(node.bound(), self.incumbent):
+            children = self.expand([node])
+            limit = self.limit
+            for i in xrange(len(children) - 1, -1, -1):
+                child_discrepancies = discrepancies if i == 0 else discrepancies + 1
+                if child_discrepancies <= limit:
+                    stack.append((children[i], child_discrepancies))
+                else:
+                    self.limited = True
+        if len(stack) == 0:
+            if not self.limited:
+                self.finish_exhausted("all nodes explored within the discrepancy limit")
+            elif self.limit >= self.params.max_discrepancies:
+                self.interrupts.add("maximum number of discrepancies reached")
+            else:
+                self.limit += 1
+                self.limited = False
+                stack.append((self.root, 0))
@@ -1,5 +1,6 @@
 from .solver import MCTS
-from .simulation import random_simulation
+from .simulation import random_simulation, random_rollout, inplace_rollout
+from .parallel import root_parallel
 
 
-__all__ = ["MCTS", "random_simulation"]
+__all__ = ["MCTS", "random_simulation", "random_rollout", "inplace_rollout", "root_parallel"]
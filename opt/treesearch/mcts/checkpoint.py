@@ -0,0 +1,250 @@
+"""
+Checkpointing of MCTS searches.  A checkpoint is a gzip-compressed stream of pickled records:
+
+    - a header with a fingerprint of the node class and instance (see checkpoint_fingerprint())
+      and the solver's search state (iteration count, cpu time, RNG state, incumbent, bound,
+      solution list and closed transposition table entries);
+    - one record per metanode, in depth-first order over primary parent links, containing the
+      id (position in the stream) of its parent, its branch index, state key, simulation stats,
+      bound and expansion state (the number of branches taken so far);
+    - a None separator, followed by a single record with the links created by the transposition
+      table (see MetaNode.link_child()), as a list of (parent id, [child ids]) pairs giving the
+      complete list of children of each metanode with linked children, in order.
+
+Nodes are not stored.  When a checkpoint is loaded, the nodes of partially expanded metanodes
+are regenerated from the root by following the branch indices in their paths, and their branch
+iterators are advanced to the saved position (see MetaNode.regenerate_node() and
+MetaNodeBranches.skip_to()), so the node class' root(), branches() and branch_prior() (if
+defined) must be deterministic.
+Fully expanded metanodes do not need their nodes (see MetaNode.on_expansion_complete()), and
+collapsed metanodes (see MetaNode.collapse()) regenerate theirs when they are selected again.
+"""
+import cPickle
+import gzip
+import hashlib
+import os
+
+from opt.solver.sense import OptimizationSense
+from opt.treesearch import TreeNode
+
+from .metanode.bound import MetaNodeBound
+from .metanode.stats import MetaNodeStats
+from .metanode.counters import MetaTreeCounters
+
+
+FORMAT_VERSION = 2
+
+# expansion state of fully expanded and collapsed metanodes (partially expanded metanodes store
+# the number of branches taken instead)
+EXPANDED = -1
+COLLAPSED = -2
+
+
+def save_checkpoint(solver, filepath):
+    """Write the search state of MCTS 'solver' to 'filepath'.  The checkpoint is first written to
+    a temporary file which then replaces 'filepath', so an interrupted save never destroys the
+    previous checkpoint."""
+    tmp_filepath = filepath + ".tmp"
+    ostream = gzip.open(tmp_filepath, "wb")
+    try:
+        dump = cPickle.dump
+        dump(checkpoint_header(solver), ostream, 2)
+        links = []
+        root = solver.root
+        if root is not None:
+            ids = {}
+            stack = [root]
+            while len(stack) > 0:
+                metanode = stack.pop()
+                parent_id = -1 if metanode.parent is None else ids[metanode.parent]
+                ids[metanode] = len(ids)
+                dump(metanode_record(metanode, parent_id), ostream, 2)
+                children = [child for child in metanode.children if child.parent is metanode]
+                if len(children) < len(metanode.children):
+                    links.append(metanode)
+                children.reverse()
+                stack.extend(children)
+            links = [(ids[parent], [ids[child] for child in parent.children]) for parent in links]
+        dump(None, ostream, 2)
+        dump(links, ostream, 2)
+    finally:
+        ostream.close()
+    os.rename(tmp_filepath, filepath)
+
+
+def checkpoint_fingerprint(solver):
+    """Identify the node class and instance of 'solver', so that a checkpoint is not loaded into a
+    search of another problem (the branch indices in its metanodes' paths would be applied to the
+    wrong tree).  The instance is identified by the state key of a fresh root node if the node
+    class defines state_key(), and otherwise by a digest of the instance itself."""
+    node_class = solver.params.node_class
+    root_key = None
+    if has_state_key(node_class):
+        root_key = node_class.root(solver).state_key()
+    if root_key is None:
+        root_key = instance_digest(solver.instance)
+    return "{}.{}".format(node_class.__module__, node_class.__name__), root_key
+
+
+def has_state_key(node_class):
+    """Check if the node class redefines TreeNode.state_key()."""
+    return getattr(node_class.state_key, "im_func", None) is not TreeNode.state_key.im_func
+
+
+def instance_digest(instance):
+    """MD5 digest of the pickled instance (or of its repr(), if it cannot be pickled)."""
+    try:
+        data = cPickle.dumps(instance, 2)
+    except (cPickle.PicklingError, TypeError):
+        data = repr(instance)
+    return hashlib.md5(data).hexdigest()
+
+
+def checkpoint_header(solver):
+    solutions = solver.solutions
+    table = solver.transposition_table
+    return dict(version=FORMAT_VERSION,
+                fingerprint=checkpoint_fingerprint(solver),
+                sense=solver.sense.name,
+                iters=solver.iters.total,
+                cpu=solver.cpu.total,
+                rng=solver.rng.getstate(),
+                incumbent=solver.incumbent,
+                bound=solver.bound,
+                solutions=list(solutions),
+                solution_stats=dict((attr, getattr(solutions, attr)) for attr in SOLUTION_STATS),
+                closed=(None if table is None else
+                        [key for key, metanode in table.iteritems() if metanode is None]))
+
+
+SOLUTION_STATS = ["feas_count", "infeas_count", "best_feas_value", "worst_feas_value",
+                  "least_infeas_value", "most_infeas_value", "best_value", "log"]
+
+
+def metanode_record(metanode, parent_id):
+    stats = metanode.stats
+    bound = metanode.bound
+    if metanode.is_collapsed:
+        expansion = COLLAPSED
+    elif metanode.is_expandable:
+        expansion = metanode.branches.position
+    else:
+        expansion = EXPANDED
+    return (parent_id,
+            metanode.branch_index,
+            metanode.state_key,
+            None if bound is None else bound.value,
+            expansion,
+            None if stats is None else
+            (stats.sim_count, stats.sim_result, stats.sim_best_result, stats.evicted))
+
+
+def load_checkpoint(solver, filepath, resume=True):
+    """Rebuild the search tree of MCTS 'solver' from the checkpoint in 'filepath'.  The solver
+    must already be initialized with the same instance and node class used when the checkpoint was
+    saved, and the loaded tree replaces its current tree (if any).  The solutions, incumbent and
+    bound are restored along with the tree, since the tree's statistics refer to them.  If
+    'resume' is true, the iteration count, cpu time and RNG state are restored as well, so that
+    the search continues exactly where it stopped.  Otherwise, the search state is left as is,
+    which can be used to warm-start a new search on the same instance."""
+    istream = gzip.open(filepath, "rb")
+    try:
+        load = cPickle.load
+        header = load(istream)
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError("unsupported checkpoint format version: {}".format(header["version"]))
+        if header["fingerprint"] != checkpoint_fingerprint(solver):
+            raise ValueError("checkpoint was saved by a search with another node class or "
+                             "instance: {!r}".format(header["fingerprint"]))
+        if OptimizationSense.get(header["sense"]) is not solver.sense:
+            raise ValueError("checkpoint optimization sense does not match the solver's")
+        restore_search_state(solver, header, resume)
+        table = solver.transposition_table
+        if table is not None:
+            table.clear()
+            for key in header["closed"] or ():
+                table[key] = None
+        metanodes = []
+        while True:
+            record = load(istream)
+            if record is None:
+                break
+            metanodes.append(restore_metanode(solver, metanodes, record))
+        links = load(istream)
+    finally:
+        istream.close()
+    for parent_id, child_ids in links:
+        restore_links(metanodes[parent_id], [metanodes[i] for i in child_ids])
+    if solver.bound_index is not None:
+        solver.bound_index.compact()
+    return solver.root
+
+
+def restore_search_state(solver, header, resume):
+    if resume:
+        solver.iters.total = header["iters"]
+        solver.cpu.advance(header["cpu"] - solver.cpu.total)
+        solver.rng.setstate(header["rng"])
+    solutions = solver.solutions
+    solutions.clear()
+    solutions.init()
+    list.extend(solutions, header["solutions"])
+    for attr, value in header["solution_stats"].iteritems():
+        setattr(solutions, attr, value)
+    solver.root = None  # avoid pruning the current tree when the incumbent changes
+    solver.incumbent = header["incumbent"]
+    solver.bound = header["bound"]
+
+
+def restore_metanode(solver, metanodes, record):
+    """Create a metanode from a checkpoint 'record' and add it to the tree under its parent
+    (the previously loaded metanode with the record's parent id)."""
+    parent_id, branch_index, state_key, bound, expansion, stats_data = record
+    metanode = solver.params.metanode_class(solver, None)
+    metanode.branch_index = branch_index
+    metanode.state_key = state_key
+    if bound is not None:
+        metanode.bound = MetaNodeBound(metanode, bound)
+    if stats_data is not None:
+        stats = metanode.stats = MetaNodeStats(metanode)
+        stats.sim_count, stats.sim_result, stats.sim_best_result, stats.evicted = stats_data
+    # attach the metanode to the tree (stats must be set first for the parent's child arrays)
+    if parent_id < 0:
+        solver.root = metanode
+        metanode.counters = MetaTreeCounters()
+    else:
+        parent = metanodes[parent_id]
+        metanode.depth = parent.depth + 1
+        metanode.counters = parent.counters
+        metanode.counters.add(metanode.depth, len(parent.children) == 0)
+        metanode.index = len(parent.children)
+        parent.append_child(metanode)
+        metanode.parent = parent
+    table = solver.transposition_table
+    if table is not None and state_key is not None:
+        table[state_key] = metanode
+    # restore the expansion state
+    if expansion == COLLAPSED:
+        metanode.branches.collapse()
+    elif expansion != EXPANDED:
+        metanode.node = metanode.regenerate_node()
+        metanode.branches.skip_to(expansion)
+    return metanode
+
+
+def restore_links(parent, children):
+    """Link the children of 'parent' which are shared with other parents, and put them in their
+    saved order ('children'), which matters for the ties in selection."""
+    counters = parent.counters
+    for child in children:
+        if child.parent is not parent:
+            counters.link(parent.depth, len(parent.children) == 0)
+            if len(child.extra_parents) == 0:
+                child.extra_parents = []
+            child.extra_parents.append(parent)
+    parent.children = []
+    parent.child_arrays = None
+    for i, child in enumerate(children):
+        if child.parent is parent:
+            child.index = i
+        parent.append_child(child)
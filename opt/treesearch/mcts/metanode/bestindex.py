@@ -0,0 +1,70 @@
+from heapq import heappush, heappop, heapify
+
+from utils.misc import INF
+
+from opt.infeasible import Infeasible
+
+
+class MetaNodeBestIndex(object):
+    """
+    Counted multiset of the best simulation results of a metanode's children, which gives the
+    best of them in O(log n) amortized time instead of a scan over all children.  Results are
+    kept in a heap, ordered according to the optimization sense, with lazy deletion: a value is
+    only taken out of the heap when it reaches the top and no child has it anymore.
+    """
+    __slots__ = ("sign",    # 1 for minimization, -1 for maximization
+                 "counts",  # {result: number of children with that best result}
+                 "heap")    # heap of (key, result) pairs, may contain stale entries
+
+    def __init__(self, sense):
+        self.sign = -1 if sense.is_better(1.0, 0.0) else 1
+        self.counts = {}
+        self.heap = []
+
+    def __len__(self):
+        return sum(self.counts.itervalues())
+
+    def key(self, result):
+        """Heap key of a result.  Feasible results come before infeasible ones, which are
+        ordered by their degree of infeasibility."""
+        if isinstance(result, Infeasible):
+            return (1, float(result))
+        return (0, self.sign * result)
+
+    def add(self, result):
+        counts = self.counts
+        count = counts.get(result, 0)
+        counts[result] = count + 1
+        if count == 0:
+            heappush(self.heap, (self.key(result), result))
+
+    def remove(self, result):
+        counts = self.counts
+        count = counts[result] - 1
+        if count > 0:
+            counts[result] = count
+        else:
+            del counts[result]
+            if len(self.heap) > 2 * len(counts) + 16:
+                self.compact()
+
+    def replace(self, old, new):
+        self.remove(old)
+        self.add(new)
+
+    def best(self):
+        """Return the best result in the index (or Infeasible(INF) if it is empty)."""
+        heap = self.heap
+        counts = self.counts
+        while len(heap) > 0:
+            result = heap[0][1]
+            if result in counts:
+                return result
+            heappop(heap)
+        return Infeasible(INF)
+
+    def compact(self):
+        """Rebuild the heap without stale entries."""
+        key = self.key
+        self.heap = [(key(result), result) for result in self.counts]
+        heapify(self.heap)
@@ -10,9 +10,9 @@ class MetaNodeBound(object):
     """
     __slots__ = ("metanode", "value")
 
-    def __init__(self, metanode):
+    def __init__(self, metanode, value=None):
         self.metanode = metanode
-        self.value = metanode.node.bound()
+        self.value = metanode.node.bound() if value is None else value
         assert self.value is not None
 
     def best_from_children(self):
@@ -27,13 +27,26 @@ class MetaNodeBound(object):
         solver = self.metanode.solver
         is_better = solver.sense.is_better
         while metanode is not None:
+            if metanode.is_expandable:
+                # shared metanodes (see MetaNode.link_child()) may be expanded before all their
+                # parents, whose bounds cannot be taken from their children until then
+                break
             bound = metanode.bound
             old = bound.value
             new = bound.best_from_children()
             if old == new:
                 break
-            assert is_better(old, new) or Approx(old) == new
+            if is_better(new, old) and Approx(old) != new:
+                # children regenerated after a collapse (see MetaNode.collapse()) may have looser
+                # bounds than the evicted ones, in which case the tighter bound is kept
+                break
             bound.value = new
+            if solver.bound_index is not None:
+                solver.bound_index.push(metanode)
+            # stale bounds in shared metanodes' extra parents are still valid (only looser)
+            for parent in metanode.extra_parents:
+                if parent.is_bound_updatable:
+                    parent.bound.update_from_children()
             metanode = metanode.parent
         else:
             if is_better(solver.bound, solver.root.bound.value):
@@ -0,0 +1,79 @@
+from heapq import heappush, heappop, heapify
+
+
+class MetaTreeBoundIndex(object):
+    """
+    Heap of the bounded metanodes of a tree, ordered from worst to best bound, which lets the tree
+    be pruned after an incumbent change by visiting only the metanodes whose bound is no longer
+    better than the new cutoff (see prune()), instead of sweeping the whole tree.  Metanodes are
+    pushed when they are added to the tree and again whenever their bound is updated, and entries
+    are deleted lazily: an entry is stale if its metanode has left the tree or its bound has
+    changed since it was pushed.  The heap is rebuilt from the tree when it grows beyond twice the
+    size of the tree (see compact()).
+    """
+    __slots__ = ("solver",  # reference to the MCTS solver that owns the tree
+                 "sign",    # -1 for minimization, 1 for maximization (worst bound first)
+                 "heap",    # heap of (key, seq, bound value, metanode) entries
+                 "seq")     # insertion counter, breaks ties between equal keys
+
+    def __init__(self, solver):
+        self.solver = solver
+        self.sign = 1 if solver.sense.is_better(1.0, 0.0) else -1
+        self.heap = []
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, metanode):
+        """Add an entry for the current bound of 'metanode'."""
+        value = metanode.bound.value
+        heappush(self.heap, (self.sign * value, self.seq, value, metanode))
+        self.seq += 1
+        if len(self.heap) > 2 * self.solver.root.size + 16:
+            self.compact()
+
+    def is_live(self, value, metanode):
+        """True if 'metanode' is still in the tree and its bound is still 'value'."""
+        return ((metanode.parent is not None or metanode is self.solver.root) and
+                metanode.bound.value == value)
+
+    def prune(self, cutoff):
+        """Remove from the tree all metanodes whose bound is not better than 'cutoff'.  Each
+        prunable metanode popped from the heap is replaced by its topmost prunable ancestor, which
+        is then chopped, so that the same subtrees are removed (and signaled) as by a full sweep
+        with MetaNode.prune()."""
+        solver = self.solver
+        is_better = solver.sense.is_better
+        heap = self.heap
+        pruned_count = 0
+        while len(heap) > 0 and not is_better(heap[0][2], cutoff):
+            _, _, value, metanode = heappop(heap)
+            if not self.is_live(value, metanode):
+                continue
+            parent = metanode.parent
+            while parent is not None and not is_better(parent.bound.value, cutoff):
+                metanode = parent
+                parent = metanode.parent
+            solver.channel.emit(solver.SIGNALS.PRUNING_NODE, metanode)
+            pruned_count += metanode.size
+            metanode.chop()
+        if len(heap) > 2 * solver.root.size + 16:
+            self.compact()
+        solver.log.debug("tree pruning removed {} nodes".format(pruned_count))
+
+    def compact(self):
+        """Rebuild the heap from the metanodes currently in the tree, dropping stale entries."""
+        self.heap = []
+        self.seq = 0
+        root = self.solver.root
+        if root is None or root.bound is None:
+            return
+        visited = set()
+        for metanode, _ in root.iter_depth_first():
+            if metanode not in visited and metanode.bound is not None:
+                visited.add(metanode)
+                value = metanode.bound.value
+                self.heap.append((self.sign * value, self.seq, value, metanode))
+                self.seq += 1
+        heapify(self.heap)
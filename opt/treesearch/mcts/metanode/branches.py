@@ -1,23 +1,66 @@
+from opt.treesearch import TreeNode
+
+
+# marks the branches of a collapsed metanode (see MetaNode.collapse())
+COLLAPSED = iter(())
+
+
+def has_branch_prior(node):
+    """Check if the node's class redefines TreeNode.branch_prior()."""
+    return getattr(type(node).branch_prior, "im_func", None) is not TreeNode.branch_prior.im_func
+
+
 class MetaNodeBranches(object):
     """
     This simple object manages the unexpanded branches in a metanode.  The advance() method should
     be called after the creation of a child node.  This method returns True if there is a next
-    branch, or False if there are no remaining branches.
+    branch, or False if there are no remaining branches.  The position of the next branch in the
+    node's branches() is also kept in 'index'.  If the node class defines branch_prior(), branches
+    are expanded by decreasing prior instead of in the order given by branches(), so 'position'
+    keeps the number of branches taken so far.  Collapsed metanodes have the COLLAPSED iterator
+    as their remaining branches, so they remain expandable.
     """
-    __slots__ = ("metanode", "remaining", "next")
+    __slots__ = ("metanode", "remaining", "next", "index", "position")
 
     def __init__(self, metanode):
         self.metanode = metanode
         self.remaining = None
         self.next = None
+        self.index = -1
+        self.position = -1
 
     def init(self):
-        self.remaining = iter(self.metanode.node.branches())
+        node = self.metanode.node
+        if has_branch_prior(node):
+            branches = list(node.branches())
+            priors = [node.branch_prior(branch) for branch in branches]
+            order = sorted(xrange(len(branches)), key=priors.__getitem__, reverse=True)
+            self.remaining = ((i, branches[i]) for i in order)
+        else:
+            self.remaining = enumerate(node.branches())
         self.advance()
 
+    def skip_to(self, position):
+        """Initialize the remaining branches and advance them until 'position' branches have been
+        taken (used to resume a partially expanded metanode).  The skipped branches do not create
+        any child."""
+        self.init()
+        while self.position < position:
+            self.index, self.next = self.remaining.next()
+            self.position += 1
+
+    def collapse(self):
+        """Forget all expanded branches.  The branch list is rebuilt by MetaNode.restore() the
+        next time the metanode is expanded."""
+        self.remaining = COLLAPSED
+        self.next = None
+        self.index = -1
+        self.position = -1
+
     def advance(self):
         try:
-            self.next = self.remaining.next()
+            self.index, self.next = self.remaining.next()
+            self.position += 1
             return True
         except StopIteration:
             self.next = None
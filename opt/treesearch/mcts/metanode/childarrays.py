@@ -0,0 +1,69 @@
+from array import array
+
+from opt.infeasible import Infeasible
+
+from .bestindex import MetaNodeBestIndex
+
+
+NAN = float("nan")
+
+
+class MetaNodeChildArrays(object):
+    """
+    Struct-of-arrays copy of the simulation statistics of a metanode's children, which allows
+    the default UCT selection to score all children at once (see scoring.uct_candidates()).
+    Entry 'i' of each array corresponds to the metanode's i-th child, so children are removed by
+    swapping them with the last child (see MetaNode.remove_child()).  The entries are refreshed
+    by MetaNodeStats.update_arrays() whenever the child's stats change.  Infeasible best results
+    are stored as NaN in 'bests', but the actual results are also kept in a best index, which
+    provides the best result among all children.
+    """
+    __slots__ = ("counts",      # simulation count of each child
+                 "pending",     # virtual loss of each child
+                 "bests",       # best simulation result of each child (NaN if infeasible)
+                 "results",     # best simulation result of each child (actual objects)
+                 "best_index")  # counted multiset of the children's best results
+
+    def __init__(self, sense):
+        self.counts = array("d")
+        self.pending = array("d")
+        self.bests = array("d")
+        self.results = []
+        self.best_index = MetaNodeBestIndex(sense)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def append(self, stats):
+        result = stats.sim_best_result
+        self.counts.append(stats.sim_count)
+        self.pending.append(stats.pending)
+        self.bests.append(self.best_value(result))
+        self.results.append(result)
+        self.best_index.add(result)
+
+    def set(self, i, stats):
+        self.counts[i] = stats.sim_count
+        self.pending[i] = stats.pending
+        result = stats.sim_best_result
+        old_result = self.results[i]
+        if result is not old_result and not result == old_result:
+            self.bests[i] = self.best_value(result)
+            self.results[i] = result
+            self.best_index.replace(old_result, result)
+
+    def swap_remove(self, i):
+        """Remove entry 'i' by replacing it with the last entry."""
+        self.best_index.remove(self.results[i])
+        for values in (self.counts, self.pending, self.bests, self.results):
+            last = values.pop()
+            if i < len(values):
+                values[i] = last
+
+    def best_result(self):
+        """Best simulation result among all children."""
+        return self.best_index.best()
+
+    @staticmethod
+    def best_value(sim_best_result):
+        return NAN if isinstance(sim_best_result, Infeasible) else sim_best_result
@@ -0,0 +1,87 @@
+class MetaTreeCounters(object):
+    """
+    Keeps node and leaf counts for each depth level of a metanode tree, so that the size, height,
+    mean depth and mean leaf depth of the tree can be obtained without traversing it.  A single
+    counters object is shared by all the metanodes in a tree, and it is updated by the add_child()
+    and remove_child() methods of MetaNode (chop() goes through remove_child()).  Note that leaf
+    here has the same meaning as in MetaNode.mean_leaf_depth, i.e. a node without children.
+    """
+    __slots__ = ("size",            # total number of nodes in the tree
+                 "nodes_at",        # number of nodes at each depth level
+                 "leaves_at",       # number of leaves at each depth level
+                 "leaf_count",      # total number of leaves in the tree
+                 "depth_sum",       # sum of the depths of all nodes
+                 "leaf_depth_sum")  # sum of the depths of all leaves
+
+    def __init__(self):
+        # a new tree contains only the root, which is also a leaf
+        self.size = 1
+        self.nodes_at = [1]
+        self.leaves_at = [1]
+        self.leaf_count = 1
+        self.depth_sum = 0
+        self.leaf_depth_sum = 0
+
+    @property
+    def height(self):
+        return len(self.nodes_at)
+
+    @property
+    def mean_depth(self):
+        return float(self.depth_sum) / self.size
+
+    @property
+    def mean_leaf_depth(self):
+        return float(self.leaf_depth_sum) / self.leaf_count
+
+    def add(self, depth, parent_was_leaf):
+        """Register a new leaf node at 'depth'. If its parent had no children before, the parent
+        (at 'depth' - 1) stops being a leaf."""
+        if depth == len(self.nodes_at):
+            self.nodes_at.append(0)
+            self.leaves_at.append(0)
+        self.size += 1
+        self.nodes_at[depth] += 1
+        self.depth_sum += depth
+        self.leaves_at[depth] += 1
+        self.leaf_depth_sum += depth
+        if parent_was_leaf:
+            self.leaves_at[depth-1] -= 1
+            self.leaf_depth_sum -= depth - 1
+        else:
+            self.leaf_count += 1
+
+    def remove(self, depth, parent_is_leaf):
+        """Unregister a leaf node at 'depth'. If its parent has no children left, the parent
+        becomes a leaf."""
+        self.size -= 1
+        self.nodes_at[depth] -= 1
+        self.depth_sum -= depth
+        self.leaves_at[depth] -= 1
+        self.leaf_depth_sum -= depth
+        if parent_is_leaf:
+            self.leaves_at[depth-1] += 1
+            self.leaf_depth_sum += depth - 1
+        else:
+            self.leaf_count -= 1
+        nodes_at = self.nodes_at
+        while nodes_at[-1] == 0:
+            nodes_at.pop()
+            self.leaves_at.pop()
+
+    def link(self, parent_depth, parent_was_leaf):
+        """Register an extra link to an existing node (see MetaNode.link_child()).  The tree keeps
+        the same nodes, but the parent (at 'parent_depth') stops being a leaf if it had no
+        children before."""
+        if parent_was_leaf:
+            self.leaves_at[parent_depth] -= 1
+            self.leaf_count -= 1
+            self.leaf_depth_sum -= parent_depth
+
+    def unlink(self, parent_depth, parent_is_leaf):
+        """Unregister an extra link to a node. If the parent has no children left, it becomes a
+        leaf."""
+        if parent_is_leaf:
+            self.leaves_at[parent_depth] += 1
+            self.leaf_count += 1
+            self.leaf_depth_sum += parent_depth
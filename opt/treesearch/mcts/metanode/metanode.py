@@ -10,31 +10,76 @@ from opt.treesearch import TreeNode
 
 from .bound import MetaNodeBound
 from .stats import MetaNodeStats
-from .branches import MetaNodeBranches
+from .branches import MetaNodeBranches, COLLAPSED
+from .counters import MetaTreeCounters
+from .childarrays import MetaNodeChildArrays
+
+
+def ancestors_of(metanodes):
+    """Return a list containing the argument metanodes and all their ancestors (following every
+    parent link), in which each metanode appears exactly once and before any of its ancestors,
+    i.e. in bottom-up topological order.  Statistics updates in a DAG of metanodes should visit
+    metanodes in this order, so that children are always updated before their parents."""
+    order = []
+    visited = set()
+    for start in metanodes:
+        if start in visited:
+            continue
+        visited.add(start)
+        stack = [(start, iter(start.parents))]
+        while len(stack) > 0:
+            metanode, parents = stack[-1]
+            for parent in parents:
+                if parent not in visited:
+                    visited.add(parent)
+                    stack.append((parent, iter(parent.parents)))
+                    break
+            else:
+                # all parents are already in 'order', so the metanode can be added now
+                stack.pop()
+                order.append(metanode)
+    order.reverse()
+    return order
 
 
 class MetaNode(object):
     """
     A MetaNode object attaches itself to a TreeNode object, encapsulating information that
-    is relevant for Monte Carlo tree search.
+    is relevant for Monte Carlo tree search.  Metanodes created with a None node are blank, i.e.
+    fully expanded and without stats or bound, and are filled in by the caller (this is used when
+    loading checkpoints, see opt.treesearch.mcts.checkpoint).
     """
-    __slots__ = ("solver",    # reference to an MCTS solver object
-                 "node",      # the TreeNode being wrapped by this meta node
-                 "parent",    # parent meta-node
-                 "children",  # list of active child meta-nodes
-                 "branches",  # branches awaiting expansion
-                 "bound",     # best objective value bound in this subtree
-                 "stats")     # simulation statistics
+    __slots__ = ("solver",         # reference to an MCTS solver object
+                 "node",           # the TreeNode being wrapped by this meta node
+                 "parent",         # parent meta-node
+                 "extra_parents",  # other parents sharing this node (see link_child())
+                 "children",       # list of active child meta-nodes
+                 "index",          # position of this node in its parent's list of children
+                 "child_arrays",   # struct-of-arrays copy of the children's stats
+                 "depth",          # number of nodes above this node
+                 "branch_index",   # position of this node's branch in the parent's branches()
+                 "state_key",      # transposition table key of this node's state
+                 "counters",       # node counters shared by the whole tree
+                 "branches",       # branches awaiting expansion
+                 "bound",          # best objective value bound in this subtree
+                 "stats")          # simulation statistics
 
     def __init__(self, solver, node):
         self.solver = solver
         self.node = node
         self.parent = None
+        self.extra_parents = ()
         self.children = []
+        self.index = None
+        self.child_arrays = None
+        self.depth = 0
+        self.branch_index = None
+        self.state_key = None
+        self.counters = None
         self.branches = MetaNodeBranches(self)
         self.bound = None
         self.stats = None
-        if not node.is_leaf():
+        if node is not None and not node.is_leaf():
             if solver.params.pruning:
                 self.bound = MetaNodeBound(self)
             if not self.is_prunable:
@@ -66,7 +111,10 @@ class MetaNode(object):
     # ------------------------------------------------------------------------------
     @property
     def size(self):
-        """Return the size (# of nodes) of the tree rooted at 'self'."""
+        """Return the size (# of nodes) of the tree rooted at 'self'. This takes constant time
+        at the root of the tree, but requires a traversal of the subtree for any other node."""
+        if self.parent is None:
+            return 1 if self.counters is None else self.counters.size
         count = 0
         stack = [self]
         while len(stack) > 0:
@@ -78,7 +126,10 @@ class MetaNode(object):
 
     @property
     def height(self):
-        """Return the height (# of levels) of the tree rooted at 'self'."""
+        """Return the height (# of levels) of the tree rooted at 'self'. Like size, this is only
+        taken from the tree counters at the root."""
+        if self.parent is None:
+            return 1 if self.counters is None else self.counters.height
         height = 1
         stack = [(self, 1)]
         while len(stack) > 0:
@@ -111,19 +162,30 @@ class MetaNode(object):
         return path
 
     @property
-    def depth(self):
-        """Number of nodes above this node, i.e. the number of nodes in the path between this node
-        (exclusive) and the root (inclusive)."""
-        depth = 0
-        parent = self.parent
-        while parent is not None:
-            depth += 1
-            parent = parent.parent
-        return depth
+    def parents(self):
+        """List of all the parents of this metanode.  Metanodes have at most one parent, unless
+        they are shared through the transposition table (see link_child())."""
+        if self.parent is None:
+            return []
+        parents = [self.parent]
+        parents.extend(self.extra_parents)
+        return parents
+
+    def ancestors(self):
+        """List containing 'self' and all its ancestors, each appearing exactly once and before
+        any of its own ancestors.  In a tree this is simply the reverse path of the metanode,
+        but shared metanodes can be reached from the root through several paths."""
+        rpath = list(self.rpath)
+        for metanode in rpath:
+            if len(metanode.extra_parents) > 0:
+                return ancestors_of([self])
+        return rpath
 
     @property
     def mean_depth(self):
         """Mean depth of *all* nodes of this tree."""
+        if self.parent is None:
+            return 0.0 if self.counters is None else self.counters.mean_depth
         total_depth = 0
         total_nodes = 0
         stack = [(self, 0)]
@@ -141,6 +203,8 @@ class MetaNode(object):
         """Mean depth of the *leaf* nodes of this tree. Note that leaf here does not necessarily
         refer to a node containing an actual complete solution (or an infeasible subproblem), but
         a node which has no children at the time of the call."""
+        if self.parent is None:
+            return 0.0 if self.counters is None else self.counters.mean_leaf_depth
         total_depth = 0
         total_leaves = 0
         stack = [(self, 0)]
@@ -174,19 +238,42 @@ class MetaNode(object):
                 len(self.children) > 0 and
                 self.branches.remaining is None)
 
+    @property
+    def is_saturated(self):
+        """True if progressive widening (see the MCTS parameter 'widening_coeff') does not allow
+        this metanode to have more children until it receives more visits.  A metanode with
+        k * n ** a children or more is saturated, where n is its simulation count and k and a are
+        the widening coefficient and exponent.  Metanodes without children are never saturated."""
+        params = self.solver.params
+        coeff = params.widening_coeff
+        n_children = len(self.children)
+        if coeff == INF or n_children == 0:
+            return False
+        return n_children >= coeff * max(self.stats.sim_count, 1) ** params.widening_exponent
+
     @property
     def is_exhausted(self):
         """A node is exhausted if it is fully expanded and all its children have been
         exhausted and thus removed from the tree."""
         return self.branches.remaining is None and len(self.children) == 0
 
+    @property
+    def is_collapsed(self):
+        """True if the subtree under this node has been evicted (see collapse())."""
+        return self.branches.remaining is COLLAPSED
+
     # ------------------------------------------------------------------------------
     def create_next_child(self):
         """Creates a new metanode for the next unexpanded branch of this node.  Returns None if
         the child metanode is prunable or a leaf, otherwise returns the newly created metanode.
         Note that, after this call, the child metanode must still be added to the tree with
         add_child() and the branches of the parent metanode must be advance()d, otherwise
-        subsequent calls to this method will produce the same child node."""
+        subsequent calls to this method will produce the same child node.
+        When the solver's transposition table is enabled and the child node's state is already
+        in the tree, the existing metanode is linked to this node instead (see link_child()) and
+        None is returned."""
+        if self.is_collapsed:
+            self.restore()
         # create the child node from the next unexpanded branch
         branch = self.branches.next
         if isinstance(branch, TreeNode):
@@ -194,9 +281,19 @@ class MetaNode(object):
         else:
             child_node = self.node.copy()
             child_node.apply(branch)
-        # create child metanode and check if it is prunable or non-expandable (i.e. leaf)
+        # look up the child's state in the transposition table
         solver = self.solver
+        table = solver.transposition_table
+        state_key = None
+        if table is not None:
+            state_key = child_node.state_key()
+            if state_key is not None and state_key in table:
+                self.link_child(table[state_key])
+                return None
+        # create child metanode and check if it is prunable or non-expandable (i.e. leaf)
         child_metanode = type(self)(solver, child_node)
+        child_metanode.branch_index = self.branches.index
+        child_metanode.state_key = state_key
         if child_metanode.is_prunable:
             solver.channel.emit(solver.SIGNALS.PRUNING_NODE, child_metanode)
             return None
@@ -209,35 +306,118 @@ class MetaNode(object):
     def add_child(self, child):
         """Add a child to this metanode."""
         assert child.stats.sim_count == 0
-        self.children.append(child)
+        counters = self.counters
+        if counters is None:
+            counters = self.counters = MetaTreeCounters()
+        child.depth = self.depth + 1
+        child.counters = counters
+        counters.add(child.depth, len(self.children) == 0)
+        child.index = len(self.children)
+        self.append_child(child)
         child.parent = self
+        table = self.solver.transposition_table
+        if table is not None and child.state_key is not None:
+            table[child.state_key] = child
+        bound_index = self.solver.bound_index
+        if bound_index is not None and child.bound is not None:
+            bound_index.push(child)
+
+    def link_child(self, child):
+        """Add a metanode which is already in the tree as an extra child of this metanode, turning
+        the tree into a directed acyclic graph where 'child' and its subtree are shared by all its
+        parents.  The statistics of the shared subtree are merged into 'self' and those of its
+        ancestors which could not reach 'child' before.  Nothing is done if 'child' is None (a
+        state that has already been removed from the tree), already a child of 'self', or one of
+        its ancestors (which would create a cycle).  Returns True if the link was created."""
+        if child is None or child in self.children:
+            return False
+        ancestors = self.ancestors()
+        if child in ancestors:
+            return False
+        reached = set(child.ancestors())
+        self.counters.link(self.depth, len(self.children) == 0)
+        self.append_child(child)
+        if len(child.extra_parents) == 0:
+            child.extra_parents = []
+        child.extra_parents.append(self)
+        # merge the child's stats into the metanodes that just gained access to its subtree
+        is_better = self.solver.sense.is_better
+        child_stats = child.stats
+        for metanode in ancestors:
+            if metanode not in reached:
+                stats = metanode.stats
+                stats.sim_count += child_stats.sim_count
+                if is_better(child_stats.sim_best_result, stats.sim_best_result):
+                    stats.sim_best_result = child_stats.sim_best_result
+                stats.update_arrays()
+        return True
+
+    def append_child(self, child):
+        """Auxiliary method used by add_child() and link_child().  Appends 'child' to the list of
+        children and its stats to the child arrays."""
+        if self.child_arrays is None:
+            self.child_arrays = MetaNodeChildArrays(self.solver.sense)
+        self.children.append(child)
+        self.child_arrays.append(child.stats)
+
+    def detach_child(self, child):
+        """Auxiliary method used by remove_child().  Removes 'child' from the list of children in
+        constant time by moving the last child into its position (in the child arrays as well)."""
+        children = self.children
+        i = child.index if child.parent is self else children.index(child)
+        last = children.pop()
+        if last is not child:
+            children[i] = last
+            if last.parent is self:
+                last.index = i
+        self.child_arrays.swap_remove(i)
 
     def remove_child(self, child, update_bound=True):
-        """Remove 'child' from 'self'.  If the parent metanode becomes exhausted (i.e. is fully
-        expanded and becomes empty) afterwards, the removal is propagated up.  Metanode stats and
-        bounds are updated accordingly."""
+        """Remove 'child' from 'self'.  Shared children (see link_child()) are removed from all
+        their parents, since a state that is exhausted or pruned through one path is also done
+        in all others.  If a parent metanode becomes exhausted (i.e. is fully expanded and
+        becomes empty) afterwards, the removal is propagated up.  Metanode stats and bounds are
+        updated accordingly."""
         if len(child.children) > 0:
             raise Exception("attempting to remove non-empty child")
-        parent = self
-        while True:
-            # unlink child from parent
-            parent.children.remove(child)
+        table = self.solver.transposition_table
+        removed = [child]
+        while len(removed) > 0:
+            child = removed.pop()
+            parents = child.parents
+            # unlink child from its parents
+            counters = child.counters
+            for parent in parents:
+                parent.detach_child(child)
+                if parent is child.parent:
+                    counters.remove(child.depth, len(parent.children) == 0)
+                else:
+                    counters.unlink(parent.depth, len(parent.children) == 0)
             child.parent = None
-            # remove child sim result from parent stats
-            assert child.stats.sim_count in (0, 1)
-            if child.stats.sim_count == 1:
-                parent.stats.remove_sim_result(child.stats.sim_result)
-            # recompute parent bound (and propagate up) if necessary
-            if (((update_bound and
-                  parent.is_bound_updatable and
-                  parent.bound.value == child.bound.value))):
-                parent.bound.update_from_children()
-            # if this node just became exhausted, we move one level up and continue removing
-            if parent.is_exhausted and parent.parent is not None:
-                child = parent
-                parent = parent.parent
-            else:
-                break
+            child.extra_parents = ()
+            child.index = None
+            child.counters = None
+            # the state remains in the transposition table, but is marked as closed
+            if table is not None and child.state_key is not None:
+                table[child.state_key] = None
+            # remove child sim result (and evicted results) from the stats of its former ancestors
+            stats = child.stats
+            if stats.sim_result is not None or stats.evicted is not None:
+                ancestors = ancestors_of(parents)
+                if stats.sim_result is not None:
+                    parents[0].stats.remove_sim_result(stats.sim_result, ancestors)
+                if stats.evicted is not None:
+                    evicted_count, evicted_best = stats.evicted
+                    parents[0].stats.remove_sim_result(evicted_best, ancestors, evicted_count)
+            for parent in parents:
+                # recompute parent bound (and propagate up) if necessary
+                if (((update_bound and
+                      parent.is_bound_updatable and
+                      parent.bound.value == child.bound.value))):
+                    parent.bound.update_from_children()
+                # if the parent just became exhausted, it must also be removed
+                if parent.is_exhausted and parent.parent is not None:
+                    removed.append(parent)
 
     def on_expansion_complete(self):
         """This method is called automatically by the branches object when it finds that there are
@@ -263,12 +443,78 @@ class MetaNode(object):
     def release_node(self):
         self.node = self.node.release()
 
+    # ------------------------------------------------------------------------------
+    def collapse(self):
+        """Evict the subtree under this metanode from the tree, turning the metanode into a
+        summary leaf.  The simulation count and best result of the evicted subtree are kept in
+        the metanode's stats (see MetaNodeStats.evicted), and its bound is kept as well.  The
+        metanode remains expandable, and its node and branches are regenerated by restore() when
+        it is selected for expansion again.  Subtrees containing metanodes shared through the
+        transposition table should not be collapsed."""
+        solver = self.solver
+        is_better = solver.sense.is_better
+        stats = self.stats
+        own_sim = int(stats.sim_result is not None)
+        evicted_best = Infeasible(INF) if stats.evicted is None else stats.evicted[1]
+        for child in self.children:
+            if is_better(child.stats.sim_best_result, evicted_best):
+                evicted_best = child.stats.sim_best_result
+        stats.evicted = (stats.sim_count - own_sim, evicted_best)
+        # unlink all descendants, children before parents
+        descendants = []
+        stack = list(self.children)
+        while len(stack) > 0:
+            metanode = stack.pop()
+            descendants.append(metanode)
+            stack.extend(metanode.children)
+        counters = self.counters
+        table = solver.transposition_table
+        for metanode in reversed(descendants):
+            parent = metanode.parent
+            parent.detach_child(metanode)
+            counters.remove(metanode.depth, len(parent.children) == 0)
+            metanode.parent = None
+            metanode.index = None
+            metanode.counters = None
+            # evicted states can be reached again, so they are dropped from the table
+            if table is not None and table.get(metanode.state_key) is metanode:
+                del table[metanode.state_key]
+        self.child_arrays = None
+        self.node = None
+        self.branches.collapse()
+
+    def restore(self):
+        """Regenerate the node and branches of a collapsed metanode.  Note that all branches are
+        expanded again, including those whose subtrees had been exhausted before the collapse."""
+        self.node = self.regenerate_node()
+        self.branches = MetaNodeBranches(self)
+        self.branches.init()
+
+    def regenerate_node(self):
+        """Create a new copy of this metanode's node by applying the branches in the path from
+        the root, identified by their 'branch_index'.  This requires the node class' root() and
+        branches() methods to be deterministic."""
+        solver = self.solver
+        node = solver.params.node_class.root(solver)
+        for metanode in self.path[1:]:
+            branches = node.branches()
+            if not isinstance(branches, Sequence):
+                branches = list(branches)
+            branch = branches[metanode.branch_index]
+            if isinstance(branch, TreeNode):
+                node = branch
+            else:
+                node.apply(branch)
+        return node
+
     # ------------------------------------------------------------------------------
     def chop(self):
         """Remove a node and the whole subtree under it from the tree."""
         stack = [self]
         while len(stack) > 0:
             metanode = stack.pop()
+            if metanode.parent is None and metanode is not self:
+                continue  # shared metanode already removed through another parent
             if len(metanode.children) == 0 and metanode.parent is not None:
                 metanode.parent.remove_child(metanode, update_bound=False)
             else:
@@ -287,13 +533,17 @@ class MetaNode(object):
             parent.bound.update_from_children()
 
     def prune(self, cutoff):
-        """Prune the (sub-)tree under this node using the argument objective cutoff."""
+        """Prune the (sub-)tree under this node using the argument objective cutoff.  This is a
+        full sweep of the subtree; on incumbent changes, the solver prunes through its bound index
+        instead, which only visits the prunable metanodes (see MetaTreeBoundIndex)."""
         solver = self.solver
         is_better = solver.sense.is_better
         pruned_count = 0
         stack = [self]
         while len(stack) > 0:
             metanode = stack.pop()
+            if metanode.parent is None and metanode is not self:
+                continue  # shared metanode already removed through another parent
             if not is_better(metanode.bound.value, cutoff):
                 solver.channel.emit(solver.SIGNALS.PRUNING_NODE, metanode)
                 pruned_count += metanode.size
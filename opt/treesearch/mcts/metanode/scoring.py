@@ -1,17 +1,34 @@
 from math import log, sqrt
+from itertools import izip
 from utils.misc import INF
 from opt import Infeasible
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# minimum number of children for which uct_candidates() uses numpy (when available)
+NUMPY_MIN_CHILDREN = 64
+
 
 def exploration_score(metanode):
-    if metanode.stats.sim_count == 0:
+    """UCT exploration term.  Virtual losses of simulations still in progress (see MCTS parameter
+    'rollout_processes') count as visits, which steers concurrent selections away from the paths
+    that are already being simulated."""
+    stats = metanode.stats
+    visits = stats.sim_count + stats.pending
+    if visits == 0:
         return INF
+    parent_stats = metanode.parent.stats
     return (metanode.solver.params.exploration_coeff *
-            sqrt(2.0 * log(metanode.parent.stats.sim_count) / metanode.stats.sim_count))
+            sqrt(2.0 * log(parent_stats.sim_count + parent_stats.pending) / visits))
 
 
 def exploitation_score(metanode):
-    sim_best_result = metanode.stats.sim_best_result
+    stats = metanode.stats
+    sim_best_result = stats.sim_best_result
     if isinstance(sim_best_result, Infeasible):
         return 0.0
     solutions = metanode.solver.solutions
@@ -19,7 +36,66 @@ def exploitation_score(metanode):
     w_star = solutions.worst_feas_value
     if z_star == w_star:
         return 0.0
-    return abs(sim_best_result - w_star) / abs(z_star - w_star)
+    score = float(abs(sim_best_result - w_star)) / abs(z_star - w_star)
+    if stats.pending > 0:
+        # virtual losses are counted as visits with the worst possible reward
+        score *= float(stats.sim_count) / (stats.sim_count + stats.pending)
+    return score
+
+
+def uct_candidates(metanode):
+    """Compute the UCT score given by exploration_score() + exploitation_score() for all the
+    children of 'metanode' at once, using the metanode's child arrays instead of the children's
+    stats.  Returns the list of indices of the children with the highest score.  This is used by
+    MCTS's default selection policy when the default score terms are used.  Note that the
+    exploration term uses the stats of 'metanode' itself rather than those of each child's parent
+    (they differ only for children shared through the transposition table)."""
+    arrays = metanode.child_arrays
+    counts = arrays.counts
+    pending = arrays.pending
+    stats = metanode.stats
+    solver = metanode.solver
+    coeff = solver.params.exploration_coeff
+    solutions = solver.solutions
+    z_star = solutions.best_feas_value
+    w_star = solutions.worst_feas_value
+    if numpy is not None and len(counts) >= NUMPY_MIN_CHILDREN:
+        return _uct_candidates_numpy(arrays, stats, coeff, z_star, w_star)
+    # unvisited children have infinite score
+    candidates = [i for i, (count, pend) in enumerate(izip(counts, pending))
+                  if count + pend == 0]
+    if len(candidates) > 0:
+        return candidates
+    two_log = 2.0 * log(stats.sim_count + stats.pending)
+    delta = abs(z_star - w_star)
+    scores = []
+    for count, pend, best in izip(counts, pending, arrays.bests):
+        visits = count + pend
+        score = coeff * sqrt(two_log / visits)
+        if best == best and z_star != w_star:  # NaN marks infeasible results
+            exploitation = abs(best - w_star) / delta
+            if pend > 0:
+                exploitation *= count / visits
+            score += exploitation
+        scores.append(score)
+    max_score = max(scores)
+    return [i for i, score in enumerate(scores) if score == max_score]
+
+
+def _uct_candidates_numpy(arrays, stats, coeff, z_star, w_star):
+    counts = numpy.frombuffer(arrays.counts)
+    pending = numpy.frombuffer(arrays.pending)
+    visits = counts + pending
+    unvisited = visits == 0
+    if unvisited.any():
+        return numpy.flatnonzero(unvisited).tolist()
+    scores = coeff * numpy.sqrt(2.0 * log(stats.sim_count + stats.pending) / visits)
+    if z_star != w_star:
+        bests = numpy.frombuffer(arrays.bests)
+        exploitation = numpy.abs(bests - w_star) / abs(z_star - w_star)
+        exploitation *= numpy.where(pending > 0, counts / visits, 1.0)
+        scores += numpy.where(numpy.isnan(bests), 0.0, exploitation)
+    return numpy.flatnonzero(scores == scores.max()).tolist()
 
 
 # def exploitation_score_exponential(reward):
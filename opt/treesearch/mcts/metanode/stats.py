@@ -11,13 +11,17 @@ class MetaNodeStats(object):
     __slots__ = ("metanode",         # reference to the owner metanode
                  "sim_count",        # number of simulations run under this node
                  "sim_result",       # result of the simulation run from this node
-                 "sim_best_result")  # result of the best simulation run under this node
+                 "sim_best_result",  # result of the best simulation run under this node
+                 "evicted",          # (sim count, best result) of evicted subtrees, or None
+                 "pending")          # virtual loss of simulations in progress under this node
 
     def __init__(self, metanode):
         self.metanode = metanode
         self.sim_count = 0
         self.sim_result = None
         self.sim_best_result = Infeasible(INF)
+        self.evicted = None
+        self.pending = 0
 
     def __info__(self):
         z = self.format_sim_result(self.sim_result)
@@ -36,44 +40,48 @@ class MetaNodeStats(object):
 
     def set_sim_result(self, sim_result):
         """Set the simulation result of this metanode.  The result is set and propagated up the
-        tree, updating the statistics of all metanodes in the path to the root."""
-        if self.sim_count != 0:
+        tree, updating the statistics of all metanodes in the path to the root (or, for shared
+        metanodes, of all their ancestors).  Note that, with parallel rollouts, the metanode may
+        already have children with simulation results by the time its own result arrives."""
+        if self.sim_result is not None:
             raise Exception("erroneous attempt to set simulation result")
-        self.sim_count = 1
         self.sim_result = sim_result
-        self.sim_best_result = sim_result
-        parent = self.metanode.parent
-        if parent is not None:
-            parent.stats.add_sim_result(sim_result)
+        self.add_sim_result(sim_result)
 
     def add_sim_result(self, sim_result):
-        """Add a new simulation result (from a child node) to the statistics."""
-        metanode = self.metanode
-        is_better = metanode.solver.sense.is_better
-        while metanode is not None:
+        """Add a new simulation result (from this node or one of its children) to the statistics
+        of this metanode and its ancestors."""
+        is_better = self.metanode.solver.sense.is_better
+        for metanode in self.metanode.ancestors():
             stats = metanode.stats
+            stats.sim_count += 1
             if is_better(sim_result, stats.sim_best_result):
                 stats.sim_best_result = sim_result
-            else:
-                break
-            metanode = metanode.parent
-        self.add_sim_count(+1)
+            stats.update_arrays()
 
-    def remove_sim_result(self, sim_result):
+    def remove_sim_result(self, sim_result, ancestors=None, count=1):
         """Removing a result (from a child) means subtracting a result which has been previously
-        added."""
-        self.discard_sim_result(sim_result)
-        self.add_sim_count(-1)
+        added.  See discard_sim_result() for the meaning of 'ancestors'.  'count' is the number of
+        simulations being removed (more than one for the results of evicted subtrees)."""
+        if ancestors is None:
+            ancestors = self.metanode.ancestors()
+        self.discard_sim_result(sim_result, ancestors)
+        for metanode in ancestors:
+            stats = metanode.stats
+            stats.sim_count -= count
+            stats.update_arrays()
 
-    def discard_sim_result(self, sim_result):
+    def discard_sim_result(self, sim_result, ancestors=None):
         """Discarding differs from removing in that the result is not "subtracted" from the
         accumulated statistics.  Instead, this is used to merely indicate that the argument
         result may no longer be reached in this subtree (at least until a new simulation
         produces the same result).  If the result was previously added, use remove_sim_result()
-        instead."""
-        metanode = self.metanode
-        is_better = metanode.solver.sense.is_better
-        while metanode is not None:
+        instead.  The metanodes to update may be given in 'ancestors' (in the bottom-up order
+        produced by MetaNode.ancestors()), and default to this metanode and its ancestors."""
+        if ancestors is None:
+            ancestors = self.metanode.ancestors()
+        is_better = self.metanode.solver.sense.is_better
+        for metanode in ancestors:
             stats = metanode.stats
             if sim_result == stats.sim_result:
                 stats.add_sim_count(-1)
@@ -82,36 +90,69 @@ class MetaNodeStats(object):
                 best = Infeasible(INF)
                 if stats.sim_result is not None:
                     best = stats.sim_result
-                for child in metanode.children:
-                    child_best = child.stats.sim_best_result
+                if stats.evicted is not None and is_better(stats.evicted[1], best):
+                    best = stats.evicted[1]
+                if len(metanode.children) > 0:
+                    child_best = metanode.child_arrays.best_result()
                     if is_better(child_best, best):
                         best = child_best
                 stats.sim_best_result = best
-            metanode = metanode.parent
+                stats.update_arrays()
 
     def add_sim_count(self, count):
         """Add the argument 'count' to the simulation count of this metanode's stats."""
-        self.sim_count += count
-        metanode = self.metanode.parent
-        while metanode is not None:
-            metanode.stats.sim_count += count
-            metanode = metanode.parent
+        for metanode in self.metanode.ancestors():
+            stats = metanode.stats
+            stats.sim_count += count
+            stats.update_arrays()
+
+    def update_arrays(self):
+        """Copy these stats into the child arrays of the metanode's parent(s).  This must be called
+        whenever the simulation count, best result or virtual loss of the metanode changes."""
+        metanode = self.metanode
+        parent = metanode.parent
+        if parent is not None:
+            parent.child_arrays.set(metanode.index, self)
+            for other in metanode.extra_parents:
+                other.child_arrays.set(other.children.index(metanode), self)
 
     # ------------------------------------------------------------------------------
     def validate(self):
-        # verify that the best sim result is indeed the best among the
-        # metanode's own simulation and its children's best simulations
+        # verify that the best sim result is indeed the best among the metanode's own
+        # simulation, its children's best simulations, and the best evicted simulation
         results = [c.stats.sim_best_result for c in self.metanode.children]
         results.append(Infeasible(INF) if self.sim_result is None else self.sim_result)
+        evicted_count, evicted_best = (0, Infeasible(INF)) if self.evicted is None else self.evicted
+        results.append(evicted_best)
         assert self.sim_best_result == self.metanode.solver.sense.best_in(results)
 
         # the total simulation count at self should be equal to the sum of the simulations
-        # done by its children plus 1 if self's own simulation hasn't been discarded yet
-        own_sim = int(self.sim_result is not None)
-        assert self.sim_count - own_sim == sum(c.stats.sim_count for c in self.metanode.children)
+        # done by its children plus 1 if self's own simulation hasn't been discarded yet, plus
+        # the evicted simulations (this does not hold with transpositions, where simulations in
+        # shared subtrees are counted only once in each ancestor)
+        if self.metanode.solver.transposition_table is None:
+            own_sim = int(self.sim_result is not None)
+            assert (self.sim_count - own_sim - evicted_count ==
+                    sum(c.stats.sim_count for c in self.metanode.children))
 
         # verify if all children are correctly linked to the parent
-        assert all(child.parent is self.metanode for child in self.metanode.children)
+        assert all(self.metanode in child.parents for child in self.metanode.children)
+
+        # verify that the child arrays mirror the children's stats
+        children = self.metanode.children
+        arrays = self.metanode.child_arrays
+        if arrays is not None:
+            assert len(arrays) == len(children)
+            assert len(arrays.best_index) == len(children)
+            assert arrays.best_result() == self.metanode.solver.sense.best_in(
+                [Infeasible(INF)] + [c.stats.sim_best_result for c in children])
+            for i, child in enumerate(children):
+                assert child.parent is not self.metanode or child.index == i
+                assert arrays.counts[i] == child.stats.sim_count
+                assert arrays.pending[i] == child.stats.pending
+                best = arrays.best_value(child.stats.sim_best_result)
+                stored = arrays.bests[i]
+                assert stored == best or (stored != stored and best != best)  # NaN != NaN
 
     def report(self, indent=0, ostream=stdout):
         z = self.format_sim_result(self.sim_result)
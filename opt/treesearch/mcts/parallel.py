@@ -0,0 +1,206 @@
+"""
+Parallel MCTS.  Two flavours are provided:
+
+    - leaf parallelism (see RolloutPool): selection and expansion stay in the solver's process,
+      while the rollouts of expanded nodes run in a pool of worker processes.  Virtual losses
+      keep concurrent selections from piling onto the same path, and results are backpropagated
+      as they arrive.  This mode is enabled through the MCTS parameter 'rollout_processes'.
+    - root parallelism (see root_parallel()): several independent searches run on the same
+      instance in separate processes, and their solutions and root statistics are merged.
+
+Since nodes (and, for root parallelism, solver classes) are sent to other processes, they must be
+picklable, i.e. their classes must be defined at module level.  The rollout workers are forked
+when the pool is created and keep a snapshot of the solver at that time, whose simulation policy
+they apply to the nodes they receive (see RolloutMetaNode).
+"""
+from multiprocessing import Pool, cpu_count
+from Queue import Queue, Empty
+from traceback import format_exc
+
+from utils.channel import Channel
+from utils.misc import INF
+
+from opt.infeasible import Infeasible
+from opt.solver.sense import OptimizationSense
+
+
+class RolloutMetaNode(object):
+    """
+    Stand-in for a metanode in the rollout workers, which only have a copy of its node.  The
+    simulation policy receives one of these instead of the actual metanode, so policies used with
+    parallel rollouts may only use the 'node' and 'solver' attributes of their argument (as
+    random_simulation() does).
+    """
+    __slots__ = ("node",    # copy of the metanode's node
+                 "solver")  # snapshot of the solver in the worker process
+
+    def __init__(self, node, solver):
+        self.node = node
+        self.solver = solver
+
+
+def add_virtual_loss(path, virtual_loss):
+    """Add 'virtual_loss' to the pending visits of each metanode in 'path' (a negative value
+    removes it)."""
+    for metanode in path:
+        stats = metanode.stats
+        stats.pending += virtual_loss
+        stats.update_arrays()
+
+
+# worker processes running rollouts (see RolloutPool)
+_worker_solver = None
+
+
+def _init_worker(solver):
+    """Detach the worker's snapshot of the solver from its listeners and plugins by giving it an
+    empty channel, so that rollouts do not trigger pruning or status displays in the worker (the
+    master does both when it checks the solutions sent back), and empty its solution list."""
+    global _worker_solver
+    _worker_solver = solver
+    solver.channel = Channel("rollout", type_validation=False,
+                             callback_mode=solver.channel.callback_mode)
+    solver.rollout_pool = None
+    solutions = solver.solutions
+    solutions.spill = None
+    solutions.keep_best = INF
+    solutions.clear()
+    solutions.init()
+
+
+def _rollout_task(args):
+    """Apply the solver's simulation policy to 'node' and return its result along with the
+    (data, value) pairs of the solutions added to the worker's solution list during the rollout
+    (e.g. by inplace_rollout()), or the traceback of the error raised by the policy."""
+    ticket, node, seed = args
+    solver = _worker_solver
+    solutions = solver.solutions
+    try:
+        solver.rng.seed(seed)
+        sim_result = solver.params.simulation_policy(RolloutMetaNode(node, solver))
+        found = [(sol.data, sol.value) for sol in solutions]
+        return ticket, sim_result, found, None
+    except Exception:
+        return ticket, None, [], format_exc()
+    finally:
+        del solutions[:]
+        solutions.log.clear()
+
+
+class RolloutPool(object):
+    """
+    Runs metanode rollouts in a pool of worker processes.  Each submitted metanode adds a virtual
+    loss to the 'pending' counter of the stats of every metanode on its path to the root, which
+    is taken back when the rollout result is collected.  The ancestors are recorded at submission
+    time, so virtual losses are correctly removed even if the tree changes in the meantime.
+    """
+    def __init__(self, solver, processes=None):
+        if processes is None or processes <= 0:
+            processes = cpu_count()
+        self.solver = solver
+        self.processes = processes
+        self.pool = Pool(processes, initializer=_init_worker, initargs=(solver,))
+        self.results = Queue()  # results are put here by the pool's result handler thread
+        self.pending = {}       # {ticket: (metanode, [ancestor metanodes])}
+        self.errors = []        # tracebacks of the failed rollouts (see raise_errors())
+        self.next_ticket = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def submit(self, metanode):
+        """Start the rollout of 'metanode' in a worker process and apply its virtual loss."""
+        path = list(metanode.rpath)
+        add_virtual_loss(path, self.solver.params.virtual_loss)
+        ticket = self.next_ticket
+        self.next_ticket += 1
+        self.pending[ticket] = (metanode, path)
+        task = (ticket, metanode.node.copy(), self.solver.rng.getrandbits(32))
+        self.pool.apply_async(_rollout_task, (task,), callback=self.results.put)
+
+    def collect(self, block=True):
+        """Return a list of (metanode, sim_result) pairs for all the rollouts that have finished.
+        If 'block' is true and rollouts are pending, wait until at least one of them finishes.
+        Solutions found by the workers are checked by the solver's solution list.  Failed
+        rollouts have their virtual loss removed and their tracebacks kept in 'errors', so that
+        the other results can be backpropagated before raise_errors() is called."""
+        collected = []
+        if block and len(self.pending) > 0:
+            self._release(collected, *self.results.get(True, INF))
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except Empty:
+                break
+            self._release(collected, *result)
+        return collected
+
+    def _release(self, collected, ticket, sim_result, found=(), error=None):
+        metanode, path = self.pending.pop(ticket)
+        add_virtual_loss(path, -self.solver.params.virtual_loss)
+        if error is not None:
+            self.errors.append(error)
+            return
+        check = self.solver.solutions.check
+        for data, value in found:
+            check(data, value)
+        collected.append((metanode, sim_result))
+
+    def raise_errors(self):
+        """Raise an exception with the worker traceback of the first failed rollout (if any)."""
+        if len(self.errors) > 0:
+            errors = self.errors
+            self.errors = []
+            raise Exception("{} rollout(s) failed in worker processes, the first with:\n{}"
+                            .format(len(errors), errors[0]))
+
+    def close(self):
+        """Terminate the worker processes and drop any pending rollouts."""
+        self.pool.terminate()
+        self.pool.join()
+        for ticket in list(self.pending.iterkeys()):
+            self._release([], ticket, None)
+
+
+# ------------------------------------------------------------------------------
+def _independent_search(args):
+    solver_cls, instance, limits, params = args
+    solver = solver_cls()
+    solver.init(instance=instance, **params)
+    solver.run(*limits)
+    root_stats = {}
+    if solver.root is not None:
+        for child in solver.root.children:
+            root_stats[child.branch_index] = (child.stats.sim_count, child.stats.sim_best_result)
+    return solver.sense.name, list(solver.solutions), root_stats
+
+
+def root_parallel(solver_cls, instance, processes=None, limits=(), seed=0, **params):
+    """Run 'processes' independent searches of 'solver_cls' on 'instance', each in its own process
+    with a different seed ('seed' + i) and the remaining keyword arguments as parameters.  The
+    searches are stopped by 'limits' (e.g. [Limit.Cpu(rel=60.0)]).
+    Returns a list with the solutions found by all searches (sorted by cpu time), and a dictionary
+    mapping the branch index of each root child to its merged (sim_count, sim_best_result)."""
+    if processes is None or processes <= 0:
+        processes = cpu_count()
+    tasks = [(solver_cls, instance, list(limits), dict(params, seed=seed + i))
+             for i in xrange(processes)]
+    pool = Pool(processes)
+    try:
+        outputs = pool.map(_independent_search, tasks)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    solutions = []
+    root_stats = {}
+    for sense_name, search_solutions, search_root_stats in outputs:
+        is_better = OptimizationSense.get(sense_name).is_better
+        solutions.extend(search_solutions)
+        for branch_index, (sim_count, sim_best_result) in search_root_stats.iteritems():
+            merged_count, merged_best = root_stats.get(branch_index, (0, Infeasible(INF)))
+            if is_better(sim_best_result, merged_best):
+                merged_best = sim_best_result
+            root_stats[branch_index] = (merged_count + sim_count, merged_best)
+    solutions.sort(key=lambda sol: sol.meta.cpu)
+    return solutions, root_stats
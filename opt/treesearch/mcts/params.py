@@ -2,9 +2,11 @@ from utils.interval import Interval
 from utils.misc import INF, check_subclass
 
 from opt.solver import Solver
+from opt.solver.params import parse_flag
 from opt.treesearch import TreeNode
 
 from .metanode import MetaNode
+from .profiling import MCTSProfile
 
 
 class MCTS_ParamSet(Solver.ParamSet):
@@ -15,13 +17,7 @@ class MCTS_ParamSet(Solver.ParamSet):
 
     @pruning.adapter
     def pruning(self, flag):
-        if isinstance(flag, str):
-            flag = flag.strip().lower()
-        if flag in (True, 1, "1", "t", "true"):
-            return True
-        if flag in (False, 0, "0", "f", "false"):
-            return False
-        raise ValueError("unexpected pruning flag value: {!r}".format(flag))
+        return parse_flag("pruning", flag)
 
     @pruning.setter
     def pruning(self, flag):
@@ -31,12 +27,34 @@ class MCTS_ParamSet(Solver.ParamSet):
         except AttributeError:
             def prune_tree():
                 root = solver.root
-                if root is not None and root.bound is not None:
-                    root.prune(solver.incumbent)
+                if root is not None and root.bound is not None and solver.bound_index is not None:
+                    solver.bound_index.prune(solver.incumbent)
 
             listener = solver.channel.listen(solver.SIGNALS.INCUMBENT_CHANGED, prune_tree)
             self.__pruning_listener = listener
         listener.deployed = flag
+        # the bound index is created with the tree, once the solver's sense is known
+        if solver.root is not None:
+            solver._init_bound_index(flag)
+
+    # ------------------------------------------------------------------------------
+    transpositions = Solver.Param(description=("flag indicating whether to merge nodes with the "
+                                               "same state_key() (transposition table)"),
+                                  options="0/1 or [T]rue/[F]alse",
+                                  domain=(False, True),
+                                  default=False)
+
+    @transpositions.adapter
+    def transpositions(self, flag):
+        return parse_flag("transpositions", flag)
+
+    @transpositions.setter
+    def transpositions(self, flag):
+        solver = self.owner
+        if not flag:
+            solver.transposition_table = None
+        elif solver.transposition_table is None:
+            solver.transposition_table = {}
 
     # ------------------------------------------------------------------------------
     node_class = Solver.Param(description="node class used by the solver",
@@ -98,6 +116,26 @@ class MCTS_ParamSet(Solver.ParamSet):
     def expansion_limit(self, limit):
         return float(limit)
 
+    # ------------------------------------------------------------------------------
+    widening_coeff = Solver.Param(description=("progressive widening coefficient k, i.e. a node "
+                                               "visited n times may have k * n^a children"),
+                                  options="positive (inf disables progressive widening)",
+                                  domain=Interval(0.0, INF),
+                                  default=INF)
+
+    @widening_coeff.adapter
+    def widening_coeff(self, coeff):
+        return float(coeff)
+
+    # ------------------------------------------------------------------------------
+    widening_exponent = Solver.Param(description="progressive widening exponent a (see above)",
+                                     domain=Interval(0.0, 1.0),
+                                     default=0.5)
+
+    @widening_exponent.adapter
+    def widening_exponent(self, exponent):
+        return float(exponent)
+
     # ------------------------------------------------------------------------------
     selection_policy = Solver.Param(description="node selection policy used",
                                     options="function returning a list of candidate nodes",
@@ -151,3 +189,103 @@ class MCTS_ParamSet(Solver.ParamSet):
             return fnc
         raise Exception("unrecognized selection policy: {!r}".format(fnc))
 
+    # ------------------------------------------------------------------------------
+    batch_simulation_policy = Solver.Param(description="simulation policy used for batches",
+                                           options=("function taking a list of metanodes and "
+                                                    "returning a list of simulation results"),
+                                           default=None)
+
+    @batch_simulation_policy.adapter
+    def batch_simulation_policy(self, fnc):
+        solver = self.owner
+        if fnc is None:
+            return solver.batch_simulation_policy
+        if isinstance(fnc, str):
+            return getattr(solver, fnc)
+        if callable(fnc):
+            return fnc
+        raise Exception("unrecognized batch simulation policy: {!r}".format(fnc))
+
+    # ------------------------------------------------------------------------------
+    batch_size = Solver.Param(description="number of nodes expanded and simulated per iteration",
+                              options="one or more",
+                              domain=Interval(1, INF),
+                              default=1)
+
+    @batch_size.adapter
+    def batch_size(self, size):
+        return int(size)
+
+    # ------------------------------------------------------------------------------
+    node_budget = Solver.Param(description=("maximum number of metanodes kept in the tree (the "
+                                            "least visited subtrees are evicted beyond this)"),
+                               options="one or more (inf for no limit)",
+                               domain=Interval(1, INF),
+                               default=INF)
+
+    @node_budget.adapter
+    def node_budget(self, budget):
+        return float(budget)
+
+    # ------------------------------------------------------------------------------
+    profiling = Solver.Param(description=("flag indicating whether to measure the cpu time of each "
+                                          "phase of MCTS iterations (see MCTSProfile)"),
+                             options="0/1 or [T]rue/[F]alse",
+                             domain=(False, True),
+                             default=False)
+
+    @profiling.adapter
+    def profiling(self, flag):
+        return parse_flag("profiling", flag)
+
+    @profiling.setter
+    def profiling(self, flag):
+        solver = self.owner
+        if not flag:
+            if solver.profile is not None:
+                solver.profile.uninstall()
+                solver.profile = None
+        elif solver.profile is None:
+            solver.profile = MCTSProfile(solver)
+            solver.profile.install()
+
+    # ------------------------------------------------------------------------------
+    checkpoint_path = Solver.Param(description=("file where the search state is periodically "
+                                                "saved, and from which it is resumed if present"),
+                                   options="a file path, or None to disable checkpoints",
+                                   default=None)
+
+    # ------------------------------------------------------------------------------
+    checkpoint_interval = Solver.Param(description=("minimum wall-clock time (in seconds) between "
+                                                    "consecutive checkpoints"),
+                                       domain=Interval(0.0, INF),
+                                       default=600.0)
+
+    @checkpoint_interval.adapter
+    def checkpoint_interval(self, interval):
+        return float(interval)
+
+    # ------------------------------------------------------------------------------
+    rollout_processes = Solver.Param(description=("number of worker processes used to run "
+                                                  "rollouts in parallel"),
+                                     options="0 for sequential rollouts in the solver's process",
+                                     domain=Interval(0, INF),
+                                     default=0)
+
+    @rollout_processes.adapter
+    def rollout_processes(self, n):
+        return int(n)
+
+    @rollout_processes.setter
+    def rollout_processes(self, n):
+        self.owner.close_rollout_pool()
+
+    # ------------------------------------------------------------------------------
+    virtual_loss = Solver.Param(description=("number of virtual visits added to each node in the "
+                                             "path of a rollout in progress"),
+                                domain=Interval(0.0, INF),
+                                default=1.0)
+
+    @virtual_loss.adapter
+    def virtual_loss(self, loss):
+        return float(loss)
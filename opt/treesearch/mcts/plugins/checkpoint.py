@@ -0,0 +1,54 @@
+from time import time
+
+from utils.misc import INF
+
+from opt.solver import Solver
+
+
+class Checkpoint(Solver.Plugin):
+    """Periodically saves the search state to the solver's 'checkpoint_path' (if set), at most
+    once every 'checkpoint_interval' seconds of wall-clock time, and again whenever the solver
+    pauses or finishes.  A solver initialized with the same 'checkpoint_path' resumes from the
+    saved checkpoint when it is bootstrapped (see MCTS._bootstrap()).  The periodic save is
+    checked by the solver's check scheduler (see CheckScheduler) rather than at the end of every
+    iteration."""
+    signal_map = {Solver.SIGNALS.SOLVER_PAUSED: "save",
+                  Solver.SIGNALS.SOLVER_FINISHED: "save"}
+
+    def __init__(self, name=None):
+        Solver.Plugin.__init__(self, name)
+        self.last_save = None
+
+    def install(self, solver):
+        if Solver.Plugin.install(self, solver):
+            solver.limits.schedule(self)
+            return True
+        return False
+
+    def uninstall(self):
+        if self.installed:
+            self.solver.limits.unschedule(self)
+        return Solver.Plugin.uninstall(self)
+
+    def check(self):
+        if self.solver.params.checkpoint_path is None:
+            return
+        if self.last_save is None:
+            self.last_save = time()
+        elif time() - self.last_save >= self.solver.params.checkpoint_interval:
+            self.save()
+
+    def predict(self, cpu, iter_cpu):
+        """Wall-clock time until the next save, converted to iterations using the cpu time per
+        iteration (the scheduler's 'check_interval' bounds the error of this estimate)."""
+        if iter_cpu <= 0.0 or self.last_save is None or self.solver.params.checkpoint_path is None:
+            return INF
+        return (self.solver.params.checkpoint_interval - (time() - self.last_save)) / iter_cpu
+
+    def save(self):
+        solver = self.solver
+        filepath = solver.params.checkpoint_path
+        if filepath is not None and solver.root is not None:
+            solver.save_checkpoint(filepath)
+            solver.log.debug("checkpoint saved to {}".format(filepath))
+        self.last_save = time()
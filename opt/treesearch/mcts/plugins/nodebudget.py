@@ -0,0 +1,53 @@
+from opt.solver import Solver
+
+
+class NodeBudget(Solver.Plugin):
+    """Keeps the number of metanodes in the tree within the solver's 'node_budget' parameter.
+    When the budget is exceeded, the least visited subtrees are collapsed into summary leaves
+    (see MetaNode.collapse()) until the tree is down to 'target_ratio' of the budget, so that
+    evictions are not triggered again on every iteration."""
+    signal_map = {Solver.SIGNALS.ITERATION_FINISHED: "check"}
+    target_ratio = 0.9
+
+    def check(self):
+        solver = self.solver
+        budget = solver.params.node_budget
+        root = solver.root
+        if root is None or root.size <= budget:
+            return
+        size = root.size
+        target = budget * self.target_ratio
+        collapsed = 0
+        for metanode in sorted(self.candidates(root), key=lambda m: m.stats.sim_count):
+            if metanode.parent is None:
+                continue  # already evicted with an ancestor
+            metanode.collapse()
+            collapsed += 1
+            if root.size <= target:
+                break
+        solver.log.debug("node budget: collapsed {} subtrees ({} nodes evicted)"
+                         .format(collapsed, size - root.size))
+
+    @staticmethod
+    def candidates(root):
+        """Return the list of metanodes whose subtrees can be collapsed, i.e. non-root metanodes
+        with children, no rollouts in progress and no metanodes shared through transpositions."""
+        # post-order traversal to find the subtrees containing shared metanodes
+        shared = set()
+        order = []
+        stack = [root]
+        while len(stack) > 0:
+            metanode = stack.pop()
+            order.append(metanode)
+            stack.extend(metanode.children)
+        candidates = []
+        for metanode in reversed(order):
+            if len(metanode.extra_parents) > 0:
+                shared.add(metanode)
+            if len(metanode.children) == 0:
+                continue
+            if any(child in shared for child in metanode.children):
+                shared.add(metanode)
+            elif metanode is not root and metanode.stats.pending == 0:
+                candidates.append(metanode)
+        return candidates
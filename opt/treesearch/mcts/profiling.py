@@ -0,0 +1,124 @@
+from time import clock
+
+from opt.solver.status import Field
+
+
+# MCTS phases, and the solver methods whose cpu time is attributed to each of them
+PHASES = ["selection", "expansion", "simulation", "backpropagation"]
+PHASE_STEPS = [("_selection_step", "selection"),
+               ("_expansion_step", "expansion"),
+               ("_simulation_step", "simulation"),
+               ("_backpropagation_step", "backpropagation"),
+               ("_merged_backpropagation_step", "backpropagation")]
+
+
+class MCTSProfile(object):
+    """
+    Accumulates the cpu time and number of calls of each phase of MCTS iterations, the depth of
+    the selected metanodes, and a histogram of the lengths of random rollouts (see simulation.py).
+    The profile is enabled through the MCTS parameter 'profiling', which wraps the solver's step
+    methods with timed versions (instance attributes shadowing the methods), so that solvers
+    without profiling run the plain methods with no overhead.  Rollouts running in worker
+    processes (see 'rollout_processes') are not included in the rollout length histogram.
+    """
+    def __init__(self, solver):
+        self.solver = solver
+        self.cpu = None              # {phase: total cpu time}
+        self.calls = None            # {phase: number of calls}
+        self.selection_depth = None  # sum of the depths of the selected metanodes
+        self.rollout_lengths = None  # {rollout length: number of rollouts}
+        self.reset()
+
+    def reset(self):
+        self.cpu = dict.fromkeys(PHASES, 0.0)
+        self.calls = dict.fromkeys(PHASES, 0)
+        self.selection_depth = 0
+        self.rollout_lengths = {}
+
+    clear = reset
+
+    def install(self):
+        """Replace the solver's step methods with timed versions."""
+        solver = self.solver
+        for name, phase in PHASE_STEPS:
+            setattr(solver, name, self.timed(phase, getattr(type(solver), name).__get__(solver)))
+        solver.status.fields.extend(self.fields)
+
+    def uninstall(self):
+        """Restore the solver's original step methods."""
+        solver = self.solver
+        for name, _ in PHASE_STEPS:
+            solver.__dict__.pop(name, None)
+        fields = solver.status.fields
+        for field in self.fields:
+            if field in fields:
+                fields.remove(field)
+
+    def timed(self, phase, step):
+        cpu = self.cpu
+        calls = self.calls
+        if phase == "selection":
+            def timed_step(*args):
+                start = clock()
+                selected = step(*args)
+                cpu[phase] += clock() - start
+                calls[phase] += 1
+                self.selection_depth += selected.depth
+                return selected
+        else:
+            def timed_step(*args):
+                start = clock()
+                result = step(*args)
+                cpu[phase] += clock() - start
+                calls[phase] += 1
+                return result
+        return timed_step
+
+    def record_rollout(self, length):
+        lengths = self.rollout_lengths
+        lengths[length] = lengths.get(length, 0) + 1
+
+    # ------------------------------------------------------------------------------
+    @property
+    def mean_selection_depth(self):
+        count = self.calls["selection"]
+        return float(self.selection_depth) / count if count > 0 else 0.0
+
+    @property
+    def mean_rollout_length(self):
+        count = sum(self.rollout_lengths.itervalues())
+        if count == 0:
+            return 0.0
+        return float(sum(l * n for l, n in self.rollout_lengths.iteritems())) / count
+
+    def cpu_shares(self):
+        """Fraction of the total profiled cpu time spent in each phase."""
+        total = sum(self.cpu.itervalues())
+        return dict((phase, self.cpu[phase] / total if total > 0.0 else 0.0) for phase in PHASES)
+
+    def to_dict(self):
+        return dict(cpu=dict(self.cpu),
+                    calls=dict(self.calls),
+                    cpu_shares=self.cpu_shares(),
+                    mean_selection_depth=self.mean_selection_depth,
+                    mean_rollout_length=self.mean_rollout_length,
+                    rollout_lengths=dict(self.rollout_lengths))
+
+    # ------------------------------------------------------------------------------
+    @staticmethod
+    def extract_cpu_shares(solver):
+        shares = solver.profile.cpu_shares()
+        return "/".join("{:.0f}".format(shares[phase] * 100) for phase in PHASES)
+
+    fields = [Field(header="Sel/Exp/Sim/Back %",
+                    width=18,
+                    align=str.center,
+                    extract=lambda solver: MCTSProfile.extract_cpu_shares(solver)),
+              Field(header="Sel depth",
+                    width=10,
+                    align=str.rjust,
+                    extract=lambda solver: "{:.2f}".format(solver.profile.mean_selection_depth)),
+              Field(header="Rollout len",
+                    width=12,
+                    align=str.rjust,
+                    extract=lambda solver: "{:.2f}".format(solver.profile.mean_rollout_length))]
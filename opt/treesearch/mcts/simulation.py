@@ -1,23 +1,74 @@
-from collections import Sequence
 from opt.treesearch import TreeNode
 
 
 def random_simulation(metanode):
     """Given a metanode, apply (uniform) randomly selected actions/branches to the node until a
-    leaf is reached.  This method operates on a copy of the metanode's node, so it can be used
-    directly as a simulation policy.  In fact, this is the default simulation policy used in MCTS.
-    """
-    random_choice = metanode.solver.rng.choice
-    node = metanode.node.copy()
+    leaf is reached.  This method does not modify the metanode's node, so it can be used directly
+    as a simulation policy.  In fact, this is the default simulation policy used in MCTS.
+    If the node class implements undo(), the branches are applied in-place and undone at the end
+    of the rollout (see inplace_rollout()), and the objective value of the leaf is returned.
+    Otherwise, the rollout runs on a copy of the node, and the leaf node itself is returned."""
+    node = metanode.node
+    solver = metanode.solver
+    if has_undo(node):
+        return inplace_rollout(node, solver.rng, solver)
+    return random_rollout(node.copy(), solver.rng, solver.profile)
+
+
+def has_undo(node):
+    """Check if the node's class redefines TreeNode.undo()."""
+    return getattr(type(node).undo, "im_func", None) is not TreeNode.undo.im_func
+
+
+def random_rollout(node, rng, profile=None):
+    """Apply (uniform) randomly selected branches to 'node' *in-place* until a leaf is reached,
+    using the random number generator 'rng'.  Returns the final node, which may be a different
+    object if the node's branches() produces TreeNode objects.  The length of the rollout is
+    recorded in 'profile' if one is given (see MCTSProfile)."""
+    length = 0
     while not node.is_leaf():
-        branches = node.branches()
-        if not isinstance(branches, Sequence):
-            branches = list(branches)
-        if len(branches) == 0:
+        branch = node.random_branch(rng)
+        if branch is None:
             break
-        branch = random_choice(branches)
         if isinstance(branch, TreeNode):
             node = branch
         else:
             node.apply(branch)
+        length += 1
+    if profile is not None:
+        profile.record_rollout(length)
     return node
+
+
+def inplace_rollout(node, rng, solver):
+    """Copy-free version of random_rollout().  The branches applied to 'node' are recorded and
+    undone in reverse order once the leaf is reached, leaving the node unchanged.  The leaf is
+    checked by the solver's solution list before being undone, and it is only copied if it
+    would be added to the list (in case its solution data refers to the node's data).  Returns
+    the objective value of the leaf."""
+    applied = []
+    length = 0
+    leaf = node
+    try:
+        while not leaf.is_leaf():
+            branch = leaf.random_branch(rng)
+            if branch is None:
+                break
+            if isinstance(branch, TreeNode):
+                leaf = branch
+            else:
+                leaf.apply(branch)
+                if leaf is node:
+                    applied.append(branch)
+            length += 1
+        if solver.profile is not None:
+            solver.profile.record_rollout(length)
+        value = solver.objective(leaf)
+        solutions = solver.solutions
+        if leaf is node and solutions.accepts(value):
+            leaf = node.copy()
+        solutions.check(leaf, value)
+    finally:
+        for branch in reversed(applied):
+            node.undo(branch)
+    return value
@@ -1,5 +1,6 @@
 from copy import deepcopy
 from itertools import izip
+import os
 
 from utils.misc import max_elems
 from opt.solver import Solver
@@ -7,8 +8,14 @@ from opt.treesearch.node import TreeNode
 from opt.solver.status import Field
 
 from .metanode import MetaNode
+from .metanode.boundindex import MetaTreeBoundIndex
+from .metanode.scoring import exploration_score, exploitation_score, uct_candidates
 from .params import MCTS_ParamSet
+from .parallel import RolloutPool, add_virtual_loss
 from .plugins.treeexhausted import TreeExhausted
+from .plugins.nodebudget import NodeBudget
+from .plugins.checkpoint import Checkpoint
+from .checkpoint import save_checkpoint, load_checkpoint
 
 
 def extract_treedims(solver):
@@ -35,12 +42,18 @@ class MCTS(Solver):
     ParamSet = MCTS_ParamSet  # paramset class used by this solver
     Node = TreeNode           # node class used by default
     MetaNode = MetaNode       # reference to base metanode class
-    default_plugins = list(Solver.default_plugins) + [TreeExhausted]
+    default_plugins = list(Solver.default_plugins) + [TreeExhausted, NodeBudget, Checkpoint]
 
     def __init__(self, **params):
+        self.rollout_pool = None
+        self.transposition_table = None
+        self.bound_index = None
+        self.root = None
+        self.checkpoint_loaded = False
+        self.profile = None
         Solver.__init__(self, **params)
         self.status.fields.append(Field.TreeDims)
-        self.root = None
+        self.channel.listen(self.SIGNALS.SOLVER_FINISHED, self.close_rollout_pool)
 
     def _extract_solution_and_meta(self, sol_container):
         if isinstance(sol_container, TreeNode):
@@ -49,10 +62,27 @@ class MCTS(Solver):
             return sol_container, {}
 
     def _reset(self):
+        self.close_rollout_pool()
         self.root = None
+        self.checkpoint_loaded = False
+        if self.profile is not None:
+            self.profile.reset()
+        if self.transposition_table is not None:
+            self.transposition_table = {}
+        self.bound_index = None
 
     def _bootstrap(self):
-        """Bootstrap the search by creating the root node and running a simulation from it."""
+        """Bootstrap the search by creating the root node and running a simulation from it.  If
+        the 'checkpoint_path' parameter names an existing checkpoint, the search is resumed from
+        it instead (a ValueError is raised if it belongs to another node class or instance), and
+        a tree loaded beforehand with load_checkpoint() is kept as is."""
+        checkpoint_path = self.params.checkpoint_path
+        if checkpoint_path is not None and os.path.isfile(checkpoint_path):
+            self.load_checkpoint(checkpoint_path)
+        if self.checkpoint_loaded:
+            self.checkpoint_loaded = False
+            return
+        self._init_bound_index(self.params.pruning)
         root_node = self.params.node_class.root(self)
         root_meta = self.params.metanode_class(self, root_node)
         self.root = root_meta
@@ -60,8 +90,11 @@ class MCTS(Solver):
             self.solutions.check(root_node)
         else:
             is_better = self.sense.is_better
-            if root_meta.bound is not None and is_better(self.bound, root_meta.bound.value):
-                self.bound = root_meta.bound.value
+            if root_meta.bound is not None:
+                if is_better(self.bound, root_meta.bound.value):
+                    self.bound = root_meta.bound.value
+                if self.bound_index is not None:
+                    self.bound_index.push(root_meta)
             sim_results = self._simulation_step([root_meta])
             self._backpropagation_step([root_meta], sim_results)
 
@@ -72,33 +105,148 @@ class MCTS(Solver):
             3) for each new node, run a random simulation until a terminal state is reached
             4) use the results of the simulations to update the statistics of the selected node
                and its ancestors
+        When 'rollout_processes' is nonzero, step 3) runs in worker processes, so an iteration
+        selects and expands nodes until all workers are busy and then backpropagates the results
+        of the rollouts that have finished in the meantime (see _iterate_parallel()).
+        When 'batch_size' is greater than one, steps 1) and 2) are repeated until that many nodes
+        have been expanded, and their simulations and backpropagation are done together (see
+        _iterate_batch()).
+        When the 'profiling' parameter is set, the cpu time of each step is accumulated in the
+        solver's 'profile' (see MCTSProfile).
         """
+        if self.params.rollout_processes > 0:
+            self._iterate_parallel()
+            return
+        if self.params.batch_size > 1:
+            self._iterate_batch()
+            return
         selected = self._selection_step()
         expanded = self._expansion_step(selected)
         if len(expanded) > 0:
             sim_results = self._simulation_step(expanded)
             self._backpropagation_step(expanded, sim_results)
 
+    def _iterate_parallel(self):
+        pool = self.rollout_pool
+        if pool is None:
+            pool = self.rollout_pool = RolloutPool(self, self.params.rollout_processes)
+        root = self.root
+        while len(pool) < pool.processes and not root.is_exhausted:
+            for metanode in self._expansion_step(self._selection_step()):
+                pool.submit(metanode)
+        collected = pool.collect(block=True)
+        # skip the stats of metanodes which were removed from the tree while being simulated
+        sim_results = []
+        expanded = []
+        for metanode, sim_result in collected:
+            if metanode.parent is None and metanode is not root:
+                if isinstance(sim_result, TreeNode):
+                    self.solutions.check(sim_result)
+            else:
+                expanded.append(metanode)
+                sim_results.append(sim_result)
+        self._backpropagation_step(expanded, sim_results)
+        pool.raise_errors()
+
+    def _iterate_batch(self):
+        """Select and expand nodes until 'batch_size' nodes have been expanded.  Expanded nodes
+        carry a virtual loss until the end of the selection phase, so that the selections are
+        spread over the tree.  Selection stops early if it reaches a node from the same batch
+        (e.g. always, with a zero virtual loss), since that node must be simulated before it can
+        be expanded."""
+        batch_size = self.params.batch_size
+        virtual_loss = self.params.virtual_loss
+        root = self.root
+        expanded = []
+        paths = []
+        in_batch = set()
+        while len(expanded) < batch_size and not root.is_exhausted:
+            selected = self._selection_step()
+            if selected in in_batch:
+                break  # 'selected' was expanded in this batch and has not been simulated yet
+            for metanode in self._expansion_step(selected):
+                path = list(metanode.rpath)
+                add_virtual_loss(path, virtual_loss)
+                expanded.append(metanode)
+                paths.append(path)
+                in_batch.add(metanode)
+        for path in paths:
+            add_virtual_loss(path, -virtual_loss)
+        if len(expanded) > 0:
+            sim_results = self._simulation_step(expanded)
+            if self.transposition_table is None:
+                self._merged_backpropagation_step(expanded, sim_results)
+            else:
+                # merged counts cannot tell whether simulations reach a shared ancestor through
+                # one or several paths, so results are added one at a time
+                self._backpropagation_step(expanded, sim_results)
+
+    def save_checkpoint(self, filepath):
+        """Save the search tree, solutions and search state to 'filepath' (see checkpoint.py)."""
+        save_checkpoint(self, filepath)
+
+    def load_checkpoint(self, filepath, resume=True):
+        """Replace the search tree by the one saved in 'filepath'.  If 'resume' is false, only the
+        tree is loaded (e.g. to warm-start a new search on the same instance), otherwise the
+        solutions and search state are restored as well.  The solver must be initialized."""
+        self.close_rollout_pool()
+        self._init_bound_index(self.params.pruning)
+        root = load_checkpoint(self, filepath, resume)
+        self.checkpoint_loaded = True
+        return root
+
+    def _init_bound_index(self, pruning):
+        """Create an index of the bounded metanodes of the current tree if 'pruning' is true (see
+        MetaTreeBoundIndex), or drop it otherwise.  This is done when the tree is created or
+        loaded, since the index depends on the solver's sense, which is set by the node class."""
+        if pruning:
+            self.bound_index = MetaTreeBoundIndex(self)
+            self.bound_index.compact()
+        else:
+            self.bound_index = None
+
+    def close_rollout_pool(self):
+        """Terminate the worker processes used for parallel rollouts (if any)."""
+        if self.rollout_pool is not None:
+            self.rollout_pool.close()
+            self.rollout_pool = None
+
     def _selection_step(self):
         """Descend through the tree until we find an expandable node (i.e. a node which hasn't
         been fully expanded yet).  This step uses a selection policy that, given a list of
         metanodes, should return a list of candidates that are considered best according to some
-        criterion.  The default criterion is to maximize the score in a UCT-like formula."""
+        criterion.  The default criterion is to maximize the score in a UCT-like formula.
+        With progressive widening, the search also descends through expandable nodes which are
+        saturated, i.e. which have as many children as their visits allow."""
         selection_policy = self.params.selection_policy
+        default_uct = self.uses_default_uct()
         random_choice = self.rng.choice
         metanode = self.root
-        while not metanode.is_expandable:
+        while not metanode.is_expandable or metanode.is_saturated:
             children = metanode.children
             if len(children) == 1:
                 metanode = children[0]
             else:
-                candidates = selection_policy(children)
+                if default_uct:
+                    candidates = [children[i] for i in uct_candidates(metanode)]
+                else:
+                    candidates = selection_policy(children)
                 if len(candidates) == 1:
                     metanode = candidates[0]
                 else:
                     metanode = random_choice(candidates)
         return metanode
 
+    def uses_default_uct(self):
+        """True if the selection policy and score terms are the defaults, in which case selection
+        scores all children at once from their parent's child arrays (see uct_candidates()).
+        Other policies and score terms are evaluated separately for each child."""
+        params = self.params
+        policy = getattr(params.selection_policy, "im_func", None)
+        terms = [getattr(term, "im_func", term) for term in params.selection_score_terms]
+        return (policy is MCTS.selection_policy.im_func and
+                terms == [exploration_score, exploitation_score])
+
     def selection_policy(self, metanodes):
         terms = self.params.selection_score_terms
         return max_elems(metanodes, key=lambda m: sum(term(m) for term in terms))
@@ -106,7 +254,7 @@ class MCTS(Solver):
     def _expansion_step(self, selected):
         expanded = []
         count = 0
-        while count < self.params.expansion_limit:
+        while count < self.params.expansion_limit and not selected.is_saturated:
             child = selected.create_next_child()
             if child is not None:
                 selected.add_child(child)
@@ -117,8 +265,14 @@ class MCTS(Solver):
         return expanded
 
     def _simulation_step(self, expanded):
+        return self.params.batch_simulation_policy(expanded)
+
+    def batch_simulation_policy(self, metanodes):
+        """Default batch simulation policy, which simply applies the simulation policy to each
+        metanode.  Node classes able to run several rollouts at once should provide a batch
+        policy (see the 'batch_simulation_policy' parameter)."""
         sim_policy = self.params.simulation_policy
-        return [sim_policy(metanode) for metanode in expanded]
+        return [sim_policy(metanode) for metanode in metanodes]
 
     def simulation_policy(self, metanode):
         return metanode.node.simulation()
@@ -130,3 +284,46 @@ class MCTS(Solver):
                 metanode.stats.set_sim_result(self.objective(sim_result))
             else:
                 metanode.stats.set_sim_result(sim_result)
+
+    def _merged_backpropagation_step(self, expanded, sim_results):
+        """Equivalent to _backpropagation_step(), but the results are first merged into a single
+        (count, best result) pair per metanode, which is then propagated up one depth level at a
+        time, so that each ancestor is updated once regardless of the number of results under
+        it.  This requires the metanodes to form a tree (i.e. no transpositions)."""
+        is_better = self.sense.is_better
+        merged = {}
+        levels = {}
+
+        def merge(metanode, count, best):
+            entry = merged.get(metanode)
+            if entry is None:
+                merged[metanode] = [count, best]
+                levels.setdefault(metanode.depth, []).append(metanode)
+            else:
+                entry[0] += count
+                if is_better(best, entry[1]):
+                    entry[1] = best
+
+        root = self.root
+        for metanode, sim_result in izip(expanded, sim_results):
+            if isinstance(sim_result, TreeNode):
+                self.solutions.check(sim_result)
+                sim_result = self.objective(sim_result)
+            stats = metanode.stats
+            if stats.sim_result is not None:
+                raise Exception("erroneous attempt to set simulation result")
+            stats.sim_result = sim_result
+            if metanode.parent is not None or metanode is root:
+                merge(metanode, 1, sim_result)
+        depth = max(levels) if len(levels) > 0 else -1
+        while depth >= 0:
+            for metanode in levels.pop(depth, ()):
+                count, best = merged[metanode]
+                stats = metanode.stats
+                stats.sim_count += count
+                if is_better(best, stats.sim_best_result):
+                    stats.sim_best_result = best
+                stats.update_arrays()
+                if metanode.parent is not None:
+                    merge(metanode.parent, count, best)
+            depth -= 1
@@ -1,3 +1,6 @@
+from collections import Sequence
+
+
 class TreeNode(object):
     """
     Abstract base class for tree nodes used in tree search algorithms. Depending on the search
@@ -7,9 +10,12 @@ class TreeNode(object):
         copy()               # create an exact copy of a node
         release()            # release memory taken by a node
         branches()           # list of branching options available at a node
+        random_branch(rng)   # pick one of the branches at random
+        branch_prior(branch) # prior score of a branch (higher is expanded first)
         apply(branch)        # modify a node (in-place) by following a given branch
         undo(branch)         # the opposite of apply()
         is_leaf()            # check whether a node is a leaf or not
+        state_key()          # identify nodes with equivalent states (transpositions)
         solution_and_meta()  # extract the solution data and metadata from a leaf node
         objective()          # compute the objective function value of a node
         bound()              # compute a bound on the objective function for a node
@@ -53,6 +59,30 @@ class TreeNode(object):
         since it will not be used."""
         raise NotImplementedError()
 
+    def random_branch(self, rng):
+        """random_branch() : Random -> branch
+                           | Random -> TreeNode
+                           | Random -> None
+        Return one of the elements of branches(), chosen uniformly at random with the random
+        number generator 'rng', or None if the node has no branches. This is used by random
+        rollouts in MCTS. The default implementation builds the full branch list, so subclasses
+        can redefine it to sample a branch more efficiently."""
+        branches = self.branches()
+        if not isinstance(branches, Sequence):
+            branches = list(branches)
+        if len(branches) == 0:
+            return None
+        return rng.choice(branches)
+
+    def branch_prior(self, branch):
+        """branch_prior() : branch -> float
+                          | TreeNode -> float
+        Return a prior score for one of the elements of branches(), where higher scores indicate
+        more promising branches. This is optional: if a subclass defines it, MCTS expands the
+        branches of a node by decreasing prior (ties keep the order of branches()) rather than in
+        the order of branches(), which is most useful together with progressive widening."""
+        raise NotImplementedError()
+
     def apply(self, branch):
         """apply() : branch -> void
         Apply an *in-place* modification to a node. The argument to this method is a single element
@@ -76,6 +106,15 @@ class TreeNode(object):
         however, advisable to provide an application-specific leaf check."""
         return False
 
+    def state_key(self):
+        """state_key() : void -> hashable
+        Return a hashable key identifying the state of a node, used by MCTS's transposition table
+        to merge nodes reached through different sequences of branches. Two nodes should only
+        have equal keys if they are interchangeable, i.e. they have the same subtree *and* the
+        same objective value at each of its leaves. Returning None excludes a node from the
+        transposition table."""
+        raise NotImplementedError()
+
     def solution_and_meta(self):
         """solution_and_meta() : void -> (object, dict)
         Return a Python object representing the solution data contained in a leaf node, plus a
@@ -0,0 +1,161 @@
+"""
+Common base of tree search solvers which rank the children of nodes, such as beam search and
+limited discrepancy search.  Children are ranked by the scores given by the solver's ranking
+policy (the children's bound() by default), and scores compare like objective values, i.e. lower
+scores are better when minimizing and higher scores are better when maximizing.
+"""
+from utils.misc import check_subclass
+
+from opt.solver import Solver
+from opt.solver.params import parse_flag
+from opt.treesearch.node import TreeNode
+
+
+def expand_children(node):
+    """Create the list of children of 'node', either by applying each of its branches to a copy
+    of the node, or directly if branches() returns TreeNode objects.  An empty list means that
+    the node has no branches."""
+    children = []
+    for branch in node.branches():
+        if isinstance(branch, TreeNode):
+            children.append(branch)
+        else:
+            child = node.copy()
+            child.apply(branch)
+            children.append(child)
+    return children
+
+
+def rank_order(sense, scores):
+    """Indices of 'scores' from best to worst in the given sense (ties keep their order)."""
+    is_better = sense.is_better
+
+    def compare(a, b):
+        if is_better(a, b):
+            return -1
+        if is_better(b, a):
+            return 1
+        return 0
+
+    return sorted(xrange(len(scores)), cmp=compare, key=scores.__getitem__)
+
+
+class RankedSearch_ParamSet(Solver.ParamSet):
+    node_class = Solver.Param(description="node class used by the solver",
+                              options="a subclass of TreeNode",
+                              default=None)
+
+    @node_class.adapter
+    def node_class(self, cls):
+        if cls is None:
+            return type(self.owner).Node
+        check_subclass(cls, TreeNode)
+        return cls
+
+    @node_class.setter
+    def node_class(self, cls):
+        solver = self.owner
+        solver.log.debug("Setting objective function and sense from node class...")
+        solver.sense = cls.sense
+        solver.objective = cls.objective
+
+    # ------------------------------------------------------------------------------
+    pruning = Solver.Param(description=("flag indicating whether to discard nodes whose bound is "
+                                        "not better than the incumbent"),
+                           options="0/1 or [T]rue/[F]alse",
+                           domain=(False, True),
+                           default=False)
+
+    @pruning.adapter
+    def pruning(self, flag):
+        return parse_flag("pruning", flag)
+
+    # ------------------------------------------------------------------------------
+    ranking_policy = Solver.Param(description="node ranking policy used",
+                                  options="function returning the score of a node",
+                                  default=None)
+
+    @ranking_policy.adapter
+    def ranking_policy(self, fnc):
+        solver = self.owner
+        if fnc is None:
+            return solver.ranking_policy
+        if isinstance(fnc, str):
+            return getattr(solver, fnc)
+        if callable(fnc):
+            return fnc
+        raise Exception("unrecognized ranking policy: {!r}".format(fnc))
+
+    # ------------------------------------------------------------------------------
+    batch_ranking_policy = Solver.Param(description="ranking policy used for batches",
+                                        options=("function taking a list of nodes and returning "
+                                                 "a list of scores"),
+                                        default=None)
+
+    @batch_ranking_policy.adapter
+    def batch_ranking_policy(self, fnc):
+        solver = self.owner
+        if fnc is None:
+            return solver.batch_ranking_policy
+        if isinstance(fnc, str):
+            return getattr(solver, fnc)
+        if callable(fnc):
+            return fnc
+        raise Exception("unrecognized batch ranking policy: {!r}".format(fnc))
+
+
+class RankedSearch(Solver):
+    """
+    Abstract base of tree search solvers ranking the children of nodes.  Subclasses define
+    _bootstrap() and _iterate(), and use expand() to create and rank the children of a node.
+    """
+    ParamSet = RankedSearch_ParamSet  # paramset class used by this solver
+    Node = TreeNode                   # node class used by default
+
+    def _extract_solution_and_meta(self, node):
+        return node.solution_and_meta()
+
+    def ranking_policy(self, node):
+        """Default ranking policy, which scores nodes by their bound."""
+        return node.bound()
+
+    def batch_ranking_policy(self, nodes):
+        """Default batch ranking policy, which simply applies the ranking policy to each node.
+        Node classes able to score several nodes at once (e.g. with a vectorized heuristic)
+        should provide a batch policy (see the 'batch_ranking_policy' parameter)."""
+        ranking_policy = self.params.ranking_policy
+        return [ranking_policy(node) for node in nodes]
+
+    def expand(self, nodes):
+        """Create the children of all 'nodes', check the leaves against the solution list, and
+        return the remaining children (without those pruned by bound if 'pruning' is enabled)
+        ranked from best to worst.  Nodes without branches are treated as leaves."""
+        children = []
+        for node in nodes:
+            node_children = expand_children(node)
+            if len(node_children) == 0:
+                self.solutions.check(node)
+            for child in node_children:
+                if child.is_leaf():
+                    self.solutions.check(child)
+                else:
+                    children.append(child)
+        if self.params.pruning and len(children) > 0:
+            is_better = self.sense.is_better
+            incumbent = self.incumbent
+            children = [child for child in children if is_better(child.bound(), incumbent)]
+        if len(children) < 2:
+            return children
+        scores = self.params.batch_ranking_policy(children)
+        return [children[i] for i in rank_order(self.sense, scores)]
+
+    def finish_exhausted(self, reason):
+        """Finish the search after all nodes have been explored, which proves that the best
+        solution found is optimal (or that there are no solutions)."""
+        self.interrupts.add(reason)
+        if self.termination is None:
+            if self.solutions.feas_count > 0:
+                self.bound = self.incumbent
+                self.termination = self.TERMINATION.OPTIMAL
+            else:
+                self.termination = self.TERMINATION.INFEASIBLE
@@ -56,17 +56,23 @@ class Channel(object):
     A hierarchy of channels can be set up by linking channels through their 'parent'/'children'
     attributes. Whenever a signal is emitted in a channel, after activating the local listeners,
     the channel emits the same signal on the parent channel (if a parent is available).
+
+    Each channel caches, for each signal type emitted on it, whether any listener in the channel
+    or its ancestors can hear signals of that type.  Emitting a signal that no listener can hear
+    is then a single dictionary lookup, which creates no Signal object.  The cache is invalidated
+    whenever listeners are added or removed, types are (un)registered, or channels are linked.
     """
     __slots__ = ("_name",             # channel name (for pretty logging)
                  "_fullname",         # channel full name (for pretty logging)
                  "_parent",           # parent channel
                  "_children",         # dictionary of child channels
-                 "type_validation",   # True if validating signal and listener types
+                 "_type_validation",  # True if validating signal and listener types
                  "registered_types",  # multiset of accepted signal/listener types
                  "listeners",         # {signal_type: [Listener]}
                  "callback_mode",     # default listener callback mode
                  "log_fnc",           # log function
-                 "stack")             # active signals and listeners (for pretty logging)
+                 "stack",             # active signals and listeners (for pretty logging)
+                 "dispatch")          # {signal_type: bool} (True if any listener may hear it)
 
     make_log_fnc = staticmethod(make_log_fnc)
     NAME_SEPARATOR = "."
@@ -87,12 +93,13 @@ class Channel(object):
         self._fullname = name
         self._parent = None
         self._children = {}
-        self.type_validation = type_validation
+        self._type_validation = type_validation
         self.registered_types = MultiSet()
         self.listeners = {}
         self.callback_mode = callback_mode
         self.log_fnc = log_fnc
         self.stack = []
+        self.dispatch = {}
         if parent is not None:
             self.parent = parent
         if register_types is not None:
@@ -116,6 +123,15 @@ class Channel(object):
                         self.type_validation,
                         ", ".join(listener_data)))
 
+    @property
+    def type_validation(self):
+        return self._type_validation
+
+    @type_validation.setter
+    def type_validation(self, flag):
+        self._type_validation = flag
+        self.root._invalidate_dispatch()
+
     def log_to(self, ostream):
         """Set a log function for the channel.  If 'ostream' is None, the log function is
         disabled, otherwise 'make_log_fnc()' is used to create a log function targeting the
@@ -148,6 +164,7 @@ class Channel(object):
         while channel is not None:
             channel.registered_types.update(types)
             channel = channel._parent
+        self.root._invalidate_dispatch()
 
     def unregister(self, *types):
         """Remove (if present) one or more given signal type from the channel."""
@@ -160,6 +177,7 @@ class Channel(object):
         while channel is not None:
             channel.registered_types.difference_update(types)
             channel = channel._parent
+        self.root._invalidate_dispatch()
 
     # --------------------------------------------------------------------------
     # "Public" methods
@@ -171,7 +189,15 @@ class Channel(object):
         return listener
 
     def emit(self, type, payload=None, owner=None):
-        """Creates a Signal object and broadcasts it on the channel. Returns the new signal."""
+        """Creates a Signal object and broadcasts it on the channel. Returns the new signal, or
+        None if no listener could hear it (in which case no signal object is created)."""
+        key = type.type if isinstance(type, Signal) else type
+        try:
+            audible = self.dispatch[key]
+        except KeyError:
+            audible = self._dispatch_entry(key)
+        if not audible and self.log_fnc is None:
+            return None
         if isinstance(type, Signal):
             signal = Signal(self, type.type, type.payload, type.owner)
             if payload is not None:
@@ -183,8 +209,50 @@ class Channel(object):
         signal.emit()
         return signal
 
+    def emit_many(self, type, payloads, owner=None):
+        """Emit a signal of the given type for each element of 'payloads', looking up the
+        listeners only once.  If no listener can hear the signals, 'payloads' is not even
+        iterated.  Returns the number of signals emitted."""
+        try:
+            audible = self.dispatch[type]
+        except KeyError:
+            audible = self._dispatch_entry(type)
+        if not audible and self.log_fnc is None:
+            return 0
+        count = 0
+        for payload in payloads:
+            Signal(self, type, payload, owner).emit()
+            count += 1
+        return count
+
     # --------------------------------------------------------------------------
     # Private methods (used by Signal and Listener objects)
+    def _dispatch_entry(self, type):
+        """Check if any listener in this channel or its ancestors may hear signals of the given
+        type, and cache the result in the dispatch table.  Types failing type validation are
+        reported as audible (and not cached), so that _broadcast() raises the proper error."""
+        if type == Signal.ANY:
+            return True
+        audible = False
+        channel = self
+        while channel is not None:
+            if channel._type_validation and type not in channel.registered_types:
+                return True
+            listeners = channel.listeners
+            if type in listeners or Signal.ANY in listeners:
+                audible = True
+            channel = channel._parent
+        self.dispatch[type] = audible
+        return audible
+
+    def _invalidate_dispatch(self):
+        """Clear the dispatch tables of this channel and its descendants (whose signals propagate
+        through this channel)."""
+        if len(self.dispatch) > 0:
+            self.dispatch.clear()
+        for child in self._children.itervalues():
+            child._invalidate_dispatch()
+
     def _insert(self, listener):
         # error checking
         if listener._channel is not self:
@@ -192,7 +260,7 @@ class Channel(object):
         if listener._deployed:
             raise ValueError("duplicate attempt to deploy listener")
         type = listener._type
-        if self.type_validation and type != Signal.ANY and type not in self.registered_types:
+        if self._type_validation and type != Signal.ANY and type not in self.registered_types:
             raise ValueError("unable to listen signal type {!r} (not registered)".format(type))
         # now we actually insert the listener into our listener table
         try:
@@ -201,6 +269,7 @@ class Channel(object):
             listeners = self.listeners[type] = []
         insort_right(listeners, (listener._priority, listener))
         listener._deployed = True
+        self._invalidate_dispatch()
 
     def _remove(self, listener):
         if listener._channel is not self:
@@ -216,12 +285,13 @@ class Channel(object):
             assert listeners[index] == (listener._priority, listener)
             listeners.pop(index)
         listener._deployed = False
+        self._invalidate_dispatch()
 
     def _broadcast(self, signal, propagating=False):
         """Find and activate all listeners attached to this channel which match 'signal'. If the
         channel is linked to a parent channel, the broadcast is propagated to the parent channel
         afterwards."""
-        if self.type_validation and signal.type not in self.registered_types:
+        if self._type_validation and signal.type not in self.registered_types:
             raise ValueError("unable to emit signal type {!r} (not registered)".format(signal.type))
         stack = self.stack
         stack.append(signal)
@@ -265,6 +335,7 @@ class Channel(object):
     def parent(self, parent):
         self._parent = parent
         self._update_fullname()
+        self._invalidate_dispatch()
 
     @Many(complement="parent")
     def children(self):
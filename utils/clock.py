@@ -55,6 +55,11 @@ class Clock(object):
 
     clear = reset
 
+    def advance(self, seconds):
+        """Add 'seconds' to the total cpu time of the clock (e.g. to account for time spent in a
+        previous process when resuming a computation)."""
+        self._cpu += seconds
+
     def start(self):
         if self._tracks == 0:
             self._start = clock()
@@ -0,0 +1,49 @@
+import pytest
+
+from utils.channel import Channel
+
+
+@pytest.fixture
+def channels():
+    root = Channel("root", type_validation=False)
+    child = Channel("child", parent=root, type_validation=False)
+    return root, child
+
+
+def test_emit_without_listeners(channels):
+    root, child = channels
+    assert child.emit("foo") is None
+    assert child.dispatch == {"foo": False}
+    assert child.emit_many("foo", iter(int, 1)) == 0  # payloads are not iterated
+
+
+def test_dispatch_invalidation(channels):
+    root, child = channels
+    heard = []
+    child.emit("foo")
+    listener = root.listen("foo", heard.append, callback_mode=Channel.CALLBACK_TAKES_PAYLOAD)
+    assert child.emit("foo", payload=1) is not None
+    assert child.emit_many("foo", [2, 3]) == 2
+    listener.stop()
+    assert child.emit("foo", payload=4) is None
+    any_listener = root.listen(Channel.Signal.ANY, heard.append,
+                               callback_mode=Channel.CALLBACK_TAKES_PAYLOAD)
+    child.emit("bar", payload=5)
+    any_listener.stop()
+    other = Channel("other", type_validation=False)
+    other.listen("foo", heard.append, callback_mode=Channel.CALLBACK_TAKES_PAYLOAD)
+    child.emit("foo")
+    child.parent = other
+    child.emit("foo", payload=6)
+    assert heard == [1, 2, 3, 5, 6]
+
+
+def test_type_validation():
+    channel = Channel("validated")
+    with pytest.raises(ValueError):
+        channel.emit("foo")
+    channel.register("foo")
+    assert channel.emit("foo") is None
+    channel.unregister("foo")
+    with pytest.raises(ValueError):
+        channel.emit("foo")